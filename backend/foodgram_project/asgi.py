@@ -1,7 +1,11 @@
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_project.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+from recipes.async_read import StreamingASGIHandler  # noqa: E402
+
+application = StreamingASGIHandler()
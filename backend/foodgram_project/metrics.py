@@ -0,0 +1,395 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from hmac import compare_digest
+from pathlib import Path
+from time import perf_counter, sleep
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework.renderers import JSONRenderer
+
+SLOW_REQUEST_LOGGER = 'foodgram.performance'
+logger = logging.getLogger(SLOW_REQUEST_LOGGER)
+
+# Замеры текущего запроса. Контекст копируется в потоки sync_to_async,
+# поэтому запросы к БД из пула потоков тоже попадают в замер.
+current_stats = ContextVar('request_stats', default=None)
+
+# Как часто (в секундах) процесс сохраняет новые замеры в METRICS_DIR.
+METRICS_FLUSH_INTERVAL = 1
+
+
+class RequestStats:
+    """Замеры одного запроса: SQL, время БД и сериализации."""
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serializing = False
+        self.statements = []
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        self.statements.append((duration, sql))
+
+    def slowest(self, count):
+        return heapq.nlargest(count, self.statements, key=lambda x: x[0])
+
+
+def record_query(execute, sql, params, many, context):
+    """Обертка выполнения SQL для connection.execute_wrappers."""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, perf_counter() - started)
+
+
+def install_wrapper(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_wrapper)
+
+
+@contextmanager
+def serialization_timer():
+    """Время блока входит в замер сериализации запроса.
+
+    Вложенные блоки (сериализатор внутри сериализатора) не считаются
+    повторно.
+    """
+    stats = current_stats.get()
+    if stats is None or stats.serializing:
+        yield
+        return
+    stats.serializing = True
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        stats.serialize_time += perf_counter() - started
+        stats.serializing = False
+
+
+class TimedSerializerMixin:
+    """to_representation сериализатора входит в замер запроса."""
+
+    def to_representation(self, instance):
+        with serialization_timer():
+            return super().to_representation(instance)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer, время работы которого входит в замер запроса."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with serialization_timer():
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+
+
+class Histogram:
+    """Гистограмма Prometheus с метками, общая для потоков процесса."""
+
+    def __init__(self, name, documentation, buckets, labels):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labels = labels
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.series.get(
+                labels, ([0] * (len(self.buckets) + 1), 0.0)
+            )
+            counts[index] += 1
+            self.series[labels] = (counts, total + value)
+
+    def snapshot(self):
+        with self.lock:
+            return [
+                [list(labels), list(counts), total]
+                for labels, (counts, total) in self.series.items()
+            ]
+
+    def expose(self, series):
+        """Строки формата Prometheus для {метки: (счетчики, сумма)}."""
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        for labels, (counts, total) in sorted(series.items()):
+            pairs = [
+                f'{name}="{escape(value)}"'
+                for name, value in zip(self.labels, labels)
+            ]
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                label_text = ','.join(pairs + [f'le="{bound}"'])
+                lines.append(
+                    f'{self.name}_bucket{{{label_text}}} {cumulative}'
+                )
+            label_text = ','.join(pairs)
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return lines
+
+
+def escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LABELS = ('route', 'method')
+
+REQUEST_DURATION = Histogram(
+    'foodgram_request_duration_seconds', 'Полное время обработки запроса.',
+    SECONDS_BUCKETS, LABELS
+)
+REQUEST_DB_DURATION = Histogram(
+    'foodgram_request_db_seconds', 'Суммарное время SQL-запросов.',
+    SECONDS_BUCKETS, LABELS
+)
+REQUEST_SERIALIZE_DURATION = Histogram(
+    'foodgram_request_serialize_seconds', 'Время сериализации ответа.',
+    SECONDS_BUCKETS, LABELS
+)
+REQUEST_QUERIES = Histogram(
+    'foodgram_request_queries', 'Число SQL-запросов на запрос.',
+    (0, 1, 2, 3, 5, 10, 20, 50, 100), LABELS
+)
+HISTOGRAMS = (REQUEST_DURATION, REQUEST_DB_DURATION,
+              REQUEST_SERIALIZE_DURATION, REQUEST_QUERIES)
+
+_store = {'pid': None, 'path': None, 'flusher_pid': None, 'dirty': False}
+_flush_lock = threading.Lock()
+
+
+def process_file():
+    """Файл гистограмм текущего процесса в METRICS_DIR.
+
+    В имени кроме pid случайный суффикс: файл завершенного воркера
+    не перезаписывается новым процессом с тем же pid. Дочерний
+    процесс начинает со своих пустых гистограмм.
+    """
+    if _store['pid'] != os.getpid():
+        if _store['pid'] is not None:
+            for histogram in HISTOGRAMS:
+                with histogram.lock:
+                    histogram.series.clear()
+        _store['pid'] = os.getpid()
+        _store['path'] = (
+            Path(settings.METRICS_DIR) / f'{os.getpid()}-{uuid4().hex}.json'
+        )
+    return _store['path']
+
+
+def flush_metrics():
+    """Сохранить гистограммы процесса в его файл."""
+    with _flush_lock:
+        path = process_file()
+        snapshot = {
+            histogram.name: histogram.snapshot() for histogram in HISTOGRAMS
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(snapshot))
+        os.replace(temporary, path)
+
+
+def flush_periodically():
+    while True:
+        sleep(METRICS_FLUSH_INTERVAL)
+        if _store['dirty']:
+            _store['dirty'] = False
+            flush_metrics()
+
+
+def schedule_flush():
+    """Отметить новые замеры; фоновый поток процесса сохранит их.
+
+    Запись файла занимает около миллисекунды, поэтому запрос ее
+    не ждет.
+    """
+    _store['dirty'] = True
+    if _store['flusher_pid'] == os.getpid():
+        return
+    with _flush_lock:
+        if _store['flusher_pid'] != os.getpid():
+            _store['flusher_pid'] = os.getpid()
+            threading.Thread(target=flush_periodically, daemon=True).start()
+
+
+def collect_metrics():
+    """Сумма гистограмм всех процессов, живых и завершенных.
+
+    Счетчики каждого файла только растут, поэтому сумма тоже не
+    убывает, какой бы воркер ни ответил на сбор метрик.
+    """
+    flush_metrics()
+    merged = {histogram.name: {} for histogram in HISTOGRAMS}
+    for path in Path(settings.METRICS_DIR).glob('*.json'):
+        try:
+            snapshot = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        for name, series in snapshot.items():
+            if name not in merged:
+                continue
+            for labels, counts, total in series:
+                key = tuple(labels)
+                if key in merged[name]:
+                    old_counts, old_total = merged[name][key]
+                    counts = [a + b for a, b in zip(old_counts, counts)]
+                    total += old_total
+                merged[name][key] = (counts, total)
+    return merged
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class PerformanceMiddleware:
+    """Замеры каждого запроса.
+
+    Число SQL-запросов, время БД, сериализации и полное время
+    отдаются в заголовке Server-Timing и складываются в гистограммы
+    по маршрутам. Запросы дольше SLOW_REQUEST_MS пишутся в журнал
+    вместе с самыми медленными SQL. Гистограммы каждого процесса
+    сохраняются в METRICS_DIR и суммируются при сборе метрик.
+    У потоковых ответов замер заканчивается вместе с телом ответа:
+    SQL генератора тоже попадает в гистограммы.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        for connection in connections.all():
+            install_wrapper(connection)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={stats.db_time * 1000:.1f};'
+            f'desc="{stats.queries} queries"',
+            f'serialize;dur={stats.serialize_time * 1000:.1f}',
+            f'total;dur={(perf_counter() - stats.started) * 1000:.1f}',
+        ))
+        if response.streaming:
+            response.streaming_content = self.measure_stream(
+                request, response, iter(response.streaming_content), stats
+            )
+        else:
+            self.record(request, response, stats)
+        return response
+
+    def measure_stream(self, request, response, parts, stats):
+        """Части ответа, SQL которых идет в замер запроса."""
+        try:
+            while True:
+                token = current_stats.set(stats)
+                try:
+                    for connection in connections.all():
+                        install_wrapper(connection)
+                    part = next(parts, None)
+                finally:
+                    current_stats.reset(token)
+                if part is None:
+                    return
+                yield part
+        finally:
+            self.record(request, response, stats)
+
+    def record(self, request, response, stats):
+        total = perf_counter() - stats.started
+        labels = (route_name(request), request.method)
+        REQUEST_DURATION.observe(total, *labels)
+        REQUEST_DB_DURATION.observe(stats.db_time, *labels)
+        REQUEST_SERIALIZE_DURATION.observe(stats.serialize_time, *labels)
+        REQUEST_QUERIES.observe(stats.queries, *labels)
+        schedule_flush()
+        if total * 1000 >= settings.SLOW_REQUEST_MS:
+            self.log_slow(request, response, stats, total)
+
+    def log_slow(self, request, response, stats, total):
+        slowest = '\n'.join(
+            f'  {duration * 1000:.1f} мс: {sql}'
+            for duration, sql in stats.slowest(settings.SLOW_REQUEST_QUERIES)
+        )
+        logger.warning(
+            'Медленный запрос %s %s: %s, %.1f мс, SQL: %d за %.1f мс, '
+            'сериализация %.1f мс\n%s',
+            request.method, request.get_full_path(), response.status_code,
+            total * 1000, stats.queries, stats.db_time * 1000,
+            stats.serialize_time * 1000, slowest
+        )
+
+
+def metrics(request):
+    """Гистограммы всех процессов в текстовом формате Prometheus.
+
+    Доступны только с заголовком Authorization: Bearer METRICS_TOKEN;
+    без заданного токена сбор метрик выключен.
+    """
+    token = settings.METRICS_TOKEN
+    if not token or not compare_digest(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'
+    ):
+        return HttpResponseForbidden()
+    merged = collect_metrics()
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.expose(merged[histogram.name]))
+    return HttpResponse(
+        '\n'.join(lines) + '\n',
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,173 @@
+import asyncio
+import cProfile
+import io
+import json
+import pstats
+from pathlib import Path
+from time import perf_counter
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.http import FileResponse, Http404
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from recipes.async_read import render_response
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = 'profile'
+PROFILE_STATS_LIMIT = 50
+
+
+def profile_requested(request):
+    return (request.META.get(PROFILE_HEADER) == '1'
+            or request.GET.get(PROFILE_PARAM) == '1')
+
+
+def is_staff(request):
+    """Сотрудник по сессии или по токену DRF.
+
+    Найденный по токену пользователь передается DRF так же, как
+    force_authenticate, поэтому view не ищет токен второй раз.
+    """
+    if request.user.is_staff:
+        return True
+    try:
+        authenticated = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    if authenticated is None:
+        return False
+    request._force_auth_user, request._force_auth_token = authenticated
+    return authenticated[0].is_staff
+
+
+def profile_path(profile_id, suffix):
+    return Path(settings.PROFILE_DIR) / f'{profile_id}{suffix}'
+
+
+def modified(path):
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        # Удален параллельной очисткой в другом воркере.
+        return 0
+
+
+def prune_profiles(directory):
+    """Оставить PROFILE_KEEP последних профилей."""
+    reports = sorted(directory.glob('*.json'), key=modified)
+    for report in reports[:max(len(reports) - settings.PROFILE_KEEP, 0)]:
+        for path in (report, report.with_suffix('.prof')):
+            path.unlink(missing_ok=True)
+
+
+def profile_view(request, view, args, kwargs):
+    """Выполнить view под cProfile и сохранить профиль и SQL на диск.
+
+    Асинхронная обертка async_read снимается, и view выполняется
+    в текущем потоке. Возвращает None, если профилирование запросил
+    не сотрудник: тогда запрос обрабатывается как обычно.
+    """
+    if not is_staff(request):
+        return None
+    if asyncio.iscoroutinefunction(view):
+        view = view.__wrapped__
+    profile = cProfile.Profile()
+    started = perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        response = profile.runcall(
+            lambda: render_response(view(request, *args, **kwargs))
+        )
+    duration = perf_counter() - started
+    profile_id = uuid4().hex
+    directory = Path(settings.PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    profile.dump_stats(profile_path(profile_id, '.prof'))
+    report = {
+        'id': profile_id,
+        'created': timezone.now().isoformat(),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 1),
+        'queries': [
+            {'sql': query['sql'], 'time': query['time']}
+            for query in queries.captured_queries
+        ],
+    }
+    with open(profile_path(profile_id, '.json'), 'w',
+              encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    prune_profiles(directory)
+    response['X-Profile-Id'] = profile_id
+    return response
+
+
+class ProfilingMiddleware:
+    """Профилирование отдельного запроса по требованию сотрудника.
+
+    Включается заголовком X-Profile: 1 или параметром profile=1.
+    Без них стоит одной проверки в process_view. Под ASGI
+    профилируемый view выполняется синхронно в общем потоке, чтобы
+    весь его код попал в профиль. Должен стоять после
+    CsrfViewMiddleware и AuthenticationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            self.process_view = self.process_view_async
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not profile_requested(request):
+            return None
+        return profile_view(request, view_func, view_args, view_kwargs)
+
+    async def process_view_async(self, request, view_func, view_args,
+                                 view_kwargs):
+        if not profile_requested(request):
+            return None
+        return await sync_to_async(profile_view, thread_sensitive=True)(
+            request, view_func, view_args, view_kwargs
+        )
+
+
+class ProfileView(APIView):
+    """Сохраненный профиль: SQL и самые дорогие функции.
+
+    С параметром download=1 отдается исходный файл cProfile
+    для snakeviz или pstats.
+    """
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, profile_id):
+        stats_path = profile_path(profile_id, '.prof')
+        try:
+            with open(profile_path(profile_id, '.json'),
+                      encoding='utf-8') as file:
+                report = json.load(file)
+        except FileNotFoundError:
+            raise Http404
+        if request.query_params.get('download') == '1':
+            return FileResponse(open(stats_path, 'rb'), as_attachment=True,
+                                filename=f'{profile_id}.prof')
+        output = io.StringIO()
+        pstats.Stats(str(stats_path), stream=output).sort_stats(
+            'cumulative'
+        ).print_stats(PROFILE_STATS_LIMIT)
+        report['stats'] = output.getvalue()
+        return Response(report)
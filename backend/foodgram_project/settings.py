@@ -33,6 +33,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram_project.metrics.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -40,6 +41,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'foodgram_project.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram_project.urls'
@@ -79,6 +81,84 @@ DATABASES = {
     }
 }
 
+# Кэш общий для всех воркеров и реплик (BOOT_MODE=serve): по умолчанию
+# memcached из docker-compose. Алиасы различаются префиксом ключей
+# и при необходимости выносятся на отдельные серверы через
+# <ALIAS>_BACKEND и <ALIAS>_LOCATION.
+# FileBasedCache (CACHE_BACKEND=...filebased.FileBasedCache) годится
+# только для одного контейнера: каталог у каждого свой, сброс
+# в одной реплике не виден другим. Кроме того, каждый set() в Django 3.2
+# перечисляет все файлы каталога: около 3 мс при 1000 записей
+# и 160 мс при 100 000.
+MEMCACHED = 'django.core.cache.backends.memcached.PyMemcacheCache'
+FILE_CACHE = 'django.core.cache.backends.filebased.FileBasedCache'
+
+
+def cache_alias(env_prefix, key_prefix):
+    backend = os.getenv(f'{env_prefix}_BACKEND', MEMCACHED)
+    alias = {
+        'BACKEND': backend,
+        'LOCATION': os.getenv(
+            f'{env_prefix}_LOCATION',
+            f'/tmp/foodgram_{key_prefix}' if backend == FILE_CACHE
+            else 'cache:11211'
+        ),
+        'KEY_PREFIX': key_prefix,
+    }
+    if backend == FILE_CACHE:
+        alias['OPTIONS'] = {'MAX_ENTRIES': int(os.getenv(
+            f'{env_prefix}_MAX_ENTRIES', 10000
+        ))}
+    return alias
+
+
+CACHES = {
+    'default': cache_alias('CACHE', 'default'),
+    # Множества избранного, корзины и подписок пользователей.
+    'memberships': cache_alias('MEMBERSHIP_CACHE', 'memberships'),
+    # Версии справочников и журнал индекса по продуктам: их потеря
+    # сбрасывает все тела рецептов и индексы процессов.
+    'versions': cache_alias('VERSION_CACHE', 'versions'),
+}
+
+VERSION_CACHE = 'versions'
+
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+
+RECIPE_CACHE_TIMEOUT = 60 * 60
+
+MEMBERSHIP_CACHE = 'memberships'
+MEMBERSHIP_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Запросы на чтение под ASGI выполняются в пуле потоков.
+ASYNC_READ_THREAD_SENSITIVE = False
+
+# Рецепты авторов с большим числом подписчиков не раздаются в ленты,
+# а читаются напрямую при запросе ленты.
+FEED_FANOUT_LIMIT = 1000
+FEED_BACKFILL_LIMIT = 100
+
+# Сколько похожих рецептов хранится для рецепта и сколько рецептов
+# может быть в корзине LSH, чтобы она учитывалась (rebuild_similar).
+SIMILAR_RECIPES_LIMIT = 20
+SIMILAR_BUCKET_LIMIT = 1000
+
+# Запросы дольше порога (мс) пишутся в журнал foodgram.performance
+# вместе с самыми медленными SQL.
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
+SLOW_REQUEST_QUERIES = 5
+
+# Гистограммы каждого процесса сохраняются сюда и суммируются при сборе:
+# /metrics отвечает любой воркер. Сбор метрик требует заголовка
+# Authorization: Bearer METRICS_TOKEN и выключен, если токен не задан.
+METRICS_DIR = os.getenv('METRICS_DIR', '/tmp/foodgram_metrics')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Профили запросов, снятых по заголовку X-Profile: 1 от сотрудника.
+# Хранятся PROFILE_KEEP последних, старые удаляются при записи нового.
+PROFILE_DIR = os.getenv('PROFILE_DIR', '/tmp/foodgram_profiles')
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 200))
+
 AUTH_USER_MODEL = 'users.CustomUser'
 
 # Password validation
@@ -137,6 +217,10 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'foodgram_project.metrics.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS':
         'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
@@ -144,6 +228,22 @@ REST_FRAMEWORK = {
 
 PAGE_SIZE = 6
 
+INGREDIENT_SEARCH_LIMIT = 50
+
+# Сколько рецептов можно добавить или убрать одним пакетным запросом.
+BULK_RECIPES_LIMIT = 100
+
+# Поиск по продуктам: сколько ингредиентов можно передать, сколько
+# записей журнала изменений индекса догоняется на месте (при большем
+# отставании индекс процесса пересобирается) и сколько они хранятся.
+PANTRY_INGREDIENTS_LIMIT = 100
+PANTRY_LOG_LIMIT = 10000
+PANTRY_LOG_TIMEOUT = 60 * 60 * 24
+
+SHOPPING_LIST_FONT = os.getenv(
+    'SHOPPING_LIST_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
@@ -0,0 +1,40 @@
+# flake8: noqa
+from .settings import *
+
+DATABASES = {
+    'default': {
+        'ENGINE': os.environ.get('TEST_DB_ENGINE',
+                                 'django.db.backends.sqlite3'),
+        'NAME': os.environ.get('TEST_DB_NAME', BASE_DIR / 'test.sqlite3'),
+        'USER': os.environ.get('POSTGRES_USER', 'django'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', 5432),
+    }
+}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+MEDIA_ROOT = BASE_DIR / 'test_media'
+
+PROFILE_DIR = MEDIA_ROOT / 'profiles'
+
+METRICS_DIR = MEDIA_ROOT / 'metrics'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'memberships': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'memberships',
+    },
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'versions',
+    },
+}
+
+# Тестовый клиент синхронный: чтение должно идти в потоке теста,
+# внутри его транзакции.
+ASYNC_READ_THREAD_SENSITIVE = True
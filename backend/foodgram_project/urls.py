@@ -1,11 +1,17 @@
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from .metrics import metrics
+from .profiling import ProfileView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    re_path(r'^api/profiles/(?P<profile_id>[0-9a-f]{32})/$',
+            ProfileView.as_view()),
     path('api/', include('recipes.urls')),
+    path('metrics', metrics),
 ]
 
 
@@ -0,0 +1,7 @@
+"""Настройки gunicorn: файл читается из рабочего каталога сам."""
+
+
+def post_worker_init(worker):
+    from recipes.pantry_index import warm_pantry_index
+
+    warm_pantry_index()
@@ -2,7 +2,7 @@ from django.contrib import admin
 
 from .models import (Recipe, Ingredient, Tag,
                      RecipeIngredientList, RecipeTagList,
-                     Favourite, ShoppingCart)
+                     Favourite, ShoppingCart, ShoppingCartIngredient)
 from users.models import Subscriptions
 
 
@@ -26,10 +26,6 @@ class RecipeAdmin(admin.ModelAdmin):
     search_fields = ('name',)
     list_filter = ('name', 'author', 'tags')
 
-    @admin.display(description='Количество рецептов в избранном')
-    def favorites_count(self, obj):
-        return obj.favorite_recipes.all().count()
-
     @admin.display(description='Инридиенты')
     def ingredient_list(self, obj):
         return obj.recipe_ingredients.all().values_list(
@@ -41,6 +37,35 @@ class RecipeAdmin(admin.ModelAdmin):
         return obj.recipe_tags.all().values_list('tag__name', flat=True)
 
 
+class RecipeIngredientListAdmin(admin.ModelAdmin):
+    """Изменения количеств сразу переносятся в списки покупок."""
+
+    def save_model(self, request, obj, form, change):
+        old = RecipeIngredientList.objects.filter(pk=obj.pk).first()
+        super().save_model(request, obj, form, change)
+        if old is not None and old.recipe_id != obj.recipe_id:
+            self.change(old, None)
+            old = None
+        self.change(old, obj)
+
+    def delete_model(self, request, obj):
+        self.change(obj, None)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.change(obj, None)
+        super().delete_queryset(request, queryset)
+
+    @staticmethod
+    def change(old, new):
+        ShoppingCartIngredient.objects.change_recipe(
+            (new or old).recipe_id,
+            {old.ingredient_id: old.amount} if old else {},
+            {new.ingredient_id: new.amount} if new else {},
+        )
+
+
 class IngredientAdmin(admin.ModelAdmin):
     list_display = (
         'name',
@@ -53,8 +78,9 @@ class IngredientAdmin(admin.ModelAdmin):
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Tag, admin.ModelAdmin)
-admin.site.register(RecipeIngredientList, admin.ModelAdmin)
+admin.site.register(RecipeIngredientList, RecipeIngredientListAdmin)
 admin.site.register(RecipeTagList, admin.ModelAdmin)
 admin.site.register(Favourite, admin.ModelAdmin)
 admin.site.register(Subscriptions, admin.ModelAdmin)
 admin.site.register(ShoppingCart, admin.ModelAdmin)
+admin.site.register(ShoppingCartIngredient, admin.ModelAdmin)
@@ -0,0 +1,132 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections, connections
+from rest_framework.routers import DefaultRouter
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def render_response(response):
+    """Отрисовать ответ в текущем потоке.
+
+    Потоковое содержимое не читается: его по частям перебирает
+    StreamingASGIHandler.
+    """
+    if callable(getattr(response, 'render', None)):
+        response.render()
+    return response
+
+
+def run_read(view, request, *args, **kwargs):
+    """Выполнить view и отрисовать ответ в потоке из пула."""
+    pooled = not settings.ASYNC_READ_THREAD_SENSITIVE
+    if pooled:
+        close_old_connections()
+    try:
+        return render_response(view(request, *args, **kwargs))
+    finally:
+        if pooled:
+            close_old_connections()
+
+
+def async_read(view):
+    """Асинхронная обертка view для работы под ASGI.
+
+    В Django 3.2 нет асинхронного ORM, а синхронные view под ASGI
+    выполняются в одном общем потоке. Запросы на чтение уходят
+    в пул потоков (thread_sensitive=False) и обслуживаются
+    параллельно, у каждого потока свое соединение с БД. Запросы
+    на запись выполняются так же, как обычные синхронные view.
+    """
+    read = sync_to_async(
+        run_read, thread_sensitive=settings.ASYNC_READ_THREAD_SENSITIVE
+    )
+    write = sync_to_async(view, thread_sensitive=True)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            return await read(view, request, *args, **kwargs)
+        return await write(request, *args, **kwargs)
+
+    return wrapper
+
+
+class AsyncReadRouter(DefaultRouter):
+    """Роутер, оборачивающий в async_read вьюсеты с async_reads = True."""
+
+    def get_urls(self):
+        urls = super().get_urls()
+        for url in urls:
+            viewset = getattr(url.callback, 'cls', None)
+            if getattr(viewset, 'async_reads', False):
+                url.callback = async_read(url.callback)
+        return urls
+
+
+def encode(value, charset):
+    return value.encode(charset) if isinstance(value, str) else bytes(value)
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """ASGI-обработчик, читающий потоковые ответы вне цикла событий.
+
+    Django 3.2 перебирает streaming_content прямо в цикле событий,
+    где обращения к БД запрещены. Здесь каждая следующая часть берется
+    в отдельном потоке ответа, поэтому генератор читает строки
+    из курсора по мере отправки и память на скачивание не растет.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = [
+            (encode(header, 'ascii'), encode(value, 'latin1'))
+            for header, value in response.items()
+        ] + [
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+            for cookie in response.cookies.values()
+        ]
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        })
+        parts = iter(response)
+        if settings.ASYNC_READ_THREAD_SENSITIVE:
+            def run_shared(func, *args):
+                return sync_to_async(func, thread_sensitive=True)(*args)
+
+            await self.send_parts(run_shared, parts, send)
+            await run_shared(response.close)
+            return
+        # Один поток на ответ: курсор генератора остается на своем
+        # соединении с БД, которое закрывается в том же потоке.
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(1) as executor:
+            def run(func, *args):
+                return loop.run_in_executor(executor, partial(func, *args))
+
+            try:
+                await self.send_parts(run, parts, send)
+            finally:
+                await run(response.close)
+                await run(connections.close_all)
+
+    async def send_parts(self, run, parts, send):
+        while True:
+            part = await run(next, parts, None)
+            if part is None:
+                break
+            for chunk, _ in self.chunk_bytes(part):
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        await send({'type': 'http.response.body'})
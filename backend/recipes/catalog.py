@@ -0,0 +1,82 @@
+from hashlib import md5
+from time import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+
+
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+
+
+def version_cache():
+    return caches[settings.VERSION_CACHE]
+
+
+def version_key(catalog):
+    return f'catalog_version:{catalog}'
+
+
+def get_catalog_version(catalog):
+    """Версия справочника: токен и время последнего изменения.
+
+    Хранится в общем кэше, поэтому смена версии в одном процессе
+    видна всем процессам. Если ключ вытеснен, создается новая версия,
+    что приводит лишь к одному лишнему ответу 200 вместо 304.
+    """
+    return version_cache().get_or_set(
+        version_key(catalog),
+        lambda: {'token': uuid4().hex, 'last_modified': int(time())},
+        None
+    )
+
+
+def bump_catalog_version(catalog):
+    """Сменить версию сейчас и еще раз после коммита.
+
+    Повторная смена после коммита отбрасывает данные, которые
+    параллельный запрос мог прочитать из базы до коммита и закэшировать
+    под промежуточной версией.
+    """
+    def bump():
+        version_cache().set(
+            version_key(catalog),
+            {'token': uuid4().hex, 'last_modified': int(time())},
+            None
+        )
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def catalog_response(request, catalog, get_data, variant=''):
+    """Ответ со справочником с поддержкой ETag/Last-Modified и 304.
+
+    Тело сериализуется один раз на версию справочника и вариант
+    запроса и хранится в кэше уже готовым JSON. get_data вызывается
+    только при промахе кэша.
+    """
+    version = get_catalog_version(catalog)
+    digest = md5(variant.encode()).hexdigest()[:12]
+    etag = f'"{version["token"]}-{digest}"'
+    last_modified = version['last_modified']
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        body_key = f'catalog_body:{catalog}:{version["token"]}:{digest}'
+        body = cache.get(body_key)
+        if body is None:
+            body = JSONRenderer().render(get_data())
+            cache.set(body_key, body, settings.CATALOG_CACHE_TIMEOUT)
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,45 @@
+from heapq import merge
+
+from django.db.models import Q
+
+from .models import FeedEntry, Recipe
+
+FEED_ORDERING = ('-pub_date', '-id')
+
+
+def after(cursor, recipe_field):
+    if cursor is None:
+        return Q()
+    pub_date, pk = cursor
+    return Q(pub_date__lt=pub_date) | Q(
+        pub_date=pub_date, **{f'{recipe_field}__lt': pk}
+    )
+
+
+def feed_recipes(user, subscriptions, cursor, limit):
+    """Не более limit рецептов ленты строго после cursor.
+
+    Основной источник - строки FeedEntry пользователя, отсортированные
+    по индексу. Рецепты, которые при публикации не раздавались
+    (fanned_out=False), читаются по частичному индексу и сливаются
+    с лентой; повторы отбрасываются.
+    """
+    sources = [
+        FeedEntry.objects.filter(after(cursor, 'recipe'), user=user).order_by(
+            '-pub_date', '-recipe'
+        ).values_list('pub_date', 'recipe_id')[:limit]
+    ]
+    if subscriptions:
+        sources.append(Recipe.objects.filter(
+            after(cursor, 'id'), author__in=subscriptions, fanned_out=False
+        ).order_by(*FEED_ORDERING).values_list('pub_date', 'id')[:limit])
+    seen = set()
+    recipes = []
+    for pub_date, pk in merge(*map(list, sources), reverse=True):
+        if pk in seen:
+            continue
+        seen.add(pk)
+        recipes.append(Recipe(id=pk, pub_date=pub_date))
+        if len(recipes) == limit:
+            break
+    return recipes
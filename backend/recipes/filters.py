@@ -1,38 +1,101 @@
+from django import forms
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
 from rest_framework.filters import SearchFilter
 
-from recipes.models import Recipe
+from recipes.catalog import TAGS, get_catalog_version
+from recipes.models import (Favourite, Recipe, RecipeTagList, ShoppingCart,
+                            Tag)
+from recipes.search import search_recipes
 
 
 class IngredientFilter(SearchFilter):
     search_param = 'name'
 
 
-class RecipeFilter(FilterSet):
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__slug'
+def get_tag_ids():
+    """{slug: id} тегов из общего кэша для текущей версии справочника."""
+    token = get_catalog_version(TAGS)['token']
+    return cache.get_or_set(
+        f'tag_ids:{token}',
+        lambda: dict(Tag.objects.exclude(slug=None).values_list(
+            'slug', 'id'
+        )),
+        settings.CATALOG_CACHE_TIMEOUT
     )
 
-    is_favorited = filters.BooleanFilter(
-        method='get_objects_or_none')
+
+def tag_choices():
+    return [(slug, slug) for slug in sorted(get_tag_ids())]
+
+
+class LazyMultipleChoiceFilter(filters.MultipleChoiceFilter):
+    """Варианты из callable запрашиваются, только когда есть значение.
+
+    Поле django-filter превращает варианты в список при построении
+    формы, то есть на каждом запросе, поле Django - при проверке.
+    """
+    field_class = forms.MultipleChoiceField
+
+
+class RecipeFilter(FilterSet):
+    """Фильтры списка рецептов.
+
+    Теги и флаги пользователя проверяются подзапросами EXISTS
+    по индексам связующих таблиц, поэтому фильтры сочетаются
+    в любом порядке без JOIN, дублей строк и DISTINCT. Варианты
+    тегов берутся из кэша, автор сравнивается по id без проверочного
+    запроса.
+    """
+    search = filters.CharFilter(method='filter_search')
+    author = filters.NumberFilter(field_name='author_id')
+    tags = LazyMultipleChoiceFilter(
+        choices=tag_choices, method='filter_tags'
+    )
+    is_favorited = filters.BooleanFilter(method='filter_user_recipes')
     is_in_shopping_cart = filters.BooleanFilter(
-        method='get_objects_or_none'
+        method='filter_user_recipes'
+    )
+    ordering = filters.OrderingFilter(
+        fields=(
+            ('pub_date', 'pub_date'),
+            ('favorites_count', 'favorites_count'),
+            ('shopping_cart_count', 'shopping_cart_count'),
+            ('author__recipes_count', 'author_recipes_count'),
+            ('author__subscribers_count', 'author_subscribers_count'),
+        )
     )
 
+    USER_MODELS = {
+        'is_favorited': Favourite,
+        'is_in_shopping_cart': ShoppingCart,
+    }
+
     class Meta:
         model = Recipe
         fields = ('author', 'tags',
                   'is_in_shopping_cart', 'is_favorited')
 
-    def get_objects_or_none(self, queryset, name, value):
-        FILTERS_DICT = {
-            'is_favorited': Recipe.objects.filter(
-                favorite_recipes__user=self.request.user
-            ),
-            'is_in_shopping_cart': Recipe.objects.filter(
-                shopping_cart__user=self.request.user
-            )
-        }
-        if value:
-            return FILTERS_DICT[name]
-        return Recipe.objects.none
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов."""
+        tag_ids = get_tag_ids()
+        return queryset.filter(Exists(RecipeTagList.objects.filter(
+            recipe=OuterRef('pk'),
+            tag_id__in=[tag_ids[slug] for slug in value]
+        )))
+
+    def filter_user_recipes(self, queryset, name, value):
+        """Рецепты в Избранном или Списке покупок пользователя
+        или, при false, не в нем."""
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset if not value else queryset.none()
+        in_list = Exists(self.USER_MODELS[name].objects.filter(
+            user=user, recipe=OuterRef('pk')
+        ))
+        return queryset.filter(in_list if value else ~in_list)
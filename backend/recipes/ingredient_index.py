@@ -0,0 +1,98 @@
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from heapq import nsmallest
+
+from .catalog import INGREDIENTS, get_catalog_version
+from .models import Ingredient
+
+
+WORD_RE = re.compile(r'\w+')
+PREFIX_END = '\U0010ffff'
+
+EXACT, PREFIX, INFIX = range(3)
+
+
+def normalize(value):
+    return value.casefold().replace('ё', 'е').strip()
+
+
+class IngredientIndex:
+    """Индекс каталога ингредиентов для автодополнения.
+
+    Хранит отсортированные массивы нормализованных названий и слов
+    названий с параллельными массивами id, поиск по префиксу - это
+    два bisect по массиву. Ранжирование: точное совпадение,
+    затем префикс названия, затем префикс любого слова названия.
+    """
+
+    def __init__(self, rows):
+        self.items = {}
+        self.keys = {}
+        names, words = [], []
+        for pk, name, measurement_unit in rows:
+            self.items[pk] = {'id': pk, 'name': name,
+                              'measurement_unit': measurement_unit}
+            key = normalize(name)
+            self.keys[pk] = key
+            names.append((key, pk))
+            words.extend((word, pk) for word in WORD_RE.findall(key)[1:])
+        names.sort()
+        words.sort()
+        self.name_keys = [key for key, _ in names]
+        self.name_ids = array('q', (pk for _, pk in names))
+        self.word_keys = [word for word, _ in words]
+        self.word_ids = array('q', (pk for _, pk in words))
+        self.catalog = [self.items[pk] for pk in self.name_ids]
+
+    @classmethod
+    def from_db(cls):
+        return cls(Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit'
+        ).iterator())
+
+    @staticmethod
+    def prefix_range(keys, ids, prefix):
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + PREFIX_END, start)
+        return ids[start:end]
+
+    def search(self, query, limit=None):
+        """Ингредиенты по запросу, лучшие совпадения первыми."""
+        query = normalize(query)
+        if not query:
+            return self.catalog[:limit]
+        ranks = {}
+        for pk in self.prefix_range(self.name_keys, self.name_ids, query):
+            ranks[pk] = EXACT if self.keys[pk] == query else PREFIX
+        for pk in self.prefix_range(self.word_keys, self.word_ids, query):
+            ranks.setdefault(pk, INFIX)
+
+        def sort_key(pk):
+            return ranks[pk], len(self.keys[pk]), self.keys[pk]
+
+        if limit is None:
+            found = sorted(ranks, key=sort_key)
+        else:
+            found = nsmallest(limit, ranks, key=sort_key)
+        return [self.items[pk] for pk in found]
+
+
+_index = None
+_index_version = None
+_lock = threading.Lock()
+
+
+def get_ingredient_index():
+    """Индекс текущего процесса, пересобранный при смене версии
+    справочника ингредиентов."""
+    global _index, _index_version
+    version = get_catalog_version(INGREDIENTS)['token']
+    if _index is not None and _index_version == version:
+        return _index
+    with _lock:
+        if _index is None or _index_version != version:
+            _index = IngredientIndex.from_db()
+            _index_version = version
+    return _index
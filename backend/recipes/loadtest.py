@@ -0,0 +1,239 @@
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+COLLECTION = (settings.BASE_DIR.parent / 'postman-collection'
+              / 'diploma.postman_collection.json')
+
+SERVERS = {
+    'wsgi': ('foodgram_project.wsgi:application', ()),
+    'asgi': ('foodgram_project.asgi:application',
+             ('-k', 'uvicorn.workers.UvicornWorker')),
+}
+
+# Сценарий: вес при случайном выборе и запросы коллекции по именам.
+SCENARIOS = {
+    'browse': (6, (
+        'get_recipes_list // User',
+        'get_recipes_list_with_limit_param // User',
+        'get_recipe_detail // User',
+    )),
+    'filter_by_tag': (3, (
+        'get_tag_list // User',
+        'get_recipes_list_with_two_tags_param // User',
+    )),
+    'favorite': (2, (
+        'add_to_favorite // User',
+        'get_recipes_list_with_is_favorited_param // User',
+        'remove_from_favorite // User',
+    )),
+    'shopping_cart': (2, (
+        'add_to_shopping_cart // User',
+        'download_shopping_cart // User',
+        'remove_from_shopping_cart // User',
+    )),
+    'subscribe': (1, (
+        'create_subscription // User',
+        'get_subscription_list // User',
+        'delete_first_subscription // User',
+    )),
+}
+
+VARIABLE = re.compile(r'{{(\w+)}}')
+
+
+def load_collection(path=COLLECTION):
+    """{имя запроса: (метод, url, тело)} из коллекции Postman."""
+    with open(path, encoding='utf-8') as file:
+        collection = json.load(file)
+    requests = {}
+
+    def walk(items):
+        for item in items:
+            if 'item' in item:
+                walk(item['item'])
+                continue
+            request = item['request']
+            url = request['url']
+            requests.setdefault(item['name'], (
+                request['method'],
+                url['raw'] if isinstance(url, dict) else url,
+                (request.get('body') or {}).get('raw', ''),
+            ))
+
+    walk(collection['item'])
+    return requests
+
+
+def substitute(template, variables):
+    return VARIABLE.sub(lambda match: str(variables[match[1]]), template)
+
+
+class LoadTest:
+    """Виртуальные пользователи, проигрывающие сценарии из коллекции.
+
+    send(method, path, body, token) выполняет запрос и возвращает код
+    ответа (0 при сетевой ошибке). Переменные коллекции (id рецепта,
+    slug тегов, автор для подписки) выбираются случайно из dataset
+    на каждый проход сценария.
+    """
+
+    def __init__(self, send, dataset, collection=COLLECTION,
+                 think_time=0.0, seed=None):
+        requests = load_collection(collection)
+        missing = [name for _, steps in SCENARIOS.values()
+                   for name in steps if name not in requests]
+        if missing:
+            raise CommandError(
+                f'В коллекции нет запросов: {", ".join(missing)}'
+            )
+        self.steps = {
+            scenario: [requests[name] for name in steps]
+            for scenario, (_, steps) in SCENARIOS.items()
+        }
+        self.weights = [weight for weight, _ in SCENARIOS.values()]
+        self.send = send
+        self.dataset = dataset
+        self.think_time = think_time
+        self.seed = seed
+
+    def variables(self, rng, user_id):
+        second_tag, third_tag = rng.sample(self.dataset['tags'], 2)
+        return {
+            'baseUrl': '',
+            'userId': user_id,
+            'firstRecipeId': rng.choice(self.dataset['recipes']),
+            'secondTagSlug': second_tag,
+            'thirdTagSlug': third_tag,
+            'thirdUserId': rng.choice(self.dataset['authors']),
+        }
+
+    def virtual_user(self, index, token, user_id, deadline=None,
+                     iterations=None):
+        """Проходы сценариев до deadline или iterations проходов.
+
+        Возвращает список (метод и шаблон пути, мс, код ответа).
+        """
+        rng = random.Random(None if self.seed is None else self.seed + index)
+        samples = []
+        done = 0
+        while (deadline is None or time.monotonic() < deadline) and (
+            iterations is None or done < iterations
+        ):
+            scenario = rng.choices(list(self.steps), self.weights)[0]
+            variables = self.variables(rng, user_id)
+            for method, url, body in self.steps[scenario]:
+                started = time.perf_counter()
+                status = self.send(
+                    method, substitute(url, variables),
+                    substitute(body, variables), token
+                )
+                samples.append((
+                    f'{method} {url.replace("{{baseUrl}}", "")}',
+                    (time.perf_counter() - started) * 1000,
+                    status,
+                ))
+                if self.think_time:
+                    time.sleep(rng.expovariate(1 / self.think_time))
+            done += 1
+        return samples
+
+
+def report(samples, elapsed):
+    """Пропускная способность, перцентили и доля ошибок по маршрутам."""
+    routes = defaultdict(list)
+    for route, duration, status in samples:
+        routes[route].append((duration, status))
+    result = {}
+    for route, calls in sorted(routes.items()):
+        durations = [duration for duration, _ in calls]
+        errors = sum(1 for _, status in calls if not 0 < status < 400)
+        percentiles = (statistics.quantiles(durations, n=100)
+                       if len(durations) > 1 else durations * 99)
+        result[route] = {
+            'requests': len(calls),
+            'errors': errors,
+            'error_rate': round(errors / len(calls), 4),
+            'rps': round(len(calls) / elapsed, 1),
+            'p50_ms': round(percentiles[49], 1),
+            'p95_ms': round(percentiles[94], 1),
+            'p99_ms': round(percentiles[98], 1),
+        }
+    return result
+
+
+def http_sender(base_url):
+    """send для LoadTest поверх urllib."""
+    def send(method, path, body, token):
+        request = Request(
+            base_url + path, data=body.encode() if body else None,
+            method=method, headers={
+                'Authorization': f'Token {token}',
+                'Content-Type': 'application/json',
+            }
+        )
+        try:
+            with urlopen(request, timeout=30) as response:
+                response.read()
+                return response.status
+        except HTTPError as error:
+            return error.code
+        except (URLError, OSError):
+            return 0
+
+    return send
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urlopen(f'http://127.0.0.1:{port}/api/tags/', timeout=1)
+            return
+        except (URLError, OSError):
+            time.sleep(0.2)
+    raise CommandError(f'Сервер на порту {port} не запустился.')
+
+
+@contextmanager
+def running_server(server, workers):
+    """gunicorn с текущими настройками на свободном локальном порту.
+
+    К ALLOWED_HOSTS добавляется 127.0.0.1, по которому идут запросы.
+    """
+    target, worker_args = SERVERS[server]
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(workers),
+         *worker_args, '-b', f'127.0.0.1:{port}', '--log-level',
+         'warning', target],
+        cwd=settings.BASE_DIR, env={
+            **os.environ,
+            'ALLOWED_HOSTS': ','.join(settings.ALLOWED_HOSTS + ['127.0.0.1']),
+        }
+    )
+    try:
+        wait_ready(port)
+        yield port
+    finally:
+        process.terminate()
+        process.wait()
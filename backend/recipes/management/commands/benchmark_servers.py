@@ -0,0 +1,122 @@
+import json
+import socket
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from recipes.loadtest import SERVERS, running_server
+from recipes.models import Recipe
+from users.models import CustomUser
+
+
+def slow_client(port, stop):
+    """Клиент, который очень медленно отправляет заголовки запроса."""
+    try:
+        with socket.create_connection(('127.0.0.1', port)) as sock:
+            sock.sendall(b'GET /api/tags/ HTTP/1.1\r\nHost: localhost\r\n')
+            while not stop.wait(0.1):
+                sock.sendall(b'X')
+    except OSError:
+        pass
+
+
+class Command(BaseCommand):
+    """Сравнение пропускной способности WSGI и ASGI под нагрузкой.
+
+    Для каждого режима запускается gunicorn с теми же настройками
+    и числом воркеров, что в контейнере (sync-воркеры против
+    uvicorn.workers.UvicornWorker), к нему подключаются медленные
+    клиенты, а затем маршруты чтения опрашиваются конкурентно.
+    Используется текущая база данных.
+    """
+    help = 'Сравнивает пропускную способность gunicorn WSGI и ASGI.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', choices=SERVERS,
+                            default=list(SERVERS))
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на каждый маршрут.')
+        parser.add_argument('--slow-clients', type=int, default=2)
+        parser.add_argument('--output', help='Файл для отчета в JSON.')
+
+    def handle(self, *args, **options):
+        user = CustomUser.objects.order_by('pk').first()
+        recipe = Recipe.objects.order_by('pk').first()
+        if user is None or recipe is None:
+            raise CommandError('Нет данных: запустите generate_dataset.')
+        token, _ = Token.objects.get_or_create(user=user)
+        paths = (
+            '/api/tags/',
+            '/api/ingredients/?name=%D0%BC%D0%BE',
+            '/api/recipes/',
+            f'/api/recipes/{recipe.pk}/',
+            '/api/recipes/download_shopping_cart/',
+        )
+        report = {}
+        for server in options['servers']:
+            report[server] = self.run_server(server, paths, token.key,
+                                             options)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def run_server(self, server, paths, token, options):
+        stop = threading.Event()
+        with running_server(server, options['workers']) as port:
+            try:
+                slow = [
+                    threading.Thread(target=slow_client, args=(port, stop),
+                                     daemon=True)
+                    for _ in range(options['slow_clients'])
+                ]
+                for thread in slow:
+                    thread.start()
+                time.sleep(0.2)
+                results = {
+                    path: self.load(port, path, token, options)
+                    for path in paths
+                }
+            finally:
+                stop.set()
+        for path, result in results.items():
+            self.stdout.write(
+                f'{server} {path}: {result["rps"]} запросов/с, '
+                f'p50 {result["p50_ms"]} мс, p95 {result["p95_ms"]} мс, '
+                f'ошибок {result["errors"]}'
+            )
+        return results
+
+    def load(self, port, path, token, options):
+        request = Request(f'http://127.0.0.1:{port}{path}',
+                          headers={'Authorization': f'Token {token}'})
+
+        def call(_):
+            started = time.perf_counter()
+            try:
+                with urlopen(request, timeout=30) as response:
+                    response.read()
+            except (URLError, OSError):
+                return None
+            return (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            timings = list(pool.map(call, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+        done = [timing for timing in timings if timing is not None]
+        percentiles = (statistics.quantiles(done, n=100)
+                       if len(done) > 1 else [0] * 99)
+        return {
+            'rps': round(len(done) / elapsed, 1),
+            'p50_ms': round(percentiles[49], 1),
+            'p95_ms': round(percentiles[94], 1),
+            'errors': len(timings) - len(done),
+        }
@@ -0,0 +1,80 @@
+import json
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from recipes.models import Recipe, RecipeIngredientList
+
+
+class Command(BaseCommand):
+    """Потоковая выгрузка рецептов в JSONL.
+
+    Рецепты читаются пачками по возрастанию id (keyset), для каждой
+    пачки теги, ингредиенты и авторы подгружаются тремя запросами,
+    поэтому память не зависит от общего числа рецептов.
+    """
+    help = 'Выгружает рецепты в JSONL: один рецепт на строку.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-',
+                            help='Путь к файлу или "-" для stdout.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if output == '-':
+            self.write_recipes(self.stdout, options['batch_size'])
+        else:
+            with open(output, 'w', encoding='utf-8') as file:
+                self.write_recipes(file, options['batch_size'])
+
+    def batches(self, batch_size):
+        queryset = Recipe.objects.defer('search_vector').select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredientList.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        ).order_by('pk')
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                return
+            yield batch
+            last_pk = batch[-1].pk
+
+    def write_recipes(self, file, batch_size):
+        started = perf_counter()
+        exported = 0
+        for batch in self.batches(batch_size):
+            for recipe in batch:
+                file.write(json.dumps({
+                    'author': recipe.author.email,
+                    'name': recipe.name,
+                    'text': recipe.text,
+                    'cooking_time': recipe.cooking_time,
+                    'image': recipe.image.name,
+                    'pub_date': recipe.pub_date.isoformat(),
+                    'tags': [tag.slug for tag in recipe.tags.all()],
+                    'ingredients': [
+                        {
+                            'name': item.ingredient.name,
+                            'measurement_unit':
+                                item.ingredient.measurement_unit,
+                            'amount': item.amount,
+                        }
+                        for item in recipe.recipe_ingredients.all()
+                    ],
+                }, ensure_ascii=False) + '\n')
+            exported += len(batch)
+            elapsed = perf_counter() - started
+            self.stderr.write(
+                f'Выгружено {exported} рецептов, '
+                f'{exported / elapsed:.0f} рецептов/с'
+            )
@@ -0,0 +1,210 @@
+import json
+import random
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from recipes.catalog import INGREDIENTS, TAGS, bump_catalog_version
+from recipes.models import (Favourite, Ingredient, Recipe,
+                            RecipeIngredientList, RecipeTagList,
+                            ShoppingCart, Tag)
+from recipes.pantry_index import reset_pantry_index
+from users.models import CustomUser, Subscriptions
+
+
+PLACEHOLDER_IMAGE = 'recipes/placeholder.png'
+BENCH_PASSWORD = 'Bench12345'
+
+
+class Command(BaseCommand):
+    """Генерация воспроизводимого синтетического набора данных.
+
+    Пользователи, рецепты, ингредиенты рецептов, избранное, корзина
+    и подписки создаются пачками через bulk_create. Популярность
+    авторов и рецептов распределена по закону Ципфа, поэтому
+    у небольшого числа рецептов много добавлений в избранное,
+    как и в реальной нагрузке.
+    """
+    help = 'Генерирует синтетический набор данных для бенчмарков.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--recipes', type=int, default=1_000_000)
+        parser.add_argument('--seed', type=int, default=777)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--max-ingredients', type=int, default=12)
+        parser.add_argument('--max-favorites', type=int, default=30)
+        parser.add_argument('--max-cart', type=int, default=10)
+        parser.add_argument('--max-subscriptions', type=int, default=20)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.load_reference_data()
+        ingredient_ids = list(
+            Ingredient.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        tag_ids = list(Tag.objects.order_by('pk').values_list('pk', flat=True))
+        user_ids = self.create_users(options['users'])
+        recipe_ids = self.create_recipes(
+            options['recipes'], user_ids, ingredient_ids, tag_ids,
+            options['max_ingredients']
+        )
+        self.create_user_recipe_links(
+            Favourite, user_ids, recipe_ids, options['max_favorites']
+        )
+        self.create_user_recipe_links(
+            ShoppingCart, user_ids, recipe_ids, options['max_cart']
+        )
+        self.create_subscriptions(user_ids, options['max_subscriptions'])
+        self.reset_sequences()
+        call_command('rebuild_shopping_cart', stdout=self.stdout)
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('rebuild_feed', stdout=self.stdout)
+        call_command('rebuild_similar', full=True, stdout=self.stdout)
+        reset_pantry_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {len(user_ids)} пользователей, '
+            f'{len(recipe_ids)} рецептов.'
+        ))
+
+    def load_reference_data(self):
+        """Загрузить ингредиенты и теги из data/, если таблицы пусты."""
+        for model, fixture in ((Ingredient, 'ingredient.json'),
+                               (Tag, 'tag.json')):
+            if model.objects.exists():
+                continue
+            path = settings.BASE_DIR / 'data' / fixture
+            with open(path, encoding='utf-8') as file:
+                rows = json.load(file)
+            model.objects.bulk_create(
+                [model(**row['fields']) for row in rows],
+                ignore_conflicts=True
+            )
+        bump_catalog_version(INGREDIENTS)
+        bump_catalog_version(TAGS)
+
+    def zipf_weights(self, size, exponent=1.1):
+        """Накопленные веса популярности для rng.choices."""
+        return list(accumulate(
+            1 / (rank + 1) ** exponent for rank in range(size)
+        ))
+
+    def next_id(self, model):
+        last = model.objects.order_by('-pk').values_list('pk', flat=True)
+        return (last.first() or 0) + 1
+
+    def insert_in_batches(self, model, objects):
+        """Сохранить объекты из генератора пачками по batch_size."""
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                with transaction.atomic():
+                    model.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+
+    def create_users(self, count):
+        start = self.next_id(CustomUser)
+        password = make_password(BENCH_PASSWORD)
+        ids = list(range(start, start + count))
+        self.insert_in_batches(CustomUser, (
+            CustomUser(
+                id=pk,
+                username=f'bench_user_{pk}',
+                email=f'bench_user_{pk}@example.com',
+                first_name='Bench',
+                last_name=f'User {pk}',
+                password=password,
+            ) for pk in ids
+        ))
+        self.stdout.write(f'Пользователи: {count}')
+        return ids
+
+    def create_recipes(self, count, user_ids, ingredient_ids, tag_ids,
+                       max_ingredients):
+        rng = self.rng
+        start = self.next_id(Recipe)
+        ids = list(range(start, start + count))
+        author_weights = self.zipf_weights(len(user_ids))
+        authors = rng.choices(user_ids, cum_weights=author_weights, k=count)
+        self.insert_in_batches(Recipe, (
+            Recipe(
+                id=pk,
+                author_id=author,
+                name=f'Рецепт {pk}',
+                text=f'Описание рецепта {pk}',
+                cooking_time=rng.randint(5, 180),
+                image=PLACEHOLDER_IMAGE,
+            ) for pk, author in zip(ids, authors)
+        ))
+        self.insert_in_batches(RecipeIngredientList, (
+            RecipeIngredientList(
+                recipe_id=pk, ingredient_id=ingredient,
+                amount=rng.randint(1, 500)
+            )
+            for pk in ids
+            for ingredient in rng.sample(
+                ingredient_ids,
+                min(rng.randint(3, max_ingredients), len(ingredient_ids))
+            )
+        ))
+        self.insert_in_batches(RecipeTagList, (
+            RecipeTagList(recipe_id=pk, tag_id=tag)
+            for pk in ids
+            for tag in rng.sample(tag_ids, rng.randint(1, len(tag_ids)))
+        ))
+        self.stdout.write(f'Рецепты: {count}')
+        return ids
+
+    def popular_sample(self, population, cum_weights, size):
+        """Выборка без повторов с учетом популярности."""
+        chosen = set(self.rng.choices(
+            population, cum_weights=cum_weights, k=size
+        ))
+        return sorted(chosen)
+
+    def create_user_recipe_links(self, model, user_ids, recipe_ids,
+                                 max_per_user):
+        if not recipe_ids:
+            return
+        rng = self.rng
+        weights = self.zipf_weights(len(recipe_ids), exponent=0.8)
+        self.insert_in_batches(model, (
+            model(user_id=user, recipe_id=recipe)
+            for user in user_ids
+            for recipe in self.popular_sample(
+                recipe_ids, weights, rng.randint(0, max_per_user)
+            )
+        ))
+        self.stdout.write(f'{model._meta.verbose_name_plural}: готово')
+
+    def create_subscriptions(self, user_ids, max_per_user):
+        rng = self.rng
+        weights = self.zipf_weights(len(user_ids))
+        self.insert_in_batches(Subscriptions, (
+            Subscriptions(user_id=user, subscription_id=author)
+            for user in user_ids
+            for author in self.popular_sample(
+                user_ids, weights, rng.randint(0, max_per_user)
+            )
+            if author != user
+        ))
+        self.stdout.write('Подписки: готово')
+
+    def reset_sequences(self):
+        """Сдвинуть последовательности после вставки с явными pk."""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [CustomUser, Recipe]
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,179 @@
+import json
+import sys
+from collections import Counter
+from itertools import islice
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils.dateparse import parse_datetime
+
+from recipes.models import (FeedEntry, Ingredient, Recipe,
+                            RecipeIngredientList, RecipeTagList,
+                            SimilarityQueue, Tag)
+from recipes.pantry_index import record_recipe_changes
+from users.models import CustomUser
+
+
+def repeated(items):
+    """Значения, встречающиеся в items больше одного раза."""
+    return [item for item, count in Counter(items).items() if count > 1]
+
+
+class Command(BaseCommand):
+    """Потоковая загрузка рецептов из JSONL.
+
+    Файл читается пачками по batch_size строк. Для каждой пачки авторы
+    разрешаются одним запросом по email, теги и ингредиенты - по
+    справочникам, загруженным один раз, а Recipe, RecipeIngredientList
+    и RecipeTagList вставляются через bulk_create в одной транзакции.
+    Рецепты с неизвестными авторами, тегами или ингредиентами и с
+    повторами в одной строке, которые нарушили бы уникальность связей
+    и откатили бы всю пачку, пропускаются (или прерывают загрузку
+    с --strict).
+    """
+    help = 'Загружает рецепты из JSONL, выгруженного export_recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', nargs='?', default='-',
+                            help='Путь к файлу или "-" для stdin.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--strict', action='store_true',
+                            help='Прервать загрузку на первой ошибке.')
+
+    def handle(self, *args, **options):
+        self.strict = options['strict']
+        self.tags = dict(Tag.objects.values_list('slug', 'pk'))
+        self.ingredients = {
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.values_list('pk', 'name', 'measurement_unit')
+        }
+        if options['input'] == '-':
+            self.read_recipes(sys.stdin, options['batch_size'])
+        else:
+            with open(options['input'], encoding='utf-8') as file:
+                self.read_recipes(file, options['batch_size'])
+
+    def read_recipes(self, file, batch_size):
+        started = perf_counter()
+        imported = skipped = 0
+        lines = (line for line in file if line.strip())
+        while True:
+            batch = [json.loads(line) for line in islice(lines, batch_size)]
+            if not batch:
+                break
+            created = self.import_batch(batch)
+            imported += created
+            skipped += len(batch) - created
+            elapsed = perf_counter() - started
+            self.stderr.write(
+                f'Загружено {imported} рецептов, пропущено {skipped}, '
+                f'{imported / elapsed:.0f} рецептов/с'
+            )
+        if not connection.features.can_return_rows_from_bulk_insert:
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [Recipe]
+                ):
+                    cursor.execute(sql)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: загружено {imported}, пропущено {skipped}.'
+        ))
+
+    def skip(self, row, reason):
+        message = f'Рецепт "{row.get("name")}" пропущен: {reason}'
+        if self.strict:
+            raise CommandError(message)
+        self.stderr.write(message)
+
+    def resolve(self, batch):
+        """Пары (рецепт, строка) с разрешенными ссылками."""
+        authors = CustomUser.objects.in_bulk(
+            {row['author'] for row in batch}, field_name='email'
+        )
+        for row in batch:
+            author = authors.get(row['author'])
+            if author is None:
+                self.skip(row, f'нет автора {row["author"]}')
+                continue
+            missing_tags = set(row['tags']) - self.tags.keys()
+            if missing_tags:
+                self.skip(row, f'нет тегов {", ".join(missing_tags)}')
+                continue
+            repeated_tags = repeated(row['tags'])
+            if repeated_tags:
+                self.skip(row, f'повторяются теги {", ".join(repeated_tags)}')
+                continue
+            keys = [(item['name'], item['measurement_unit'])
+                    for item in row['ingredients']]
+            missing = [name for name, unit in keys
+                       if (name, unit) not in self.ingredients]
+            if missing:
+                self.skip(row, f'нет ингредиентов {", ".join(missing)}')
+                continue
+            repeated_keys = repeated(keys)
+            if repeated_keys:
+                self.skip(row, 'повторяются ингредиенты ' + ', '.join(
+                    name for name, unit in repeated_keys
+                ))
+                continue
+            recipe = Recipe(
+                author=author,
+                name=row['name'],
+                text=row['text'],
+                cooking_time=row['cooking_time'],
+                image=row['image'],
+            )
+            yield recipe, row
+
+    def allocate_ids(self, recipes):
+        """Явные id для СУБД, не возвращающих их из bulk_create."""
+        if connection.features.can_return_rows_from_bulk_insert:
+            return
+        last = Recipe.objects.order_by('-pk').values_list('pk', flat=True)
+        start = (last.first() or 0) + 1
+        for offset, recipe in enumerate(recipes):
+            recipe.pk = start + offset
+
+    @transaction.atomic
+    def import_batch(self, batch):
+        resolved = list(self.resolve(batch))
+        if not resolved:
+            return 0
+        recipes = [recipe for recipe, _ in resolved]
+        self.allocate_ids(recipes)
+        Recipe.objects.bulk_create(recipes)
+        dated = []
+        for recipe, row in resolved:
+            if row.get('pub_date'):
+                recipe.pub_date = parse_datetime(row['pub_date'])
+                dated.append(recipe)
+        Recipe.objects.bulk_update(dated, ['pub_date'])
+        RecipeIngredientList.objects.bulk_create(
+            RecipeIngredientList(
+                recipe=recipe,
+                ingredient_id=self.ingredients[
+                    (item['name'], item['measurement_unit'])
+                ],
+                amount=item['amount'],
+            )
+            for recipe, row in resolved for item in row['ingredients']
+        )
+        RecipeTagList.objects.bulk_create(
+            RecipeTagList(recipe=recipe, tag_id=self.tags[slug])
+            for recipe, row in resolved for slug in row['tags']
+        )
+        FeedEntry.objects.fan_out(recipes)
+        SimilarityQueue.objects.enqueue(recipe.pk for recipe in recipes)
+        record_recipe_changes(recipe.pk for recipe in recipes)
+        per_author = Counter(recipe.author_id for recipe in recipes)
+        CustomUser.objects.filter(pk__in=per_author).update(
+            recipes_count=F('recipes_count') + Case(
+                *[When(pk=pk, then=Value(count))
+                  for pk, count in per_author.items()],
+                output_field=IntegerField()
+            )
+        )
+        return len(recipes)
@@ -0,0 +1,127 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from recipes.loadtest import (COLLECTION, SERVERS, LoadTest, http_sender,
+                              report, running_server)
+from recipes.models import (Favourite, FeedEntry, Recipe, ShoppingCart,
+                            ShoppingCartIngredient, Tag)
+from users.models import CustomUser, Subscriptions
+
+LOAD_USER_EMAIL = 'loadtest_{}@example.com'
+
+
+class Command(BaseCommand):
+    """Нагрузочный тест на смешанных сценариях из коллекции Postman.
+
+    Виртуальные пользователи конкурентно проходят сценарии (просмотр,
+    фильтр по тегам, избранное, корзина со скачиванием списка,
+    подписка), собранные из запросов коллекции, с паузами между
+    запросами. Каждому виртуальному пользователю соответствует свой
+    пользователь loadtest_N, поэтому сценарии не мешают друг другу.
+    Сервер gunicorn запускается локально на текущей базе (SQLite или
+    PostgreSQL) либо указывается через --url.
+    """
+    help = 'Нагрузочный тест API по сценариям из коллекции Postman.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=SERVERS, default='asgi')
+        parser.add_argument('--url',
+                            help='Адрес уже запущенного сервера.')
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--users', type=int, default=20,
+                            help='Число виртуальных пользователей.')
+        parser.add_argument('--duration', type=float, default=30,
+                            help='Длительность теста в секундах.')
+        parser.add_argument('--think-time', type=float, default=0.5,
+                            help='Средняя пауза между запросами, с.')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--collection', default=COLLECTION)
+        parser.add_argument('--output', help='Файл для отчета в JSON.')
+
+    def handle(self, *args, **options):
+        dataset = self.load_dataset()
+        users = self.prepare_users(options['users'])
+        if options['url']:
+            result = self.run(options['url'].rstrip('/'), dataset, users,
+                              options)
+        else:
+            with running_server(options['server'],
+                                options['workers']) as port:
+                result = self.run(f'http://127.0.0.1:{port}', dataset,
+                                  users, options)
+        for route, stats in result.items():
+            self.stdout.write(
+                f'{route}: {stats["requests"]} запросов, '
+                f'{stats["rps"]} запросов/с, p50 {stats["p50_ms"]} мс, '
+                f'p95 {stats["p95_ms"]} мс, p99 {stats["p99_ms"]} мс, '
+                f'ошибок {stats["error_rate"]:.1%}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(result, file, ensure_ascii=False, indent=2)
+
+    def load_dataset(self):
+        """Случайная выборка рецептов, теги и авторы для переменных."""
+        recipes = list(Recipe.objects.order_by('?').values_list(
+            'pk', 'author_id'
+        )[:1000])
+        tags = list(Tag.objects.values_list('slug', flat=True))
+        if not recipes or len(tags) < 2:
+            raise CommandError('Нет данных: запустите generate_dataset.')
+        return {
+            'recipes': [pk for pk, _ in recipes],
+            'authors': sorted({author for _, author in recipes}),
+            'tags': tags,
+        }
+
+    def prepare_users(self, count):
+        """Пользователи loadtest_N с токенами и без избранного и подписок.
+
+        Остатки прерванного запуска удаляются вместе со сводным списком
+        покупок, счетчики после этого пересчитываются.
+        """
+        emails = [LOAD_USER_EMAIL.format(number) for number in range(count)]
+        password = make_password(None)
+        CustomUser.objects.bulk_create([
+            CustomUser(email=email, username=email.split('@')[0],
+                       first_name='Load', last_name='Test',
+                       password=password)
+            for email in emails
+        ], ignore_conflicts=True)
+        users = list(CustomUser.objects.filter(email__in=emails))
+        with transaction.atomic():
+            leftovers = sum(
+                model.objects.filter(user__in=users).delete()[0]
+                for model in (Favourite, ShoppingCart,
+                              ShoppingCartIngredient, Subscriptions,
+                              FeedEntry)
+            )
+        if leftovers:
+            call_command('reconcile_counters', stdout=self.stdout)
+        return [
+            (Token.objects.get_or_create(user=user)[0].key, user.pk)
+            for user in users
+        ]
+
+    def run(self, base_url, dataset, users, options):
+        load_test = LoadTest(
+            http_sender(base_url), dataset, options['collection'],
+            options['think_time'], options['seed']
+        )
+        started = time.monotonic()
+        deadline = started + options['duration']
+        with ThreadPoolExecutor(len(users)) as pool:
+            runs = [
+                pool.submit(load_test.virtual_user, index, token, user_id,
+                            deadline)
+                for index, (token, user_id) in enumerate(users)
+            ]
+            samples = [sample for run in runs for sample in run.result()]
+        return report(samples, time.monotonic() - started)
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import FeedEntry, Recipe
+
+
+class Command(BaseCommand):
+    """Пересборка лент подписок.
+
+    Нужна после загрузки данных в обход API (generate_dataset,
+    админка). Рецепты авторов, у которых не больше FEED_FANOUT_LIMIT
+    подписчиков, помечаются разосланными и раздаются в ленты; рецепты
+    остальных помечаются неразосланными, их лента читает напрямую.
+    """
+    help = 'Пересобирает ленты подписок пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        limit = settings.FEED_FANOUT_LIMIT
+        rows = Recipe.objects.filter(
+            author__subscribers__isnull=False, fanned_out=True
+        ).order_by().values_list(
+            'author__subscribers__user', 'pk', 'author_id', 'pub_date'
+        )
+        created = 0
+        with transaction.atomic():
+            Recipe.objects.filter(
+                author__subscribers_count__gt=limit
+            ).update(fanned_out=False)
+            Recipe.objects.filter(
+                author__subscribers_count__lte=limit
+            ).update(fanned_out=True)
+            FeedEntry.objects.all().delete()
+            batch = []
+            for user_id, recipe_id, author_id, pub_date in rows.iterator():
+                batch.append(FeedEntry(
+                    user_id=user_id, recipe_id=recipe_id,
+                    author_id=author_id, pub_date=pub_date
+                ))
+                if len(batch) >= batch_size:
+                    FeedEntry.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            FeedEntry.objects.bulk_create(batch)
+            created += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны: {created} строк.'
+        ))
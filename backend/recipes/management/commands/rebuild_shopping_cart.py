@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingCartIngredient
+
+
+class Command(BaseCommand):
+    """Пересборка и проверка агрегата списков покупок.
+
+    Без флагов таблица ShoppingCartIngredient пересобирается целиком
+    из ShoppingCart и RecipeIngredientList. С --verify агрегат
+    сравнивается с исходными данными потоково, без загрузки в память.
+    """
+    help = 'Пересобирает или проверяет агрегаты списков покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Только проверить, ничего не меняя.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            return self.verify()
+        self.rebuild(options['batch_size'])
+
+    def rebuild(self, batch_size):
+        created = 0
+        with transaction.atomic():
+            ShoppingCartIngredient.objects.all().delete()
+            batch = []
+            for user_id, ingredient_id, total in (
+                ShoppingCartIngredient.objects.source_totals().iterator()
+            ):
+                batch.append(ShoppingCartIngredient(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    total_amount=total
+                ))
+                if len(batch) >= batch_size:
+                    ShoppingCartIngredient.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            ShoppingCartIngredient.objects.bulk_create(batch)
+            created += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Агрегаты пересобраны: {created} строк.'
+        ))
+
+    def verify(self):
+        expected = ShoppingCartIngredient.objects.source_totals().order_by(
+            'cart_user_id', 'ingredient_id'
+        ).iterator()
+        actual = ShoppingCartIngredient.objects.order_by(
+            'user_id', 'ingredient_id'
+        ).values_list('user_id', 'ingredient_id', 'total_amount').iterator()
+        broken_users = set()
+        left, right = next(expected, None), next(actual, None)
+        while left is not None or right is not None:
+            if right is None or (left is not None and left[:2] < right[:2]):
+                broken_users.add(left[0])
+                left = next(expected, None)
+            elif left is None or right[:2] < left[:2]:
+                broken_users.add(right[0])
+                right = next(actual, None)
+            else:
+                if left[2] != right[2]:
+                    broken_users.add(left[0])
+                left, right = next(expected, None), next(actual, None)
+        if broken_users:
+            raise CommandError(
+                f'Расхождения у {len(broken_users)} пользователей: '
+                + ', '.join(map(str, sorted(broken_users)[:20]))
+            )
+        self.stdout.write(self.style.SUCCESS('Агрегаты корректны.'))
@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import Recipe, SimilarityQueue, SimilarRecipe
+from recipes.similarity import SimilarRecipes
+
+
+class Command(BaseCommand):
+    """Пересчет похожих рецептов.
+
+    Без --full разбирается очередь SimilarityQueue: новые рецепты
+    и рецепты с изменившимся набором ингредиентов пересчитываются,
+    а их соседи получают их в свои списки. Запускается по расписанию.
+    --full пересобирает корзины LSH и списки всех рецептов: нужен после
+    загрузки данных в обход API и время от времени, потому что веса
+    ингредиентов меняются вместе с каталогом рецептов. Каждая пачка
+    фиксируется своей транзакцией: списки заменяются на месте, поэтому
+    чтение видит прежний или новый список, а блокировки и журнал
+    транзакции не растут с размером каталога.
+    """
+    help = 'Пересчитывает похожие рецепты.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Пересобрать списки всех рецептов.')
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        similar = SimilarRecipes(settings.SIMILAR_RECIPES_LIMIT,
+                                 settings.SIMILAR_BUCKET_LIMIT)
+        batch_size = options['batch_size']
+        if options['full']:
+            count = self.rebuild(similar, batch_size)
+        else:
+            count = self.refresh(similar, batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Похожие рецепты пересчитаны: {count} рецептов.'
+        ))
+
+    def batches(self, batch_size):
+        last = 0
+        while True:
+            batch = list(Recipe.objects.filter(pk__gt=last).order_by(
+                'pk'
+            ).values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                return
+            yield batch
+            last = batch[-1]
+
+    def rebuild(self, similar, batch_size):
+        # Рецепты, измененные после индексации своей пачки, остаются
+        # в очереди до следующего запуска без --full.
+        for batch in self.batches(batch_size):
+            with transaction.atomic():
+                SimilarityQueue.objects.filter(recipe_id__in=batch).delete()
+                similar.index(batch)
+        count = 0
+        for batch in self.batches(batch_size):
+            with transaction.atomic():
+                SimilarRecipe.objects.filter(recipe_id__in=batch).delete()
+                similar.store(similar.scores(batch))
+            count += len(batch)
+        return count
+
+    def refresh(self, similar, batch_size):
+        count = 0
+        while True:
+            with transaction.atomic():
+                batch = list(SimilarityQueue.objects.order_by(
+                    'recipe_id'
+                ).values_list('recipe_id', flat=True)[:batch_size])
+                if not batch:
+                    return count
+                similar.refresh(batch)
+            count += len(batch)
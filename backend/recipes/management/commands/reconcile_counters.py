@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favourite, Recipe, ShoppingCart
+from users.models import CustomUser, Subscriptions
+
+
+def count_of(model, field):
+    """Подзапрос с числом строк model, ссылающихся на внешнюю строку."""
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favourite, 'recipe'),
+    (Recipe, 'shopping_cart_count', ShoppingCart, 'recipe'),
+    (CustomUser, 'recipes_count', Recipe, 'author'),
+    (CustomUser, 'subscribers_count', Subscriptions, 'subscription'),
+)
+
+
+class Command(BaseCommand):
+    """Сверка денормализованных счетчиков с исходными таблицами.
+
+    Счетчики обновляются через F() из сигналов post_save/post_delete,
+    пачки и импорт меняют их явно; команда исправляет расхождения
+    после записи в обход ORM (SQL, bulk_create без пересчета).
+    Каждый счетчик пересчитывается одним UPDATE.
+    """
+    help = 'Пересчитывает или проверяет счетчики рецептов и пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Только проверить, ничего не меняя.')
+
+    def handle(self, *args, **options):
+        mismatches = 0
+        with transaction.atomic():
+            for model, counter, source, field in COUNTERS:
+                actual = count_of(source, field)
+                broken = model.objects.annotate(
+                    actual=actual
+                ).filter(~Q(**{counter: actual}))
+                if options['verify']:
+                    count = broken.count()
+                else:
+                    count = model.objects.filter(
+                        pk__in=broken.values('pk')
+                    ).update(**{counter: actual})
+                mismatches += count
+                self.stdout.write(
+                    f'{model.__name__}.{counter}: расхождений {count}'
+                )
+        if options['verify'] and mismatches:
+            raise CommandError(f'Найдено расхождений: {mismatches}')
+        self.stdout.write(self.style.SUCCESS('Счетчики сверены.'))
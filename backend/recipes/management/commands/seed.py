@@ -0,0 +1,105 @@
+import json
+import os
+from hashlib import sha256
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.catalog import INGREDIENTS, TAGS, bump_catalog_version
+from recipes.models import Ingredient, SeedChecksum, Tag
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    """Идемпотентная загрузка начальных данных при старте контейнера.
+
+    Ингредиенты, теги и пользователи из data/ вставляются пачкой через
+    bulk_create(ignore_conflicts=True) по уникальным ограничениям
+    моделей. SHA-256 каждого файла сохраняется в SeedChecksum, и файл
+    с неизменившейся суммой не читается вовсе, поэтому повторный запуск
+    на прогретой базе стоит одного запроса на файл.
+    """
+    help = 'Загружает файлы начальных данных из data/, если они менялись.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Загрузить файлы без проверки сумм.')
+
+    def handle(self, *args, **options):
+        loaders = (
+            ('ingredient.json', self.load_ingredients),
+            ('tag.json', self.load_tags),
+            ('user.json', self.load_users),
+        )
+        for fixture, loader in loaders:
+            self.seed(fixture, loader, options['force'])
+        self.create_superuser()
+
+    def seed(self, fixture, loader, force):
+        with open(settings.BASE_DIR / 'data' / fixture, 'rb') as file:
+            content = file.read()
+        checksum = sha256(content).hexdigest()
+        if not force and SeedChecksum.objects.filter(
+            fixture=fixture, checksum=checksum
+        ).exists():
+            self.stdout.write(f'{fixture}: без изменений')
+            return
+        rows = [row['fields'] for row in json.loads(content)]
+        with transaction.atomic():
+            loader(rows)
+            SeedChecksum.objects.update_or_create(
+                fixture=fixture, defaults={'checksum': checksum}
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{fixture}: загружено записей - {len(rows)}'
+        ))
+
+    def load_ingredients(self, rows):
+        Ingredient.objects.bulk_create(
+            [Ingredient(**row) for row in rows], ignore_conflicts=True
+        )
+        bump_catalog_version(INGREDIENTS)
+
+    def load_tags(self, rows):
+        existing = Tag.objects.in_bulk(
+            [row['slug'] for row in rows], field_name='slug'
+        )
+        changed = []
+        for row in rows:
+            tag = existing.get(row['slug'])
+            if tag is not None and (tag.name, tag.color) != (row['name'],
+                                                             row['color']):
+                tag.name, tag.color = row['name'], row['color']
+                changed.append(tag)
+        Tag.objects.bulk_update(changed, ('name', 'color'))
+        Tag.objects.bulk_create(
+            [Tag(**row) for row in rows if row['slug'] not in existing],
+            ignore_conflicts=True
+        )
+        bump_catalog_version(TAGS)
+
+    def load_users(self, rows):
+        CustomUser.objects.bulk_create(
+            [CustomUser(**{**row, 'password': make_password(row['password'])})
+             for row in rows],
+            ignore_conflicts=True
+        )
+
+    def create_superuser(self):
+        """Суперпользователь из переменных DJANGO_SUPERUSER_*."""
+        email = os.getenv('DJANGO_SUPERUSER_EMAIL')
+        password = os.getenv('DJANGO_SUPERUSER_PASSWORD')
+        if not email or not password:
+            return
+        if CustomUser.objects.filter(email=email).exists():
+            return
+        CustomUser.objects.create_superuser(
+            email=email,
+            password=password,
+            username=os.getenv('DJANGO_SUPERUSER_USERNAME', email),
+            first_name=os.getenv('DJANGO_SUPERUSER_FIRST_NAME', 'Kirill'),
+            last_name=os.getenv('DJANGO_SUPERUSER_LAST_NAME', 'Novoselov'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Суперпользователь {email}'))
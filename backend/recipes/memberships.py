@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from users.models import Subscriptions
+from .models import Favourite, ShoppingCart
+
+FAVORITES = 'favorites'
+SHOPPING_CART = 'shopping_cart'
+SUBSCRIPTIONS = 'subscriptions'
+
+# Вид множества: модель и поле с id, которые в него входят.
+SOURCES = {
+    FAVORITES: (Favourite, 'recipe_id'),
+    SHOPPING_CART: (ShoppingCart, 'recipe_id'),
+    SUBSCRIPTIONS: (Subscriptions, 'subscription_id'),
+}
+KINDS = {model: kind for kind, (model, _) in SOURCES.items()}
+
+
+def membership_cache():
+    return caches[settings.MEMBERSHIP_CACHE]
+
+
+def membership_key(kind, user_id):
+    return f'membership:{kind}:{user_id}'
+
+
+def get_memberships(user, kinds):
+    """{вид: frozenset id} для пользователя.
+
+    Множества читаются из кэша одним get_many; отсутствующие
+    загружаются из базы одним запросом на вид и кладутся в кэш.
+    """
+    cache = membership_cache()
+    keys = {kind: membership_key(kind, user.pk) for kind in kinds}
+    cached = cache.get_many(keys.values())
+    memberships, loaded = {}, {}
+    for kind, key in keys.items():
+        if key in cached:
+            memberships[kind] = cached[key]
+            continue
+        model, field = SOURCES[kind]
+        memberships[kind] = loaded[key] = frozenset(
+            model.objects.filter(user=user).order_by().values_list(
+                field, flat=True
+            )
+        )
+    if loaded:
+        cache.set_many(loaded, settings.MEMBERSHIP_CACHE_TIMEOUT)
+    return memberships
+
+
+def request_memberships(request, *kinds):
+    """get_memberships с запоминанием на время запроса."""
+    if not request.user.is_authenticated:
+        return {kind: frozenset() for kind in kinds}
+    memberships = getattr(request, 'memberships', None)
+    if memberships is None:
+        memberships = request.memberships = {}
+    missing = [kind for kind in kinds if kind not in memberships]
+    if missing:
+        memberships.update(get_memberships(request.user, missing))
+    return memberships
+
+
+def is_member(request, kind, pk):
+    if request is None:
+        return False
+    return pk in request_memberships(request, kind)[kind]
+
+
+def invalidate_membership(instance):
+    """Сбросить множество пользователя, в которое входит instance."""
+    invalidate_memberships(type(instance), [instance.user_id])
+
+
+def invalidate_memberships(model, user_ids):
+    """Сбросить множества вида model у пользователей сейчас и еще раз
+    после коммита.
+
+    Множество не правится на месте: после отката транзакции в кэше
+    остался бы id, которого нет в базе, а параллельные записи одного
+    пользователя теряли бы изменения друг друга. Повторный сброс после
+    коммита убирает множество, которое параллельный запрос мог
+    прочитать из базы до коммита. Потеря ключа стоит одного запроса.
+    """
+    keys = [membership_key(KINDS[model], user_id) for user_id in user_ids]
+
+    def delete():
+        membership_cache().delete_many(keys)
+
+    delete()
+    transaction.on_commit(delete)
@@ -0,0 +1,108 @@
+# Generated by Django 3.2.3 on 2026-10-17 13:26
+
+import colorfield.fields
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Favourite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'verbose_name': 'Объект избранного',
+                'verbose_name_plural': 'Объекты избранного',
+                'ordering': ('recipe',),
+                'default_related_name': 'favorite_recipes',
+            },
+        ),
+        migrations.CreateModel(
+            name='Ingredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Наименование ингридиента')),
+                ('measurement_unit', models.CharField(max_length=200, verbose_name='Ед. измерения')),
+            ],
+            options={
+                'verbose_name': 'Ингридиент',
+                'verbose_name_plural': 'Ингридиенты',
+                'ordering': ('name',),
+            },
+        ),
+        migrations.CreateModel(
+            name='Recipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Название рецепта')),
+                ('text', models.TextField(verbose_name='Описание')),
+                ('cooking_time', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1, message='Минимальное время приготовелния - 1'), django.core.validators.MaxValueValidator(1000, message='Минимальное время приготовелния - 1000')], verbose_name='Время приготовления мин.')),
+                ('image', models.ImageField(upload_to='recipes/', verbose_name='Изображение блюда')),
+                ('pub_date', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата публикации')),
+            ],
+            options={
+                'verbose_name': 'Рецепт',
+                'verbose_name_plural': 'Рецепты',
+                'ordering': ('-pub_date',),
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeIngredientList',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1, message='Минимальное количество ингридиента = 1'), django.core.validators.MaxValueValidator(10000, message='Максимальное количество ингридиента = 10000')], verbose_name='Количество')),
+            ],
+            options={
+                'verbose_name': 'Ингридеиент в рецепте',
+                'verbose_name_plural': 'Ингредиенты в рецептах',
+                'ordering': ('recipe',),
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeTagList',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'verbose_name': 'Тег в рецепте',
+                'verbose_name_plural': 'Теги в рецептах',
+                'ordering': ('tag',),
+            },
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True, verbose_name='Тег')),
+                ('color', colorfield.fields.ColorField(blank=True, default=None, image_field=None, max_length=25, null=True, samples=None, unique=True, verbose_name='Цвет')),
+                ('slug', models.SlugField(max_length=200, null=True, unique=True, verbose_name='Cлаг')),
+            ],
+            options={
+                'verbose_name': 'Тег',
+                'verbose_name_plural': 'Теги',
+                'ordering': ('name',),
+            },
+        ),
+        migrations.CreateModel(
+            name='ShoppingCart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Объект корзины',
+                'verbose_name_plural': 'Объекты корзины',
+                'ordering': ('recipe',),
+                'default_related_name': 'shopping_cart',
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.2.3 on 2026-10-17 13:26
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# (модель, счетчик, источник, поле источника со ссылкой на модель).
+COUNTERS = (
+    ('recipes.Recipe', 'favorites_count', 'recipes.Favourite', 'recipe'),
+    ('recipes.Recipe', 'shopping_cart_count', 'recipes.ShoppingCart',
+     'recipe'),
+    ('users.CustomUser', 'recipes_count', 'recipes.Recipe', 'author'),
+    ('users.CustomUser', 'subscribers_count', 'users.Subscriptions',
+     'subscription'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    """Счетчики для данных, созданных до появления колонок."""
+    for model, counter, source, field in COUNTERS:
+        source = apps.get_model(source)
+        apps.get_model(model).objects.update(**{counter: Coalesce(Subquery(
+            source.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total'),
+            output_field=IntegerField()
+        ), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_pub_date_indexes'),
+        ('users', '0002_popularity_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Количество добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_cart_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Количество добавлений в список покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
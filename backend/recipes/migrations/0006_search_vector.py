@@ -0,0 +1,30 @@
+# Generated by Django 3.2.3 on 2026-10-17 13:26
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+from recipes.search import install_search, uninstall_search
+
+
+def install(apps, schema_editor):
+    install_search(schema_editor.connection.alias)
+
+
+def uninstall(apps, schema_editor):
+    uninstall_search(schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_popularity_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.3 on 2026-10-17 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeedChecksum',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fixture', models.CharField(max_length=200, unique=True, verbose_name='Файл')),
+                ('checksum', models.CharField(max_length=64, verbose_name='SHA-256')),
+                ('loaded_at', models.DateTimeField(auto_now=True, verbose_name='Загружен')),
+            ],
+            options={
+                'verbose_name': 'Контрольная сумма начальных данных',
+                'verbose_name_plural': 'Контрольные суммы начальных данных',
+            },
+        ),
+    ]
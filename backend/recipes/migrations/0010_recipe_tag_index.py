@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-17 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipetaglist',
+            index=models.Index(fields=['tag', 'recipe'], name='recipe_tag_tag_recipe_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.3 on 2026-10-17 13:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pulled(apps, schema_editor):
+    """Рецепты авторов, которые до сих пор читались напрямую."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.filter(
+        author__subscribers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).update(fanned_out=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_tag_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='fanned_out',
+            field=models.BooleanField(default=True, editable=False, verbose_name='Разослан в ленты подписчиков'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('fanned_out', False)), fields=['author', '-pub_date', '-id'], name='recipe_pulled_author_idx'),
+        ),
+        migrations.RunPython(mark_pulled, migrations.RunPython.noop),
+    ]
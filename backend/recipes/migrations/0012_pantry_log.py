@@ -0,0 +1,24 @@
+# Generated by Django 3.2.3 on 2026-10-17 13:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_fanned_out'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PantryLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last', models.PositiveBigIntegerField(default=0, verbose_name='Последняя запись')),
+            ],
+            options={
+                'verbose_name': 'Журнал индекса по продуктам',
+                'verbose_name_plural': 'Журналы индекса по продуктам',
+            },
+        ),
+    ]
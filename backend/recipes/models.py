@@ -1,4 +1,7 @@
-from django.db import models
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
 from django.utils.html import format_html
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth import get_user_model
@@ -8,6 +11,7 @@ from colorfield.fields import ColorField
 from foodgram_project.constants import (MIN_AMOUNT, MAX_AMOUNT,
                                         MIN_COOKING_TIME, MAX_COOKING_TIME,
                                         MAX_STRING_LENGTH)
+from users.models import CountersMixin, Subscriptions
 
 
 User = get_user_model()
@@ -53,8 +57,9 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(CountersMixin, models.Model):
     """Модель рецептов."""
+    counter_fields = ('favorites_count', 'shopping_cart_count')
     author = models.ForeignKey(
         User, on_delete=models.CASCADE,
         verbose_name='Автор',
@@ -89,9 +94,31 @@ class Recipe(models.Model):
         verbose_name="Дата публикации",
         db_index=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        'Количество добавлений в избранное',
+        default=0, editable=False, db_index=True
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        'Количество добавлений в список покупок',
+        default=0, editable=False, db_index=True
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+    fanned_out = models.BooleanField(
+        'Разослан в ленты подписчиков', default=True, editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'),
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='recipe_author_pub_date_idx'),
+            # Рецепты, которые лента читает напрямую, а не из FeedEntry.
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='recipe_pulled_author_idx',
+                         condition=models.Q(fanned_out=False)),
+        )
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -123,6 +150,10 @@ class RecipeTagList(models.Model):
                 name='unique_recipe_tag_list',
             ),
         )
+        indexes = (
+            models.Index(fields=('tag', 'recipe'),
+                         name='recipe_tag_tag_recipe_idx'),
+        )
 
     def __str__(self):
         return f'{self.recipe}: {self.tag}'
@@ -178,6 +209,7 @@ class UserRecipeModel(models.Model):
 
 class Favourite(UserRecipeModel):
     """Модель избранных рецептов."""
+    recipe_counter = 'favorites_count'
 
     class Meta:
         default_related_name = 'favorite_recipes'
@@ -197,6 +229,8 @@ class Favourite(UserRecipeModel):
 
 class ShoppingCart(UserRecipeModel):
     """Модель модель списка покупок."""
+    recipe_counter = 'shopping_cart_count'
+
     class Meta:
         default_related_name = 'shopping_cart'
         verbose_name = 'Объект корзины'
@@ -211,3 +245,354 @@ class ShoppingCart(UserRecipeModel):
 
     def __str__(self):
         return f'{self.user}: {self.recipe}'
+
+
+class ShoppingCartIngredientManager(models.Manager):
+    """Инкрементальное обновление агрегата корзины."""
+
+    def apply_deltas(self, user_ids, deltas):
+        """Прибавить deltas {ingredient_id: amount} каждому из user_ids."""
+        deltas = {pk: delta for pk, delta in deltas.items()
+                  if delta and pk is not None}
+        user_ids = list(user_ids)
+        if not deltas or not user_ids:
+            return
+        self.bulk_create(
+            [self.model(user_id=user_id, ingredient_id=ingredient_id,
+                        total_amount=0)
+             for user_id in user_ids for ingredient_id in deltas],
+            ignore_conflicts=True
+        )
+        rows = self.filter(user_id__in=user_ids, ingredient_id__in=deltas)
+        rows.update(total_amount=F('total_amount') + Case(
+            *[When(ingredient_id=pk, then=Value(delta))
+              for pk, delta in deltas.items()],
+            default=Value(0), output_field=IntegerField()
+        ))
+        rows.filter(total_amount__lte=0).delete()
+
+    def recipe_amounts(self, recipe):
+        return dict(RecipeIngredientList.objects.filter(
+            recipe=recipe
+        ).values_list('ingredient_id', 'amount'))
+
+    def recipes_amounts(self, recipe_ids):
+        """Суммы количеств ингредиентов по рецептам recipe_ids."""
+        return dict(RecipeIngredientList.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by().values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient_id', 'total'))
+
+    def add_recipe(self, user, recipe):
+        self.apply_deltas([user.pk], self.recipe_amounts(recipe))
+
+    def remove_recipe(self, user, recipe):
+        self.apply_deltas([user.pk], {
+            pk: -amount for pk, amount in self.recipe_amounts(recipe).items()
+        })
+
+    def add_recipes(self, user, recipe_ids):
+        self.apply_deltas([user.pk], self.recipes_amounts(recipe_ids))
+
+    def remove_recipes(self, user, recipe_ids):
+        self.apply_deltas([user.pk], {
+            pk: -amount
+            for pk, amount in self.recipes_amounts(recipe_ids).items()
+        })
+
+    def change_recipe(self, recipe, old_amounts, new_amounts):
+        """Учесть изменение ингредиентов рецепта во всех корзинах."""
+        deltas = {
+            pk: new_amounts.get(pk, 0) - old_amounts.get(pk, 0)
+            for pk in old_amounts.keys() | new_amounts.keys()
+        }
+        self.apply_deltas(
+            ShoppingCart.objects.filter(
+                recipe=recipe
+            ).values_list('user_id', flat=True),
+            deltas
+        )
+
+    def source_totals(self):
+        """Актуальные суммы, посчитанные по корзинам и рецептам."""
+        return RecipeIngredientList.objects.filter(
+            recipe__shopping_cart__isnull=False,
+            ingredient__isnull=False
+        ).values(
+            'ingredient_id', cart_user_id=F('recipe__shopping_cart__user'),
+        ).annotate(
+            total=Sum('amount')
+        ).values_list('cart_user_id', 'ingredient_id', 'total').order_by()
+
+
+class ShoppingCartIngredient(models.Model):
+    """Суммарное количество ингредиента в корзине пользователя.
+
+    Поддерживается в тех же транзакциях, что добавление и удаление
+    рецепта из корзины (сигналы ShoppingCart, в том числе каскад
+    от удаления рецепта или пользователя) и изменение ингредиентов
+    рецепта, поэтому скачивание списка покупок читает готовые строки
+    по индексу.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, verbose_name='Пользователь',
+        related_name='shopping_cart_ingredients'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, verbose_name='Ингридиент',
+        related_name='shopping_cart_totals'
+    )
+    total_amount = models.PositiveIntegerField('Количество')
+
+    objects = ShoppingCartIngredientManager()
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списках покупок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_cart_ingredient',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.total_amount}'
+
+
+class FeedEntryManager(models.Manager):
+    """Раздача рецептов в ленты подписчиков при публикации."""
+
+    def entries(self, user_ids, recipes):
+        return [
+            self.model(user_id=user_id, recipe_id=recipe.pk,
+                       author_id=recipe.author_id, pub_date=recipe.pub_date)
+            for user_id in user_ids for recipe in recipes
+        ]
+
+    def fan_out(self, recipes):
+        """Добавить рецепты в ленты подписчиков их авторов.
+
+        Рецепты авторов, у которых подписчиков больше
+        FEED_FANOUT_LIMIT, не раздаются и помечаются fanned_out=False:
+        лента читает их напрямую, даже если потом подписчиков станет
+        меньше.
+        """
+        pulled = [
+            recipe.pk for recipe in recipes
+            if recipe.author.subscribers_count > settings.FEED_FANOUT_LIMIT
+        ]
+        if pulled:
+            Recipe.objects.filter(pk__in=pulled).update(fanned_out=False)
+        recipes = [recipe for recipe in recipes if recipe.pk not in pulled]
+        if not recipes:
+            return
+        subscribers = {}
+        for user_id, author_id in Subscriptions.objects.filter(
+            subscription__in={recipe.author_id for recipe in recipes}
+        ).order_by().values_list('user_id', 'subscription_id'):
+            subscribers.setdefault(author_id, []).append(user_id)
+        self.bulk_create(
+            [entry for recipe in recipes for entry in self.entries(
+                subscribers.get(recipe.author_id, ()), [recipe]
+            )],
+            ignore_conflicts=True
+        )
+
+    def follow(self, user, author):
+        """Заполнить ленту последними разосланными рецептами автора.
+
+        Не разосланные рецепты лента читает напрямую.
+        """
+        recipes = Recipe.objects.filter(
+            author=author, fanned_out=True
+        ).order_by('-pub_date', '-id').only(
+            'id', 'author_id', 'pub_date'
+        )[:settings.FEED_BACKFILL_LIMIT]
+        self.bulk_create(self.entries([user.pk], recipes),
+                         ignore_conflicts=True)
+
+    def unfollow(self, user, author):
+        self.filter(user=user, author=author).delete()
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписчика.
+
+    Строки создаются при публикации рецепта (fan-out on write), поэтому
+    лента читается по индексу (user, -pub_date, -recipe) без соединения
+    подписок с рецептами. Дата публикации копируется из рецепта.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, verbose_name='Подписчик',
+        related_name='feed_entries'
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, verbose_name='Рецепт',
+        related_name='feed_entries'
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, verbose_name='Автор',
+        related_name='+'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    objects = FeedEntryManager()
+
+    class Meta:
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Рецепты в лентах'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry',
+            ),
+        )
+        indexes = (
+            models.Index(fields=('user', '-pub_date', '-recipe'),
+                         name='feed_user_pub_date_idx'),
+            models.Index(fields=('user', 'author'),
+                         name='feed_user_author_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.user}: {self.recipe}'
+
+
+class SimilarRecipe(models.Model):
+    """Похожий рецепт по составу ингредиентов.
+
+    Строки пишет команда rebuild_similar: для каждого рецепта хранится
+    не больше SIMILAR_RECIPES_LIMIT соседей с наибольшим взвешенным
+    коэффициентом Жаккара, читаются они по индексу (recipe, -score).
+    """
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, verbose_name='Рецепт',
+        related_name='similar_recipes'
+    )
+    similar = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, verbose_name='Похожий рецепт',
+        related_name='+'
+    )
+    score = models.FloatField('Похожесть')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe',
+            ),
+        )
+        indexes = (
+            models.Index(fields=('recipe', '-score'),
+                         name='similar_recipe_score_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.recipe} ~ {self.similar}'
+
+
+class RecipeBucket(models.Model):
+    """Корзина LSH, в которую рецепт попал по одной из полос MinHash.
+
+    Рецепты из общей корзины - кандидаты в похожие, их выборка идет
+    по индексу на bucket.
+    """
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, verbose_name='Рецепт',
+        related_name='+'
+    )
+    bucket = models.BigIntegerField('Корзина')
+
+    class Meta:
+        verbose_name = 'Корзина LSH'
+        verbose_name_plural = 'Корзины LSH'
+        indexes = (
+            models.Index(fields=('bucket', 'recipe'),
+                         name='recipe_bucket_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.recipe}: {self.bucket}'
+
+
+class SimilarityQueueManager(models.Manager):
+
+    def enqueue(self, recipe_ids):
+        self.bulk_create(
+            [self.model(recipe_id=pk) for pk in recipe_ids],
+            ignore_conflicts=True
+        )
+
+
+class SimilarityQueue(models.Model):
+    """Рецепт, похожие которого нужно пересчитать.
+
+    Попадает сюда при создании и при изменении набора ингредиентов,
+    очередь разбирает rebuild_similar.
+    """
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True,
+        verbose_name='Рецепт', related_name='+'
+    )
+
+    objects = SimilarityQueueManager()
+
+    class Meta:
+        verbose_name = 'Рецепт в очереди похожих'
+        verbose_name_plural = 'Рецепты в очереди похожих'
+
+    def __str__(self):
+        return str(self.recipe)
+
+
+class SeedChecksum(models.Model):
+    """Контрольная сумма загруженного файла начальных данных."""
+    fixture = models.CharField('Файл', max_length=MAX_STRING_LENGTH,
+                               unique=True)
+    checksum = models.CharField('SHA-256', max_length=64)
+    loaded_at = models.DateTimeField('Загружен', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Контрольная сумма начальных данных'
+        verbose_name_plural = 'Контрольные суммы начальных данных'
+
+    def __str__(self):
+        return f'{self.fixture}: {self.checksum}'
+
+
+class PantryLogManager(models.Manager):
+
+    def next_number(self):
+        """Выдать следующий номер записи журнала.
+
+        Номер увеличивается в базе под блокировкой строки, поэтому
+        процессы не получают одинаковых номеров на любом бэкенде кэша.
+        """
+        with transaction.atomic():
+            self.get_or_create(pk=1)
+            self.filter(pk=1).update(last=F('last') + 1)
+            return self.values_list('last', flat=True).get(pk=1)
+
+    def last_number(self):
+        return self.filter(pk=1).values_list('last', flat=True).first() or 0
+
+
+class PantryLog(models.Model):
+    """Номер последней записи журнала изменений индекса по продуктам.
+
+    Единственная строка; сами записи лежат в общем кэше.
+    """
+    last = models.PositiveBigIntegerField('Последняя запись', default=0)
+
+    objects = PantryLogManager()
+
+    class Meta:
+        verbose_name = 'Журнал индекса по продуктам'
+        verbose_name_plural = 'Журналы индекса по продуктам'
+
+    def __str__(self):
+        return str(self.last)
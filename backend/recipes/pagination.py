@@ -1,9 +1,118 @@
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 from foodgram_project.settings import PAGE_SIZE
 
 
 class CustomPagination(PageNumberPagination):
+    """Постраничная пагинация с опциональным режимом курсора.
+
+    По умолчанию работают page и limit. Если в запросе есть параметр
+    cursor (для первой страницы - пустой), используется keyset-пагинация
+    по полям view.cursor_ordering: без OFFSET и без COUNT(*), страницы
+    не сдвигаются при появлении новых записей.
+    """
     page_size = PAGE_SIZE
     page_query_param = 'page'
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, 'cursor_ordering', None)
+        self.cursor_mode = (
+            ordering is not None
+            and self.cursor_query_param in request.query_params
+        )
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        def fetch(cursor, limit):
+            ordered = queryset.order_by(*ordering)
+            if cursor is not None:
+                ordered = ordered.filter(self.after(cursor))
+            return list(ordered[:limit])
+
+        return self.paginate_keyset(fetch, queryset.model, request, ordering)
+
+    def paginate_keyset(self, fetch, model, request, ordering):
+        """Страница курсора из fetch(cursor, limit).
+
+        fetch возвращает не более limit объектов строго после курсора
+        в порядке ordering; так можно листать не только queryset,
+        но и слияние нескольких источников.
+        """
+        self.cursor_mode = True
+        self.request = request
+        self.ordering = ordering
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(
+            model, request.query_params.get(self.cursor_query_param, '')
+        )
+        page = fetch(cursor, page_size + 1)
+        self.next_values = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            last = page[-1]
+            self.next_values = [
+                getattr(last, field.lstrip('-')) for field in ordering
+            ]
+        return page
+
+    def after(self, cursor):
+        """Условие «строго после курсора» для составного порядка."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, cursor):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def encode_cursor(self, values):
+        raw = json.dumps(
+            [value.isoformat() if hasattr(value, 'isoformat') else value
+             for value in values]
+        )
+        return b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, model, encoded):
+        if not encoded:
+            return None
+        try:
+            values = json.loads(b64decode(encoded.encode()).decode())
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (BinasciiError, UnicodeDecodeError, ValueError, TypeError,
+                DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_cursor_link(self):
+        if self.next_values is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            self.encode_cursor(self.next_values)
+        )
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_cursor_link(),
+            'previous': None,
+            'results': data,
+        })
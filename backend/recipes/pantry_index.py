@@ -0,0 +1,387 @@
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter, deque
+from itertools import repeat
+from time import monotonic
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from .catalog import version_cache
+from .models import PantryLog, RecipeIngredientList
+
+GENERATION_KEY = 'pantry_index:generation'
+
+# Сколько секунд ждать запись журнала, номер которой уже выдан:
+# писатель сохраняет ее сразу после получения номера.
+PANTRY_LOG_WAIT = 5
+
+
+def change_key(generation, number):
+    return f'pantry_index:{generation}:{number}'
+
+
+def get_generation():
+    return version_cache().get_or_set(
+        GENERATION_KEY, lambda: uuid4().hex, None
+    )
+
+
+def reset_pantry_index():
+    """Новое поколение журнала: все процессы пересоберут индекс."""
+    version_cache().set(GENERATION_KEY, uuid4().hex, None)
+
+
+def record_recipe_changes(recipe_ids):
+    """Записать в журнал рецепты с изменившимся набором ингредиентов.
+
+    Запись делается после коммита, поэтому процесс, прочитавший ее,
+    увидит в базе новые ингредиенты. Номер записи выдает база:
+    incr файлового кэша не атомарен между процессами.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+
+    def record():
+        number = PantryLog.objects.next_number()
+        version_cache().set(change_key(get_generation(), number),
+                            recipe_ids, settings.PANTRY_LOG_TIMEOUT)
+
+    transaction.on_commit(record)
+
+
+def to_bitset(recipe_ids, size):
+    """Битовая маска из id меньше size.
+
+    Единицы расставляются в строке двоичных цифр через map, без цикла
+    в Python, строка переводится в число за линейное время.
+    """
+    digits = bytearray(b'0') * size
+    deque(map(digits.__setitem__, recipe_ids, repeat(ord('1'))), maxlen=0)
+    return int(digits[::-1], 2)
+
+
+def descending_ids(bitset, skip, count):
+    """count id из битовой маски по убыванию после первых skip."""
+    bits = bin(bitset)[2:]
+    top = len(bits) - 1
+    found = []
+    position = -1
+    while len(found) < count:
+        position = bits.find('1', position + 1)
+        if position < 0:
+            break
+        if skip:
+            skip -= 1
+            continue
+        found.append(top - position)
+    return found
+
+
+def add_to_slices(slices, bitset, level=0):
+    """Прибавить 1 << level к счетчикам рецептов из маски bitset."""
+    slices.extend(repeat(0, level - len(slices)))
+    carry = bitset
+    while carry:
+        if level == len(slices):
+            slices.append(carry)
+            return
+        slices[level], carry = slices[level] ^ carry, slices[level] & carry
+        level += 1
+
+
+class PantryMatches:
+    """Найденные рецепты для пагинатора.
+
+    Число совпавших ингредиентов каждого рецепта хранится по битам
+    в масках slices (bit-sliced счетчик), поэтому рецепты с заданными
+    числом совпадений и размером выбираются парой операций над
+    масками. Группы (совпало, размер) перебираются в порядке
+    ранжирования, id извлекаются только для запрошенной страницы.
+    """
+
+    def __init__(self, slices, found_any, size_masks, max_found):
+        self.slices = slices
+        self.found_any = found_any
+        self.size_masks = size_masks
+        self.max_found = min(max_found, (1 << len(slices)) - 1)
+        self.total = bin(found_any).count('1')
+
+    def __len__(self):
+        return self.total
+
+    def exactly(self, found):
+        mask = self.found_any
+        for level, bits in enumerate(self.slices):
+            mask &= bits if found >> level & 1 else ~bits
+        return mask
+
+    def groups(self):
+        """(доля, недостающих, маска) в порядке ранжирования.
+
+        Одинаковые доля и число недостающих бывают у разных пар
+        (совпало, размер) только при полном совпадении, такие маски
+        объединяются, чтобы id шли по убыванию.
+        """
+        sizes = {
+            size: mask & self.found_any
+            for size, mask in self.size_masks.items()
+            if mask & self.found_any
+        }
+        groups = {}
+        for size in sizes:
+            for found in range(1, min(size, self.max_found) + 1):
+                groups.setdefault(
+                    (-found / size, size - found), []
+                ).append((found, size))
+        exactly = {}
+        for key in sorted(groups):
+            mask = 0
+            for found, size in groups[key]:
+                if found not in exactly:
+                    exactly[found] = self.exactly(found)
+                mask |= exactly[found] & sizes[size]
+            if mask:
+                yield -key[0], key[1], mask
+
+    def __getitem__(self, item):
+        skip = item.start or 0
+        count = item.stop - skip
+        page = []
+        for coverage, missing, mask in self.groups():
+            if len(page) >= count:
+                break
+            size = bin(mask).count('1')
+            if skip >= size:
+                skip -= size
+                continue
+            page.extend(
+                (pk, coverage, missing)
+                for pk in descending_ids(mask, skip, count - len(page))
+            )
+            skip = 0
+        return page
+
+
+class PantryIndex:
+    """Инвертированный индекс ингредиент -> рецепты для поиска
+    по продуктам.
+
+    Список рецептов ингредиента хранится отсортированным массивом id
+    или битовой маской по id рецепта (целое число) - что компактнее:
+    маска выгоднее, когда ингредиент есть больше чем в 1/64 рецептов.
+    Размеры рецептов - массив по id и маски рецептов каждого размера.
+    Поиск складывает маски имеющихся продуктов и перебирает только
+    попадания по редким, а не все рецепты каталога.
+    Изменения рецептов применяются на месте по журналу в кэше версий:
+    там он не вытесняется телами рецептов. Прежний набор ингредиентов
+    рецепта берется из плоского массива id со смещениями по рецептам.
+    """
+
+    def __init__(self, rows, generation=None, position=0):
+        """rows - пары (рецепт, ингредиент), упорядоченные по рецепту."""
+        self.postings = {}
+        self.sizes = array('H')
+        self.starts = array('I')
+        self.recipe_ingredients = array('I')
+        self.replaced = {}
+        for recipe_id, ingredient_id in rows:
+            self.postings.setdefault(
+                ingredient_id, array('q')
+            ).append(recipe_id)
+            self.grow(recipe_id)
+            if not self.sizes[recipe_id]:
+                self.starts[recipe_id] = len(self.recipe_ingredients)
+            self.sizes[recipe_id] += 1
+            self.recipe_ingredients.append(ingredient_id)
+        for pk, posting in self.postings.items():
+            if self.is_dense(posting):
+                self.postings[pk] = to_bitset(posting, len(self.sizes))
+        by_size = {}
+        for recipe_id, size in enumerate(self.sizes):
+            if size:
+                by_size.setdefault(size, array('q')).append(recipe_id)
+        self.size_masks = {
+            size: to_bitset(recipe_ids, len(self.sizes))
+            for size, recipe_ids in by_size.items()
+        }
+        self.generation = generation
+        self.position = position
+        self.missing_since = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_db(cls, generation=None, position=0):
+        rows = RecipeIngredientList.objects.order_by(
+            'recipe_id'
+        ).values_list('recipe_id', 'ingredient_id')
+        return cls(rows.iterator(), generation, position)
+
+    def grow(self, recipe_id):
+        if recipe_id >= len(self.sizes):
+            missing = recipe_id + 1 - len(self.sizes)
+            self.sizes.frombytes(bytes(self.sizes.itemsize * missing))
+            self.starts.frombytes(bytes(self.starts.itemsize * missing))
+
+    def ingredients_of(self, recipe_id):
+        """Ингредиенты рецепта в индексе: замененные или исходные."""
+        if recipe_id in self.replaced:
+            return self.replaced[recipe_id]
+        start = self.starts[recipe_id]
+        return self.recipe_ingredients[start:start + self.sizes[recipe_id]]
+
+    def is_dense(self, posting):
+        return len(posting) * 64 > len(self.sizes)
+
+    def search(self, ingredient_ids):
+        """Рецепты, в которых есть хотя бы один из ингредиентов.
+
+        Порядок: доля имеющихся ингредиентов по убыванию, затем
+        число недостающих, затем новые рецепты первыми. Элементы -
+        (id рецепта, доля, число недостающих). Маски частых продуктов
+        складываются как есть, попадания по массивам редких считаются
+        Counter и добавляются к счетчику по битам числа попаданий.
+        """
+        with self.lock:
+            postings = [
+                self.postings[pk] for pk in set(ingredient_ids)
+                if self.postings.get(pk)
+            ]
+            sparse = Counter()
+            for posting in postings:
+                if not isinstance(posting, int):
+                    sparse.update(posting)
+            size_masks = dict(self.size_masks)
+            capacity = len(self.sizes)
+        slices = []
+        for posting in postings:
+            if isinstance(posting, int):
+                add_to_slices(slices, posting)
+        level = 0
+        while sparse:
+            add_to_slices(slices, to_bitset(
+                [pk for pk, found in sparse.items() if found >> level & 1],
+                capacity
+            ), level)
+            sparse = {
+                pk: found for pk, found in sparse.items()
+                if found >> level + 1
+            }
+            level += 1
+        found_any = 0
+        for bits in slices:
+            found_any |= bits
+        return PantryMatches(slices, found_any, size_masks, len(postings))
+
+    def replace(self, recipe_id, ingredients):
+        """Заменить ингредиенты рецепта; пустой набор - удаление.
+
+        Прежние ингредиенты берутся из карты рецепт -> ингредиенты,
+        поэтому меняются только их списки, а не весь индекс.
+        """
+        self.grow(recipe_id)
+        bit = 1 << recipe_id
+        size = self.sizes[recipe_id]
+        if size:
+            self.size_masks[size] &= ~bit
+            for pk in set(self.ingredients_of(recipe_id)):
+                posting = self.postings[pk]
+                if isinstance(posting, int):
+                    self.postings[pk] = posting & ~bit
+                    continue
+                position = bisect_left(posting, recipe_id)
+                if (position < len(posting)
+                        and posting[position] == recipe_id):
+                    del posting[position]
+        self.sizes[recipe_id] = len(ingredients)
+        self.replaced[recipe_id] = tuple(ingredients)
+        if not ingredients:
+            return
+        self.size_masks[len(ingredients)] = self.size_masks.get(
+            len(ingredients), 0
+        ) | bit
+        for pk in ingredients:
+            posting = self.postings.setdefault(pk, array('q'))
+            if isinstance(posting, int):
+                self.postings[pk] = posting | bit
+                continue
+            posting.insert(bisect_left(posting, recipe_id), recipe_id)
+            if self.is_dense(posting):
+                self.postings[pk] = to_bitset(posting, len(self.sizes))
+
+    def apply(self, recipe_ids):
+        ingredients = {pk: set() for pk in recipe_ids}
+        for recipe_id, ingredient_id in RecipeIngredientList.objects.filter(
+            recipe_id__in=ingredients
+        ).values_list('recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].add(ingredient_id)
+        with self.lock:
+            for recipe_id, found in ingredients.items():
+                self.replace(recipe_id, found)
+
+    def catch_up(self, generation, last):
+        """Применить записи журнала после position.
+
+        Возвращает False, если журнал не подходит и индекс нужно
+        пересобрать: сменилось поколение, записей слишком много или
+        запись вытеснена из кэша.
+        """
+        if (generation != self.generation or last < self.position
+                or last - self.position > settings.PANTRY_LOG_LIMIT):
+            return False
+        numbers = range(self.position + 1, last + 1)
+        entries = version_cache().get_many(
+            [change_key(generation, number) for number in numbers]
+        )
+        changed = set()
+        for number in numbers:
+            key = change_key(generation, number)
+            if key not in entries:
+                if self.missing_since is None:
+                    self.missing_since = monotonic()
+                elif monotonic() - self.missing_since > PANTRY_LOG_WAIT:
+                    return False
+                break
+            changed.update(entries[key])
+            self.position = number
+            self.missing_since = None
+        if changed:
+            self.apply(changed)
+        return True
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_pantry_index():
+    """Индекс текущего процесса с примененным журналом изменений."""
+    global _index
+    generation = get_generation()
+    last = PantryLog.objects.last_number()
+    index = _index
+    if (index is not None and index.generation == generation
+            and index.position == last):
+        return index
+    with _lock:
+        if _index is None or not _index.catch_up(generation, last):
+            _index = PantryIndex.from_db(generation, last)
+    return _index
+
+
+def warm_pantry_index():
+    """Построить индекс в фоновом потоке при старте воркера.
+
+    Первый запрос по продуктам ждет окончания сборки на блокировке,
+    а не строит индекс сам; воркер тем временем отвечает на остальные.
+    """
+    def build():
+        try:
+            get_pantry_index()
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=build, daemon=True).start()
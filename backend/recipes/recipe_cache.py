@@ -0,0 +1,127 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch, Value
+
+from foodgram_project.metrics import serialization_timer
+
+from .catalog import INGREDIENTS, TAGS, get_catalog_version
+from .memberships import (FAVORITES, SHOPPING_CART, SUBSCRIPTIONS,
+                          request_memberships)
+from .models import Recipe, RecipeIngredientList
+
+# Поля ответа, зависящие от текущего пользователя.
+USER_FLAGS = {
+    'is_favorited': FAVORITES,
+    'is_in_shopping_cart': SHOPPING_CART,
+}
+AUTHOR_FLAG = 'is_subscribed'
+
+
+def body_key(pk, prefix):
+    return f'recipe_body:{prefix}:{pk}'
+
+
+def key_prefix():
+    """Общая часть ключей из версий тегов и ингредиентов.
+
+    Смена справочника меняет префикс, поэтому тела рецептов со старыми
+    тегами и ингредиентами просто перестают читаться.
+    """
+    parts = (
+        get_catalog_version(TAGS)['token'],
+        get_catalog_version(INGREDIENTS)['token'],
+    )
+    return md5(':'.join(parts).encode()).hexdigest()[:16]
+
+
+def serialize_recipes(pks):
+    """Тела рецептов без пользовательских флагов: {pk: dict}.
+
+    Сериализуются без запроса в контексте, поэтому ссылка на картинку
+    относительная и не зависит от адреса, по которому пришел запрос.
+    """
+    from .serializers import RecipeReadOnlySerializer
+
+    recipes = list(
+        Recipe.objects.defer('search_vector').filter(
+            pk__in=pks
+        ).select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredientList.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        ).annotate(**{flag: Value(False) for flag in USER_FLAGS})
+    )
+    for recipe in recipes:
+        setattr(recipe.author, AUTHOR_FLAG, False)
+    data = RecipeReadOnlySerializer(recipes, many=True).data
+    return {body['id']: body for body in data}
+
+
+def with_flags(body, memberships, request):
+    """Копия тела с флагами пользователя из множеств memberships."""
+    body = {**body, **{
+        flag: body['id'] in memberships[kind]
+        for flag, kind in USER_FLAGS.items()
+    }}
+    if body['image']:
+        body['image'] = request.build_absolute_uri(body['image'])
+    body['author'] = {
+        **body['author'],
+        AUTHOR_FLAG: body['author']['id'] in memberships[SUBSCRIPTIONS],
+    }
+    return body
+
+
+def recipe_bodies(recipes, request):
+    """Ответ для списка рецептов из общего кэша.
+
+    Тела, одинаковые для всех пользователей, читаются из кэша одним
+    get_many; промахи сериализуются одной пачкой запросов и кладутся
+    в кэш. Флаги пользователя берутся из его множеств избранного,
+    корзины и подписок.
+    """
+    prefix = key_prefix()
+    keys = {recipe.pk: body_key(recipe.pk, prefix) for recipe in recipes}
+    cached = cache.get_many(keys.values())
+    missing = [pk for pk, key in keys.items() if key not in cached]
+    if missing:
+        fresh = {
+            keys[pk]: body
+            for pk, body in serialize_recipes(missing).items()
+        }
+        cache.set_many(fresh, settings.RECIPE_CACHE_TIMEOUT)
+        cached.update(fresh)
+    memberships = request_memberships(
+        request, FAVORITES, SHOPPING_CART, SUBSCRIPTIONS
+    )
+    with serialization_timer():
+        return [
+            with_flags(cached[keys[recipe.pk]], memberships, request)
+            for recipe in recipes
+            if keys[recipe.pk] in cached
+        ]
+
+
+def invalidate_recipes(pks):
+    """Сбросить тела рецептов сейчас и еще раз после коммита.
+
+    Повторный сброс после коммита убирает тело, которое параллельный
+    запрос мог успеть прочитать из базы до коммита и положить в кэш.
+    """
+    pks = list(pks)
+    if not pks:
+        return
+
+    def delete():
+        prefix = key_prefix()
+        cache.delete_many([body_key(pk, prefix) for pk in pks])
+
+    delete()
+    transaction.on_commit(delete)
@@ -0,0 +1,119 @@
+import csv
+import os
+from abc import ABC, abstractmethod
+from io import BytesIO
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+
+SHOPPING_LIST_TITLE = 'Ваш список покупок:'
+CHUNK_SIZE = 64 * 1024
+
+
+def shopping_list_lines(ingredients):
+    """Пронумерованные строки списка покупок."""
+    for number, ingredient in enumerate(ingredients, start=1):
+        yield (f'{number}. {ingredient["name"]}: '
+               f'{ingredient["total_amount"]} {ingredient["unit"]}')
+
+
+class ShoppingListRenderer(ABC):
+    """Базовый рендерер списка покупок.
+
+    render() принимает итератор агрегированных строк
+    (name, unit, total_amount) и возвращает генератор частей тела
+    ответа для StreamingHttpResponse.
+    """
+    media_type = None
+    extension = None
+
+    @abstractmethod
+    def render(self, ingredients):
+        """Части тела ответа для строк ingredients."""
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain; charset=utf-8'
+    extension = 'txt'
+
+    def render(self, ingredients):
+        yield SHOPPING_LIST_TITLE
+        for line in shopping_list_lines(ingredients):
+            yield '\n' + line
+
+
+class Echo:
+    """Буфер-заглушка: csv.writer возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+
+    def render(self, ingredients):
+        writer = csv.writer(Echo())
+        yield '\ufeff' + writer.writerow(
+            ('Ингредиент', 'Количество', 'Ед. измерения')
+        )
+        for ingredient in ingredients:
+            yield writer.writerow((ingredient['name'],
+                                   ingredient['total_amount'],
+                                   ingredient['unit']))
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    """PDF со списком покупок.
+
+    Шрифт с кириллицей берется из settings.SHOPPING_LIST_FONT;
+    если файла нет, используется встроенный Helvetica.
+    """
+    media_type = 'application/pdf'
+    extension = 'pdf'
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    margin = 50
+    line_height = 18
+
+    def get_font(self):
+        font_path = getattr(settings, 'SHOPPING_LIST_FONT', None)
+        if not font_path or not os.path.exists(font_path):
+            return 'Helvetica'
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(self.font_name, font_path))
+        return self.font_name
+
+    def render(self, ingredients):
+        buffer = BytesIO()
+        font = self.get_font()
+        width, height = A4
+        document = canvas.Canvas(buffer, pagesize=A4)
+        document.setTitle('Список покупок')
+        document.setFont(font, self.font_size)
+        y = height - self.margin
+        document.drawString(self.margin, y, SHOPPING_LIST_TITLE)
+        for line in shopping_list_lines(ingredients):
+            y -= self.line_height
+            if y < self.margin:
+                document.showPage()
+                document.setFont(font, self.font_size)
+                y = height - self.margin
+            document.drawString(self.margin, y, line)
+        document.save()
+        buffer.seek(0)
+        while chunk := buffer.read(CHUNK_SIZE):
+            yield chunk
+
+
+SHOPPING_LIST_RENDERERS = {
+    renderer.extension: renderer()
+    for renderer in (TextShoppingListRenderer,
+                     CSVShoppingListRenderer,
+                     PDFShoppingListRenderer)
+}
@@ -0,0 +1,161 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+WORD_RE = re.compile(r'\w+')
+
+POSTGRESQL_SETUP = (
+    f"""
+    CREATE OR REPLACE FUNCTION recipes_recipe_search_vector_update()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('{SEARCH_CONFIG}',
+                                  coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('{SEARCH_CONFIG}',
+                                     coalesce(NEW.text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger
+    ON recipes_recipe
+    """,
+    """
+    CREATE TRIGGER recipes_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+    FOR EACH ROW EXECUTE PROCEDURE recipes_recipe_search_vector_update()
+    """,
+    """
+    UPDATE recipes_recipe SET name = name WHERE search_vector IS NULL
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_gin
+    ON recipes_recipe USING gin (search_vector)
+    """,
+)
+
+SQLITE_SETUP = (
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        name, text, content='recipes_recipe', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_insert AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_delete AFTER DELETE ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_update AFTER UPDATE OF name, text
+    ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+)
+
+POSTGRESQL_TEARDOWN = (
+    "DROP INDEX IF EXISTS recipes_recipe_search_vector_gin",
+    """
+    DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger
+    ON recipes_recipe
+    """,
+    "DROP FUNCTION IF EXISTS recipes_recipe_search_vector_update()",
+)
+
+SQLITE_TEARDOWN = tuple(
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{event}"
+    for event in ('insert', 'delete', 'update')
+) + (f"DROP TABLE IF EXISTS {FTS_TABLE}",)
+
+
+def install_search(using):
+    """Создать индекс полнотекстового поиска для текущей СУБД.
+
+    PostgreSQL: триггер заполняет Recipe.search_vector при каждом
+    сохранении, по колонке строится GIN-индекс. SQLite: таблица FTS5
+    с внешним содержимым, синхронизируемая триггерами. Вызывается
+    миграцией 0006_search_vector и тестами, которые создают базу без
+    миграций; повторный вызов ничего не меняет.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for sql in POSTGRESQL_SETUP:
+                cursor.execute(sql)
+        elif connection.vendor == 'sqlite':
+            if FTS_TABLE in connection.introspection.table_names(cursor):
+                return
+            for sql in SQLITE_SETUP:
+                cursor.execute(sql)
+
+
+def uninstall_search(using):
+    """Удалить индекс полнотекстового поиска (откат миграции)."""
+    connection = connections[using]
+    statements = {
+        'postgresql': POSTGRESQL_TEARDOWN,
+        'sqlite': SQLITE_TEARDOWN,
+    }.get(connection.vendor, ())
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def fts5_query(query):
+    """Запрос FTS5: все слова как префиксы, объединенные через AND."""
+    return ' '.join(
+        '"{}"*'.format(word.replace('"', '""'))
+        for word in WORD_RE.findall(query)
+    )
+
+
+def search_recipes(queryset, query):
+    """Отфильтровать рецепты по запросу и отсортировать по релевантности.
+
+    Работает поверх уже отфильтрованного queryset, поэтому сочетается
+    с фильтрами по тегам, автору и флагам.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        search_query = SearchQuery(query, config=SEARCH_CONFIG,
+                                   search_type='websearch')
+        queryset = queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        )
+    elif vendor == 'sqlite':
+        match = fts5_query(query)
+        if not match:
+            return queryset.none()
+        queryset = queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (match,)
+        )).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = recipes_recipe.id',
+            (match,)
+        ))
+    else:
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+        )
+    return queryset.order_by('-search_rank', '-pub_date', '-id')
@@ -1,24 +1,33 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 from rest_framework.validators import ValidationError
 
 from drf_extra_fields.fields import Base64ImageField
 
-from .models import (Ingredient,
-                     Recipe, RecipeIngredientList,
-                     ShoppingCart, Tag)
+from .memberships import FAVORITES, SHOPPING_CART, is_member
+from .models import (FeedEntry, Ingredient,
+                     Recipe, RecipeIngredientList, RecipeTagList,
+                     ShoppingCart, ShoppingCartIngredient,
+                     SimilarityQueue, Tag)
+from .pantry_index import record_recipe_changes
 from foodgram_project.constants import (MIN_AMOUNT, MAX_AMOUNT,
                                         MIN_COOKING_TIME, MAX_COOKING_TIME,)
+from foodgram_project.metrics import TimedSerializerMixin
 from users.serializers import ProfileSerializer
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для тэгов."""
     class Meta:
         model = Tag
         fields = ('id', 'name', 'color', 'slug')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для ингредиентов."""
     class Meta:
         model = Ingredient
@@ -41,9 +50,7 @@ class RecipeIngredientListReadOnlySerializer(serializers.ModelSerializer):
 
 class RecipeIngredientListCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания ингредиентов в рецепте."""
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField()
     amount = serializers.IntegerField(
         write_only=True,
         min_value=MIN_AMOUNT, max_value=MAX_AMOUNT,
@@ -58,7 +65,8 @@ class RecipeIngredientListCreateSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class RecipeReadOnlySerializer(serializers.ModelSerializer):
+class RecipeReadOnlySerializer(TimedSerializerMixin,
+                               serializers.ModelSerializer):
     """Сериализатор рецепта(чтение)."""
     tags = TagSerializer(read_only=True, many=True)
     author = ProfileSerializer(read_only=True)
@@ -87,25 +95,21 @@ class RecipeReadOnlySerializer(serializers.ModelSerializer):
             ingredients, many=True).data
 
     def get_is_favorited(self, obj):
-        current_user = self.context.get('request').user
-        if not current_user.is_authenticated:
-            return False
-        return current_user.favorite_recipes.filter(recipe=obj).exists()
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return is_member(self.context.get('request'), FAVORITES, obj.pk)
 
     def get_is_in_shopping_cart(self, obj):
-        current_user = self.context.get('request').user
-        if not current_user.is_authenticated:
-            return False
-        return current_user.shopping_cart.filter(recipe=obj).exists()
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return is_member(self.context.get('request'), SHOPPING_CART, obj.pk)
 
 
-class RecipeCreateSerializer(serializers.ModelSerializer):
+class RecipeCreateSerializer(TimedSerializerMixin,
+                             serializers.ModelSerializer):
     """Сериализатор для добавления нового рецепта."""
     ingredients = RecipeIngredientListCreateSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     author = ProfileSerializer(read_only=True)
     image = Base64ImageField()
     cooking_time = serializers.IntegerField(
@@ -123,6 +127,39 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         fields = ('id', 'author', 'ingredients', 'tags',
                   'name', 'image', 'text', 'cooking_time')
 
+    def resolve(self, model, ids, field):
+        """Объекты model по списку id одним запросом."""
+        duplicates = [pk for pk, count in Counter(ids).items() if count > 1]
+        if duplicates:
+            raise serializers.ValidationError({
+                field: f'Повторяются id: {", ".join(map(str, duplicates))}'
+            })
+        objects = model.objects.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in objects]
+        if missing:
+            raise serializers.ValidationError({
+                field: f'Не найдены id: {", ".join(map(str, missing))}'
+            })
+        return objects
+
+    def validate(self, attrs):
+        if 'ingredients' in attrs:
+            ingredients = attrs['ingredients']
+            if not ingredients:
+                raise serializers.ValidationError(
+                    {'ingredients': 'Ингридиенты не добавлены!'}
+                )
+            objects = self.resolve(
+                Ingredient, [item['id'] for item in ingredients],
+                'ingredients'
+            )
+            for item in ingredients:
+                item['id'] = objects[item['id']]
+        if 'tags' in attrs:
+            objects = self.resolve(Tag, attrs['tags'], 'tags')
+            attrs['tags'] = [objects[pk] for pk in attrs['tags']]
+        return attrs
+
     def create_ingredients(self, recipe, ingredients):
         ingredients_involved = []
         for ingredient in ingredients:
@@ -135,46 +172,107 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             )
         RecipeIngredientList.objects.bulk_create(ingredients_involved)
 
+    @transaction.atomic
     def create(self, validated_data):
         current_user = self.context.get('request').user
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(author=current_user, **validated_data)
         self.create_ingredients(recipe, ingredients)
-        if not RecipeIngredientList.objects.filter(recipe=recipe).exists():
-            raise serializers.ValidationError('Ингридиенты не добавлены!',
-                                              code='invalid')
-        recipe.tags.set(tags)
+        RecipeTagList.objects.bulk_create(
+            RecipeTagList(recipe=recipe, tag=tag) for tag in tags
+        )
+        FeedEntry.objects.fan_out([recipe])
+        SimilarityQueue.objects.enqueue([recipe.pk])
+        record_recipe_changes([recipe.pk])
+        recipe.is_favorited = recipe.is_in_shopping_cart = False
         return recipe
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance], 'tags',
+            Prefetch('recipe_ingredients',
+                     queryset=RecipeIngredientList.objects.select_related(
+                         'ingredient'
+                     ))
+        )
         return RecipeReadOnlySerializer(instance, context={
             'request': self.context.get('request')
         }).data
 
+    def sync_ingredients(self, recipe, ingredients):
+        """Привести ингредиенты рецепта к новому списку.
+
+        Вставляются, обновляются и удаляются только изменившиеся строки.
+        Возвращает количества до и после изменения для агрегата корзин.
+        """
+        existing = {
+            row.ingredient_id: row
+            for row in RecipeIngredientList.objects.filter(recipe=recipe)
+        }
+        old_amounts = {pk: row.amount for pk, row in existing.items()}
+        new_amounts = {
+            item['id'].pk: item['amount'] for item in ingredients
+        }
+        changed = []
+        for pk, amount in new_amounts.items():
+            row = existing.get(pk)
+            if row is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        RecipeIngredientList.objects.filter(
+            pk__in=[row.pk for pk, row in existing.items()
+                    if pk not in new_amounts]
+        ).delete()
+        RecipeIngredientList.objects.bulk_update(changed, ('amount',))
+        RecipeIngredientList.objects.bulk_create(
+            RecipeIngredientList(recipe=recipe, ingredient_id=pk,
+                                 amount=amount)
+            for pk, amount in new_amounts.items() if pk not in existing
+        )
+        return old_amounts, new_amounts
+
+    def sync_tags(self, recipe, tags):
+        """Добавить новые и удалить снятые теги рецепта."""
+        existing = set(RecipeTagList.objects.filter(
+            recipe=recipe
+        ).values_list('tag_id', flat=True))
+        new = {tag.pk for tag in tags}
+        RecipeTagList.objects.filter(
+            recipe=recipe, tag_id__in=existing - new
+        ).delete()
+        RecipeTagList.objects.bulk_create(
+            RecipeTagList(recipe=recipe, tag_id=pk) for pk in new - existing
+        )
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.name = validated_data.get('name', instance.name)
-        instance.image = validated_data.get('image', instance.image)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = validated_data.get('cooking_time',
-                                                   instance.cooking_time)
         try:
             ingredients = validated_data.pop('ingredients')
         except KeyError:
             raise serializers.ValidationError('Ингридиенты отсутствуют!',
                                               code='invalid')
-        instance.ingredients.all().delete()
-        self.create_ingredients(instance, ingredients)
-        if not RecipeIngredientList.objects.filter(recipe=instance).exists():
-            raise serializers.ValidationError('Ингридиенты не добавлены!',
-                                              code='invalid')
-        tags = validated_data.pop('tags')
-        instance.tags.set(tags)
-        instance.save()
+        old_amounts, new_amounts = self.sync_ingredients(instance,
+                                                         ingredients)
+        ShoppingCartIngredient.objects.change_recipe(
+            instance, old_amounts, new_amounts
+        )
+        if old_amounts.keys() != new_amounts.keys():
+            SimilarityQueue.objects.enqueue([instance.pk])
+            record_recipe_changes([instance.pk])
+        if 'tags' in validated_data:
+            self.sync_tags(instance, validated_data.pop('tags'))
+        fields = [field for field in ('name', 'image', 'text', 'cooking_time')
+                  if field in validated_data]
+        for field in fields:
+            setattr(instance, field, validated_data[field])
+        if fields:
+            instance.save(update_fields=fields)
         return instance
 
 
-class FavouriteAndCartSerializer(serializers.ModelSerializer):
+class FavouriteAndCartSerializer(TimedSerializerMixin,
+                                 serializers.ModelSerializer):
     """Сериализатор для добавления рецепта в спискок покупок и избранное."""
     image = Base64ImageField(read_only=True)
 
@@ -188,3 +286,19 @@ class FavouriteAndCartSerializer(serializers.ModelSerializer):
                                        ).exists():
             raise ValidationError('Этот рецепт уже есть в списке покупок!')
         return data
+
+
+class BulkRecipesSerializer(serializers.Serializer):
+    """Список id рецептов для пакетного добавления или удаления."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False,
+        max_length=settings.BULK_RECIPES_LIMIT
+    )
+
+
+class PantrySerializer(serializers.Serializer):
+    """Id имеющихся ингредиентов для поиска рецептов по продуктам."""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False,
+        max_length=settings.PANTRY_INGREDIENTS_LIMIT
+    )
@@ -0,0 +1,144 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from users.models import CustomUser, Subscriptions
+from .catalog import INGREDIENTS, TAGS, bump_catalog_version
+from .memberships import invalidate_membership
+from .models import (Favourite, Ingredient, Recipe, ShoppingCart,
+                     ShoppingCartIngredient, Tag)
+from .pantry_index import record_recipe_changes
+from .recipe_cache import invalidate_recipes
+
+# Поля автора, которые входят в кэшированное тело рецепта.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+# Удаления избранного и корзины, уже учтенные вызывающим кодом.
+_applied = ContextVar('applied', default=False)
+
+
+@contextmanager
+def applied_in_bulk():
+    """Не менять счетчики и сводный список при удалении строк в блоке.
+
+    Для пачек и каскада от удаляемого рецепта: вызывающий код
+    меняет их одним UPDATE, а не запросами на каждую строку.
+    """
+    token = _applied.set(True)
+    try:
+        yield
+    finally:
+        _applied.reset(token)
+
+
+def shift_counter(model, pk, field, delta):
+    model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(**kwargs):
+    bump_catalog_version(INGREDIENTS)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(**kwargs):
+    bump_catalog_version(TAGS)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(instance, **kwargs):
+    invalidate_recipes([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    record_recipe_changes([instance.pk])
+
+
+@receiver(post_save, sender=CustomUser)
+def author_changed(instance, created, update_fields, **kwargs):
+    if created or (update_fields and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    invalidate_recipes(
+        Recipe.objects.filter(author=instance).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_save, sender=Favourite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscriptions)
+def membership_added(instance, created, **kwargs):
+    if created:
+        invalidate_membership(instance)
+
+
+@receiver(post_delete, sender=Favourite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscriptions)
+def membership_removed(instance, **kwargs):
+    invalidate_membership(instance)
+
+
+@receiver(post_save, sender=Favourite)
+@receiver(post_save, sender=ShoppingCart)
+def recipe_counter_added(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        shift_counter(Recipe, instance.recipe_id, sender.recipe_counter, 1)
+
+
+@receiver(post_delete, sender=Favourite)
+@receiver(post_delete, sender=ShoppingCart)
+def recipe_counter_removed(sender, instance, **kwargs):
+    if not _applied.get():
+        shift_counter(Recipe, instance.recipe_id, sender.recipe_counter, -1)
+
+
+@receiver(post_save, sender=Subscriptions)
+def subscriber_added(instance, created, raw, **kwargs):
+    if created and not raw:
+        shift_counter(CustomUser, instance.subscription_id,
+                      'subscribers_count', 1)
+
+
+@receiver(post_delete, sender=Subscriptions)
+def subscriber_removed(instance, **kwargs):
+    shift_counter(CustomUser, instance.subscription_id,
+                  'subscribers_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def author_recipe_added(instance, created, raw, **kwargs):
+    if created and not raw:
+        shift_counter(CustomUser, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def author_recipe_removed(instance, **kwargs):
+    shift_counter(CustomUser, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def cart_recipe_added(instance, created, raw, **kwargs):
+    if created and not raw:
+        ShoppingCartIngredient.objects.apply_deltas(
+            [instance.user_id],
+            ShoppingCartIngredient.objects.recipe_amounts(instance.recipe_id)
+        )
+
+
+# pre_delete: при каскаде от рецепта его ингредиенты удаляются
+# быстрым DELETE раньше, чем приходит post_delete строк корзины.
+@receiver(pre_delete, sender=ShoppingCart)
+def cart_recipe_removed(instance, **kwargs):
+    if _applied.get():
+        return
+    amounts = ShoppingCartIngredient.objects.recipe_amounts(
+        instance.recipe_id
+    )
+    ShoppingCartIngredient.objects.apply_deltas(
+        [instance.user_id],
+        {pk: -amount for pk, amount in amounts.items()}
+    )
@@ -0,0 +1,241 @@
+import random
+from collections import defaultdict
+from heapq import nlargest
+from math import log
+
+from django.db.models import Count, Q
+
+from .models import (Recipe, RecipeBucket, RecipeIngredientList,
+                     SimilarityQueue, SimilarRecipe)
+
+# MinHash из BANDS * ROWS хеш-функций, ключ корзины - полоса из ROWS
+# значений подписи. Пара с коэффициентом Жаккара J попадает в общую
+# корзину с вероятностью 1 - (1 - J ** ROWS) ** BANDS: для 0.25 это
+# около 0.64, для 0.5 - больше 0.99. После смены параметров или SEED
+# нужен rebuild_similar --full.
+BANDS = 16
+ROWS = 2
+SEED = 777
+PRIME = (1 << 61) - 1
+BUCKET_BASE = 1_000_003
+
+# Ограничение на число параметров в одном IN.
+CHUNK_SIZE = 900
+
+
+def chunked(items, size=None):
+    size = size or CHUNK_SIZE
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class MinHash:
+    """Подписи MinHash множеств ингредиентов и ключи корзин LSH.
+
+    Значения хеш-функций считаются один раз на ингредиент, подпись
+    рецепта - поэлементный минимум по его ингредиентам. Хеш-функции
+    задаются SEED, поэтому ключи совпадают между запусками.
+    """
+
+    def __init__(self, bands=BANDS, rows=ROWS, seed=SEED):
+        rng = random.Random(seed)
+        self.bands = bands
+        self.rows = rows
+        self.coefficients = [
+            (rng.randrange(1, PRIME), rng.randrange(PRIME))
+            for _ in range(bands * rows)
+        ]
+        self.hashes = {}
+
+    def ingredient_hashes(self, pk):
+        hashes = self.hashes.get(pk)
+        if hashes is None:
+            hashes = self.hashes[pk] = tuple(
+                (a * pk + b) % PRIME for a, b in self.coefficients
+            )
+        return hashes
+
+    def buckets(self, ingredients):
+        """Ключи корзин множества ингредиентов, по одному на полосу."""
+        signature = list(map(min, zip(*map(self.ingredient_hashes,
+                                           ingredients))))
+        keys = []
+        for band in range(self.bands):
+            key = band
+            for value in signature[band * self.rows:(band + 1) * self.rows]:
+                key = (key * BUCKET_BASE + value) % PRIME
+            keys.append(key)
+        return keys
+
+
+def ingredient_weights():
+    """IDF ингредиентов: редкий общий ингредиент значит больше частого."""
+    total = Recipe.objects.count()
+    return {
+        pk: log(1 + total / count)
+        for pk, count in RecipeIngredientList.objects.order_by().values(
+            'ingredient_id'
+        ).annotate(count=Count('id')).values_list('ingredient_id', 'count')
+    }
+
+
+def weighted_jaccard(first, second, weights):
+    """Сумма весов общих ингредиентов к сумме весов объединения."""
+    common = sum(weights.get(pk, 0.0) for pk in first & second)
+    if not common:
+        return 0.0
+    return common / sum(weights.get(pk, 0.0) for pk in first | second)
+
+
+def top(scores, limit):
+    """limit лучших пар (похожесть, id), при равенстве - меньший id."""
+    return nlargest(limit, scores, key=lambda item: (item[0], -item[1]))
+
+
+class SimilarRecipes:
+    """Пересчет похожих рецептов по корзинам LSH в базе.
+
+    Корзины хранятся в RecipeBucket, поэтому кандидаты для пачки
+    рецептов выбираются по индексу, а в памяти держится только пачка
+    с кандидатами. Кандидаты ранжируются точным взвешенным
+    коэффициентом Жаккара. Корзины больше bucket_limit рецептов
+    (пары самых частых ингредиентов) пропускаются.
+    """
+
+    def __init__(self, limit, bucket_limit, minhash=None):
+        self.limit = limit
+        self.bucket_limit = bucket_limit
+        self.minhash = minhash or MinHash()
+        self.weights = ingredient_weights()
+
+    def ingredient_sets(self, recipe_ids):
+        sets = defaultdict(set)
+        for chunk in chunked(recipe_ids):
+            for recipe_id, ingredient_id in (
+                RecipeIngredientList.objects.filter(
+                    recipe_id__in=chunk
+                ).order_by().values_list('recipe_id', 'ingredient_id')
+            ):
+                sets[recipe_id].add(ingredient_id)
+        return sets
+
+    def index(self, recipe_ids):
+        """Записать корзины рецептов вместо прежних."""
+        for chunk in chunked(recipe_ids):
+            RecipeBucket.objects.filter(recipe_id__in=chunk).delete()
+        RecipeBucket.objects.bulk_create(
+            RecipeBucket(recipe_id=pk, bucket=key)
+            for pk, ingredients in self.ingredient_sets(recipe_ids).items()
+            for key in self.minhash.buckets(ingredients)
+        )
+
+    def candidates(self, recipe_ids):
+        """{рецепт: id рецептов из общих с ним корзин}."""
+        own = defaultdict(list)
+        for chunk in chunked(recipe_ids):
+            for recipe_id, bucket in RecipeBucket.objects.filter(
+                recipe_id__in=chunk
+            ).values_list('recipe_id', 'bucket'):
+                own[recipe_id].append(bucket)
+        keys = {bucket for buckets in own.values() for bucket in buckets}
+        members = defaultdict(list)
+        for chunk in chunked(keys):
+            large = set(RecipeBucket.objects.filter(
+                bucket__in=chunk
+            ).order_by().values('bucket').annotate(
+                size=Count('id')
+            ).filter(size__gt=self.bucket_limit).values_list(
+                'bucket', flat=True
+            ))
+            for bucket, recipe_id in RecipeBucket.objects.filter(
+                bucket__in=[key for key in chunk if key not in large]
+            ).values_list('bucket', 'recipe_id'):
+                members[bucket].append(recipe_id)
+        candidates = {}
+        for recipe_id in recipe_ids:
+            found = set()
+            for bucket in own.get(recipe_id, ()):
+                found.update(members.get(bucket, ()))
+            found.discard(recipe_id)
+            candidates[recipe_id] = found
+        return candidates
+
+    def scores(self, recipe_ids):
+        """{рецепт: [(похожесть, id кандидата)]} с ненулевой похожестью."""
+        candidates = self.candidates(recipe_ids)
+        sets = self.ingredient_sets(
+            set(recipe_ids).union(*candidates.values())
+        )
+        result = {}
+        for recipe_id, found in candidates.items():
+            ingredients = sets.get(recipe_id, set())
+            result[recipe_id] = [
+                (score, other) for score, other in (
+                    (weighted_jaccard(ingredients, sets.get(other, set()),
+                                      self.weights), other)
+                    for other in found
+                ) if score > 0
+            ]
+        return result
+
+    def store(self, scores):
+        SimilarRecipe.objects.bulk_create(
+            SimilarRecipe(recipe_id=recipe_id, similar_id=other, score=score)
+            for recipe_id, found in scores.items()
+            for score, other in top(found, self.limit)
+        )
+
+    def merge(self, scores):
+        """Добавить пересчитанные рецепты в списки их кандидатов.
+
+        Кандидат получает новый рецепт, если тот входит в его limit
+        лучших; вытесненные строки удаляются.
+        """
+        incoming = defaultdict(list)
+        for recipe_id, found in scores.items():
+            for score, other in found:
+                if other not in scores:
+                    incoming[other].append((score, recipe_id))
+        current = defaultdict(list)
+        for chunk in chunked(incoming):
+            rows = SimilarRecipe.objects.filter(
+                recipe_id__in=chunk
+            ).values_list('pk', 'recipe_id', 'similar_id', 'score')
+            for row_id, recipe_id, other, score in rows:
+                current[recipe_id].append((score, other, row_id))
+        created, stale = [], []
+        for recipe_id, found in incoming.items():
+            existing = current[recipe_id]
+            kept = set(top(
+                found + [(score, other) for score, other, _ in existing],
+                self.limit
+            ))
+            created.extend(
+                SimilarRecipe(recipe_id=recipe_id, similar_id=other,
+                              score=score)
+                for score, other in found if (score, other) in kept
+            )
+            stale.extend(row_id for score, other, row_id in existing
+                         if (score, other) not in kept)
+        for chunk in chunked(stale):
+            SimilarRecipe.objects.filter(pk__in=chunk).delete()
+        SimilarRecipe.objects.bulk_create(created)
+
+    def refresh(self, recipe_ids):
+        """Пересчитать рецепты после изменения их ингредиентов.
+
+        Прежние строки с их участием удаляются, поэтому рецепт,
+        переставший быть похожим, пропадает из чужих списков; список
+        может стать короче limit до полной пересборки.
+        """
+        for chunk in chunked(recipe_ids):
+            SimilarityQueue.objects.filter(recipe_id__in=chunk).delete()
+        self.index(recipe_ids)
+        for chunk in chunked(recipe_ids):
+            SimilarRecipe.objects.filter(
+                Q(recipe_id__in=chunk) | Q(similar_id__in=chunk)
+            ).delete()
+        scores = self.scores(recipe_ids)
+        self.store(scores)
+        self.merge(scores)
@@ -1,11 +1,11 @@
 from django.urls import include, path, re_path
-from rest_framework.routers import DefaultRouter
 
 from users.views import ProfileViewSet
+from .async_read import AsyncReadRouter
 from .views import TagViewSet, IngredientViewSet, RecipeViewSet
 
 
-router_v1 = DefaultRouter()
+router_v1 = AsyncReadRouter()
 
 router_v1.register('users', ProfileViewSet, basename='users')
 router_v1.register('tags', TagViewSet, basename='tags')
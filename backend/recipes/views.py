@@ -1,6 +1,8 @@
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 
 from rest_framework import status, viewsets
@@ -9,52 +11,151 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.validators import ValidationError
 
+from .catalog import INGREDIENTS, TAGS, catalog_response
+from .feed import FEED_ORDERING, feed_recipes
+from .ingredient_index import get_ingredient_index, normalize
+from .memberships import (SUBSCRIPTIONS, invalidate_memberships,
+                          request_memberships)
 from .pagination import CustomPagination
+from .pantry_index import get_pantry_index
+from .recipe_cache import invalidate_recipes, recipe_bodies
 from .filters import RecipeFilter, IngredientFilter
 from .permissions import IsAuthorOrReadOnly
+from .renderers import SHOPPING_LIST_RENDERERS
+from .signals import applied_in_bulk
 from .models import (Favourite,
                      Tag,
                      Ingredient,
                      Recipe,
                      RecipeIngredientList,
-                     ShoppingCart)
-from .serializers import (RecipeCreateSerializer,
+                     ShoppingCart,
+                     ShoppingCartIngredient,
+                     SimilarRecipe)
+from .serializers import (BulkRecipesSerializer,
+                          PantrySerializer,
+                          RecipeCreateSerializer,
                           RecipeReadOnlySerializer,
                           FavouriteAndCartSerializer,
                           IngredientSerializer,
                           TagSerializer)
 
 
+# Результат по id пакетного запроса: {добавление: {изменен, без изменений}}.
+BULK_OUTCOMES = {
+    True: {'changed': 'added', 'unchanged': 'exists'},
+    False: {'changed': 'removed', 'unchanged': 'absent'},
+}
+
+
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     """Вьюсет для тегов."""
+    async_reads = True
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
+    def list(self, request):
+        return catalog_response(
+            request, TAGS,
+            lambda: self.get_serializer(self.get_queryset(), many=True).data
+        )
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     """Вьюсет для игредиентов."""
+    async_reads = True
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (IngredientFilter,)
     search_fields = ('^name',)
     pagination_class = None
 
+    def list(self, request):
+        """Автодополнение из индекса в памяти процесса, без запросов к БД.
+
+        Без параметра name возвращается весь каталог, с ним - не более
+        limit ингредиентов: точные совпадения, затем по началу названия,
+        затем по началу любого слова.
+        """
+        name = request.query_params.get(IngredientFilter.search_param, '')
+        limit = request.query_params.get(
+            'limit', settings.INGREDIENT_SEARCH_LIMIT
+        )
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ValidationError({'limit': 'Введите целое число.'})
+        if limit < 1:
+            raise ValidationError({'limit': 'Минимальное значение - 1.'})
+        if not name.strip():
+            name, limit = '', None
+        return catalog_response(
+            request, INGREDIENTS,
+            lambda: get_ingredient_index().search(name, limit),
+            variant=f'{normalize(name)}:{limit}'
+        )
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """Вьюсет для рецептов."""
+    async_reads = True
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     http_method_names = ['get', 'post', 'patch', 'delete']
     pagination_class = CustomPagination
+    cursor_ordering = ('-pub_date', '-id')
+
+    def get_queryset(self):
+        """Рецепты для чтения и записи.
+
+        Для чтения выбираются только id, автор и дата: тела рецептов
+        берутся из общего кэша, а флаги пользователя - из его множеств.
+        Для записи автор, теги и ингредиенты подгружаются фиксированным
+        числом запросов.
+        """
+        if self.action in ('list', 'retrieve', 'similar'):
+            return Recipe.objects.only('id', 'author_id', 'pub_date')
+        return Recipe.objects.defer('search_vector').select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredientList.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        )
+
+    def list(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(recipe_bodies(queryset, request))
+        return self.get_paginated_response(recipe_bodies(page, request))
+
+    def retrieve(self, request, pk=None):
+        return Response(recipe_bodies([self.get_object()], request)[0])
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeReadOnlySerializer
         return RecipeCreateSerializer
 
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalidate_recipes([serializer.instance.pk])
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        amounts = ShoppingCartIngredient.objects.recipe_amounts(instance)
+        ShoppingCartIngredient.objects.change_recipe(instance, amounts, {})
+        # Корзины уже пересчитаны, счетчики удаляемого рецепта не нужны.
+        with applied_in_bulk():
+            instance.delete()
+
     def favor_shopcart_post(self, request, pk, model):
         if not Recipe.objects.filter(pk=pk).exists():
             return Response(
@@ -66,7 +167,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if model.objects.filter(user=current_user,
                                 recipe=current_recipe).exists():
             raise ValidationError('Этот рецепт уже есть!')
-        model.objects.create(user=current_user, recipe=current_recipe)
+        # Счетчик и сводный список меняют сигналы в той же транзакции.
+        with transaction.atomic():
+            model.objects.create(user=current_user, recipe=current_recipe)
         serializer = FavouriteAndCartSerializer(
             current_recipe, context={'request': request})
         return Response(data=serializer.data,
@@ -82,8 +185,74 @@ class RecipeViewSet(viewsets.ModelViewSet):
             model, user=current_user, recipe=current_recipe
         )
         object_to_delete.delete()
-        return Response({'message': 'Рецепт удален'},
-                        status=status.HTTP_204_NO_CONTENT)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def favor_shopcart_bulk(self, request, model):
+        """Добавить (POST) или убрать (DELETE) пачку рецептов.
+
+        Существование рецептов проверяется одним запросом, наличие
+        в списке - по строкам пользователя, прочитанным в транзакции
+        с SELECT ... FOR UPDATE, а не по кэшу множеств. Счетчики
+        и сводный список меняются только по реально вставленным
+        или удаленным строкам; параллельная вставка той же строки
+        откатывает транзакцию, как у одиночного добавления. В ответе
+        результат по каждому id в порядке запроса.
+        """
+        serializer = BulkRecipesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['recipes']))
+        found = set(
+            Recipe.objects.filter(pk__in=ids).order_by().values_list(
+                'pk', flat=True
+            )
+        )
+        adding = request.method == 'POST'
+        changed = []
+        if found:
+            with transaction.atomic():
+                present = set(model.objects.select_for_update().filter(
+                    user=request.user, recipe_id__in=found
+                ).values_list('recipe_id', flat=True))
+                changed = [pk for pk in ids
+                           if pk in found and (pk in present) != adding]
+                if changed:
+                    self.apply_bulk(request.user, model, changed, adding)
+        changed = set(changed)
+        outcomes = BULK_OUTCOMES[adding]
+        return Response({'results': [
+            {'id': pk, 'status': (
+                outcomes['changed'] if pk in changed
+                else outcomes['unchanged'] if pk in found
+                else 'not_found'
+            )}
+            for pk in ids
+        ]})
+
+    @staticmethod
+    def apply_bulk(user, model, recipe_ids, adding):
+        """Вставить или удалить строки, счетчики и сводный список."""
+        if adding:
+            model.objects.bulk_create([
+                model(user=user, recipe_id=pk) for pk in recipe_ids
+            ])
+            # bulk_create не отправляет post_save.
+            invalidate_memberships(model, [user.pk])
+        else:
+            with applied_in_bulk():
+                model.objects.filter(
+                    user=user, recipe_id__in=recipe_ids
+                ).delete()
+        Recipe.objects.filter(pk__in=recipe_ids).update(**{
+            model.recipe_counter:
+                F(model.recipe_counter) + (1 if adding else -1)
+        })
+        if model is ShoppingCart:
+            if adding:
+                ShoppingCartIngredient.objects.add_recipes(user, recipe_ids)
+            else:
+                ShoppingCartIngredient.objects.remove_recipes(
+                    user, recipe_ids
+                )
 
     @action(
         detail=True,
@@ -109,41 +278,132 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def delete_shopping_cart(self, request, pk):
         return self.favor_shopcart_delete(request, pk, ShoppingCart)
 
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='favorite/bulk',
+        permission_classes=[IsAuthenticated]
+    )
+    def favorite_bulk(self, request):
+        return self.favor_shopcart_bulk(request, Favourite)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart/bulk',
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_bulk(self, request):
+        return self.favor_shopcart_bulk(request, ShoppingCart)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        """Рецепты авторов из подписок, новые первыми.
+
+        Всегда листается курсором: первая страница - без параметра
+        cursor, следующие - по ссылке next.
+        """
+        subscriptions = request_memberships(
+            request, SUBSCRIPTIONS
+        )[SUBSCRIPTIONS]
+        paginator = self.pagination_class()
+        page = paginator.paginate_keyset(
+            lambda cursor, limit: feed_recipes(
+                request.user, subscriptions, cursor, limit
+            ),
+            Recipe, request, FEED_ORDERING
+        )
+        return paginator.get_paginated_response(
+            recipe_bodies(page, request)
+        )
+
+    @action(detail=False, methods=['get'])
+    def pantry(self, request):
+        """Рецепты из имеющихся продуктов: параметры ingredients - id.
+
+        Рецепты ранжируются по доле имеющихся ингредиентов, затем
+        по числу недостающих; поиск идет по индексу в памяти процесса,
+        из базы читаются только тела рецептов, которых нет в кэше.
+        """
+        serializer = PantrySerializer(data={
+            'ingredients': request.query_params.getlist('ingredients')
+        })
+        serializer.is_valid(raise_exception=True)
+        matches = get_pantry_index().search(
+            serializer.validated_data['ingredients']
+        )
+        page = self.paginator.paginate_queryset(matches, request)
+        bodies = recipe_bodies([Recipe(pk=pk) for pk, _, _ in page], request)
+        found = {pk: (coverage, missing) for pk, coverage, missing in page}
+        for body in bodies:
+            coverage, missing = found[body['id']]
+            body['coverage'] = round(coverage, 4)
+            body['missing'] = missing
+        return self.get_paginated_response(bodies)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Рецепты с похожим набором ингредиентов, похожие первыми.
+
+        Соседи заранее посчитаны командой rebuild_similar, чтение -
+        выборка по индексу (recipe, -score) и тела рецептов из кэша.
+        Параметр limit - не больше SIMILAR_RECIPES_LIMIT.
+        """
+        limit = request.query_params.get(
+            'limit', settings.SIMILAR_RECIPES_LIMIT
+        )
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ValidationError({'limit': 'Введите целое число.'})
+        if limit < 1:
+            raise ValidationError({'limit': 'Минимальное значение - 1.'})
+        recipe = self.get_object()
+        scores = dict(SimilarRecipe.objects.filter(
+            recipe=recipe
+        ).order_by('-score', 'similar_id').values_list(
+            'similar_id', 'score'
+        )[:min(limit, settings.SIMILAR_RECIPES_LIMIT)])
+        bodies = recipe_bodies([Recipe(pk=pk) for pk in scores], request)
+        for body in bodies:
+            body['similarity'] = round(scores[body['id']], 4)
+        return Response(bodies)
+
     @action(
         detail=False,
         methods=['get'],
         permission_classes=[IsAuthenticated]
     )
     def download_shopping_cart(self, request):
-        user = request.user
-        aggregated_ingredients = RecipeIngredientList.objects.filter(
-            recipe__shopping_cart__user=user
-        ).values('ingredient__name', 'ingredient__measurement_unit').annotate(
-            total_amount=Sum('amount')
+        """Скачать список покупок в формате txt, csv или pdf.
+
+        Суммы хранятся в ShoppingCartIngredient, поэтому скачивание -
+        это чтение строк пользователя по индексу, а тело ответа
+        отдается генератором.
+        """
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in SHOPPING_LIST_RENDERERS:
+            raise ValidationError(
+                {'file_format': 'Доступные форматы: '
+                 + ', '.join(SHOPPING_LIST_RENDERERS)}
+            )
+        renderer = SHOPPING_LIST_RENDERERS[file_format]
+        ingredients = ShoppingCartIngredient.objects.filter(
+            user=request.user
+        ).values(
+            'total_amount',
+            name=F('ingredient__name'),
+            unit=F('ingredient__measurement_unit')
+        ).order_by('name', 'unit')
+        response = StreamingHttpResponse(
+            renderer.render(ingredients.iterator()),
+            content_type=renderer.media_type
         )
-        dict = {}
-        for ingredient in aggregated_ingredients:
-            name = ingredient['ingredient__name']
-            unit = ingredient['ingredient__measurement_unit']
-            amount = ingredient['total_amount']
-            if name not in dict:
-                dict[name] = {'unit': unit, 'amount': amount}
-            elif name in dict and dict[name]['unit'] == unit:
-                dict[name]['amount'] += amount
-        string_list = ['Ваш список покупок:']
-        n = 1
-        for ingredient_name, value in dict.items():
-            line = (f'{n}. {ingredient_name}: '
-                    f'{value["amount"]} {value["unit"] }')
-            string_list.append(line)
-            n += 1
-        text = '\n'.join(string_list)
-        response = HttpResponse(
-            text,
-            'Content-Type: application/pdf',
-            headers={
-                "Content-Disposition": ('attachment; '
-                                        'filename="shopping_list.txt"')
-            }
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.extension}"'
         )
         return response
@@ -6,11 +6,21 @@ while ! nc -z db 5432;
 done;
     echo "connected to the database";
 
-python manage.py makemigrations
-python manage.py migrate
-python manage.py collectstatic --noinput
-python manage.py createsuperuser --noinput --first_name Kirill --last_name Novoselov
-python manage.py loaddata data/user.json
-python manage.py loaddata data/ingredient.json
-python manage.py loaddata data/tag.json
-gunicorn -w 2 -b 0:8000 foodgram_project.wsgi:application
\ No newline at end of file
+# BOOT_MODE=serve - только запуск сервера (дополнительные реплики,
+# перезапуски). Иначе применяются миграции, обновляется статика
+# и загружаются начальные данные; seed пропускает неизменившиеся файлы.
+if [ "$BOOT_MODE" != "serve" ]; then
+    python manage.py migrate --noinput
+    python manage.py collectstatic --noinput
+    python manage.py seed
+fi
+# Гистограммы воркеров прошлого запуска контейнера больше не нужны.
+rm -rf "${METRICS_DIR:-/tmp/foodgram_metrics}"
+# По умолчанию gunicorn запускает ASGI-воркеры uvicorn: медленные
+# клиенты не занимают воркер, а чтение выполняется в пуле потоков.
+# SERVER_INTERFACE=wsgi - прежние синхронные воркеры.
+if [ "$SERVER_INTERFACE" = "wsgi" ]; then
+    exec gunicorn -w 2 -b 0:8000 foodgram_project.wsgi:application
+fi
+exec gunicorn -w 2 -k uvicorn.workers.UvicornWorker -b 0:8000 \
+    foodgram_project.asgi:application
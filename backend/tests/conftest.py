@@ -0,0 +1,146 @@
+import json
+import os
+import statistics
+import subprocess
+from io import StringIO
+from time import perf_counter
+
+import pytest
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.search import install_search
+from users.models import CustomUser
+
+
+BENCH_USERS = int(os.getenv('BENCH_USERS', 60))
+BENCH_RECIPES = int(os.getenv('BENCH_RECIPES', 400))
+BENCH_SEED = int(os.getenv('BENCH_SEED', 777))
+BENCH_REPEAT = int(os.getenv('BENCH_REPEAT', 15))
+BENCH_OUTPUT = os.getenv(
+    'BENCH_OUTPUT', settings.BASE_DIR / 'benchmark_results.json'
+)
+
+RESULTS = {}
+
+# Точки сохранения появляются только из-за транзакции теста.
+SAVEPOINT_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO')
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+            cwd=settings.BASE_DIR, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not RESULTS:
+        return
+    report = {
+        'commit': current_commit(),
+        'database': connection.vendor,
+        'dataset': {
+            'users': BENCH_USERS,
+            'recipes': BENCH_RECIPES,
+            'seed': BENCH_SEED,
+        },
+        'repeat': BENCH_REPEAT,
+        'routes': RESULTS,
+    }
+    with open(BENCH_OUTPUT, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker):
+    """Тестовая база с синтетическим набором данных на всю сессию.
+
+    База создается без миграций, поэтому индекс полнотекстового поиска
+    из миграции 0006_search_vector ставится отдельно.
+    """
+    with django_db_blocker.unblock():
+        install_search(connection.alias)
+        call_command(
+            'generate_dataset', users=BENCH_USERS, recipes=BENCH_RECIPES,
+            seed=BENCH_SEED, stdout=StringIO()
+        )
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Кэш не откатывается вместе с транзакцией теста."""
+    for cache in caches.all():
+        cache.clear()
+    yield
+    for cache in caches.all():
+        cache.clear()
+
+
+@pytest.fixture
+def user(db):
+    """Самый популярный автор: у него больше всего данных."""
+    return CustomUser.objects.order_by('pk').first()
+
+
+@pytest.fixture
+def client(db):
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(user):
+    token, _ = Token.objects.get_or_create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+class Benchmark:
+    """Проверка бюджета запросов и замер времени ответа маршрута."""
+
+    def measure(self, name, call, budget, reset=None):
+        with CaptureQueriesContext(connection) as context:
+            response = call()
+        assert response.status_code < 400, (
+            f'{name}: {response.status_code} {response.content[:500]}'
+        )
+        statements = [
+            query['sql'] for query in context.captured_queries
+            if not query['sql'].startswith(SAVEPOINT_PREFIXES)
+        ]
+        queries = len(statements)
+        assert queries <= budget, (
+            f'{name}: {queries} запросов при бюджете {budget}:\n'
+            + '\n'.join(statements)
+        )
+        if reset is not None:
+            reset()
+        timings = []
+        for _ in range(BENCH_REPEAT):
+            started = perf_counter()
+            call()
+            timings.append((perf_counter() - started) * 1000)
+            if reset is not None:
+                reset()
+        percentiles = statistics.quantiles(timings, n=100)
+        RESULTS[name] = {
+            'queries': queries,
+            'budget': budget,
+            'p50_ms': round(percentiles[49], 3),
+            'p95_ms': round(percentiles[94], 3),
+        }
+        return response
+
+
+@pytest.fixture
+def bench():
+    return Benchmark()
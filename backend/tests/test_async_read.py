@@ -0,0 +1,76 @@
+import asyncio
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.test import AsyncClient
+from django.urls import resolve
+from rest_framework.authtoken.models import Token
+
+from recipes.async_read import StreamingASGIHandler
+
+
+def test_read_routes_are_async():
+    for path in ('/api/tags/', '/api/ingredients/', '/api/recipes/',
+                 '/api/recipes/1/', '/api/recipes/feed/',
+                 '/api/recipes/download_shopping_cart/'):
+        assert asyncio.iscoroutinefunction(resolve(path).func), path
+    assert not asyncio.iscoroutinefunction(resolve('/api/users/').func)
+
+
+def test_asgi_handler_serves_reads(user, user_client):
+    token, _ = Token.objects.get_or_create(user=user)
+
+    @async_to_sync
+    async def get(path):
+        # В Django 3.2 AsyncClient принимает заголовки по имени, без
+        # префикса HTTP_, а параметры запроса - только в самом пути.
+        return await AsyncClient().get(
+            path, authorization=f'Token {token.key}'
+        )
+
+    for path in ('/api/tags/', '/api/recipes/?limit=3'):
+        response = get(path)
+        assert response.status_code == 200
+        assert response.json() == user_client.get(path).json()
+    response = get('/api/recipes/download_shopping_cart/?file_format=csv')
+    assert response.status_code == 200
+    assert b''.join(response.streaming_content) == b''.join(
+        user_client.get('/api/recipes/download_shopping_cart/',
+                        {'file_format': 'csv'}).streaming_content
+    )
+
+
+def test_asgi_handler_streams_download(user, user_client):
+    token, _ = Token.objects.get_or_create(user=user)
+    path = '/api/recipes/download_shopping_cart/'
+
+    @async_to_sync
+    async def download():
+        communicator = ApplicationCommunicator(StreamingASGIHandler(), {
+            'type': 'http',
+            'method': 'GET',
+            'path': path,
+            'query_string': b'file_format=csv',
+            'headers': [
+                (b'authorization', f'Token {token.key}'.encode()),
+                (b'host', b'testserver'),
+            ],
+        })
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output()
+        messages = []
+        while True:
+            message = await communicator.receive_output()
+            messages.append(message)
+            if not message.get('more_body'):
+                return start, messages
+
+    start, messages = download()
+    assert start['status'] == 200
+    # Части отдаются по мере чтения, а не одним телом.
+    assert len(messages) > 2
+    assert b''.join(message.get('body', b'') for message in messages) == (
+        b''.join(user_client.get(
+            path, {'file_format': 'csv'}
+        ).streaming_content)
+    )
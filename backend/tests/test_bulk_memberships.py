@@ -0,0 +1,89 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from recipes.memberships import (SHOPPING_CART, membership_cache,
+                                 membership_key)
+from recipes.models import Recipe, ShoppingCart
+
+
+def verify():
+    call_command('rebuild_shopping_cart', verify=True, stdout=StringIO())
+    call_command('reconcile_counters', verify=True, stdout=StringIO())
+
+
+def test_bulk_shopping_cart_outcomes(user_client, user):
+    in_cart = Recipe.objects.filter(shopping_cart__user=user).first()
+    new = list(Recipe.objects.exclude(shopping_cart__user=user).values_list(
+        'pk', flat=True
+    )[:3])
+    missing = Recipe.objects.order_by('-pk').first().pk + 1
+    url = '/api/recipes/shopping_cart/bulk/'
+    response = user_client.post(url, {
+        'recipes': [new[0], in_cart.pk, missing, new[1], new[0], new[2]]
+    }, format='json')
+    assert response.status_code == 200
+    assert response.json() == {'results': [
+        {'id': new[0], 'status': 'added'},
+        {'id': in_cart.pk, 'status': 'exists'},
+        {'id': missing, 'status': 'not_found'},
+        {'id': new[1], 'status': 'added'},
+        {'id': new[2], 'status': 'added'},
+    ]}
+    assert set(new) <= set(ShoppingCart.objects.filter(
+        user=user).values_list('recipe_id', flat=True))
+    verify()
+    cart = user_client.get('/api/recipes/', {'is_in_shopping_cart': 1})
+    assert set(new) <= {recipe['id'] for recipe in cart.json()['results']}
+
+    response = user_client.delete(url, {
+        'recipes': [new[0], new[1], missing]
+    }, format='json')
+    assert response.json() == {'results': [
+        {'id': new[0], 'status': 'removed'},
+        {'id': new[1], 'status': 'removed'},
+        {'id': missing, 'status': 'not_found'},
+    ]}
+    response = user_client.delete(url, {'recipes': [new[0]]}, format='json')
+    assert response.json() == {'results': [
+        {'id': new[0], 'status': 'absent'},
+    ]}
+    detail = user_client.get(f'/api/recipes/{new[0]}/').json()
+    assert detail['is_in_shopping_cart'] is False
+    verify()
+
+
+def test_bulk_ignores_stale_memberships(user_client, user):
+    in_cart = ShoppingCart.objects.filter(user=user).first().recipe_id
+    new = Recipe.objects.exclude(shopping_cart__user=user).first().pk
+    url = '/api/recipes/shopping_cart/bulk/'
+
+    def stale(recipe_ids):
+        membership_cache().set(
+            membership_key(SHOPPING_CART, user.pk), frozenset(recipe_ids)
+        )
+
+    stale([])
+    response = user_client.post(url, {'recipes': [in_cart, new]},
+                                format='json')
+    assert response.json() == {'results': [
+        {'id': in_cart, 'status': 'exists'},
+        {'id': new, 'status': 'added'},
+    ]}
+    verify()
+    user_client.delete(url, {'recipes': [new]}, format='json')
+    stale([new])
+    response = user_client.delete(url, {'recipes': [new]}, format='json')
+    assert response.json() == {'results': [{'id': new, 'status': 'absent'}]}
+    verify()
+
+
+def test_bulk_favorite_validation(user_client, client):
+    url = '/api/recipes/favorite/bulk/'
+    assert client.post(url, {'recipes': [1]},
+                       format='json').status_code == 401
+    for body in ({'recipes': []}, {'recipes': ['x']}, {},
+                 {'recipes': list(range(1, 102))}):
+        response = user_client.post(url, body, format='json')
+        assert response.status_code == 400, body
+        assert 'recipes' in response.json()
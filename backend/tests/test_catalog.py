@@ -0,0 +1,38 @@
+from recipes.models import Tag
+
+
+def test_catalog_not_modified_until_changed(client):
+    response = client.get('/api/tags/')
+    etag, last_modified = response['ETag'], response['Last-Modified']
+    assert client.get(
+        '/api/tags/', HTTP_IF_NONE_MATCH=etag
+    ).status_code == 304
+    assert client.get(
+        '/api/tags/', HTTP_IF_MODIFIED_SINCE=last_modified
+    ).status_code == 304
+    tag = Tag.objects.create(name='Новый тег', slug='new', color='#123456')
+    response = client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert tag.pk in [item['id'] for item in response.json()]
+
+
+def test_ingredient_search_variants_have_own_etags(client):
+    first = client.get('/api/ingredients/', {'name': 'мо'})
+    second = client.get('/api/ingredients/', {'name': 'са'})
+    assert first['ETag'] != second['ETag']
+    assert client.get(
+        '/api/ingredients/', {'name': 'мо'},
+        HTTP_IF_NONE_MATCH=first['ETag']
+    ).status_code == 304
+
+
+def test_version_bumped_again_on_commit(client,
+                                        django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        Tag.objects.create(name='Новый тег', slug='new', color='#123456')
+        # Параллельный запрос до коммита закэшировал бы ответ под этой
+        # версией.
+        etag = client.get('/api/tags/')['ETag']
+    assert client.get(
+        '/api/tags/', HTTP_IF_NONE_MATCH=etag
+    ).status_code == 200
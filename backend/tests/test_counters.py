@@ -0,0 +1,84 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from recipes.models import Favourite, Recipe, ShoppingCart
+from users.models import CustomUser, Subscriptions
+
+
+def verify_counters():
+    call_command('reconcile_counters', verify=True, stdout=StringIO())
+
+
+def test_counters_follow_api_writes(user_client, user):
+    recipe = Recipe.objects.exclude(author=user).exclude(
+        favorite_recipes__user=user).exclude(shopping_cart__user=user).first()
+    author = CustomUser.objects.exclude(pk=user.pk).exclude(
+        subscribers__user=user).first()
+    verify_counters()
+    user_client.post(f'/api/recipes/{recipe.pk}/favorite/')
+    user_client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+    user_client.post(f'/api/users/{author.pk}/subscribe/')
+    recipe.refresh_from_db()
+    assert recipe.favorites_count >= 1
+    verify_counters()
+    for path in (f'/api/recipes/{recipe.pk}/favorite/',
+                 f'/api/recipes/{recipe.pk}/shopping_cart/',
+                 f'/api/users/{author.pk}/subscribe/'):
+        response = user_client.delete(path)
+        # Тело у ответа 204 ломает соединение под uvicorn.
+        assert (response.status_code, response.content) == (204, b'')
+    own = Recipe.objects.filter(author=user).first()
+    assert user_client.delete(f'/api/recipes/{own.pk}/').status_code == 204
+    verify_counters()
+
+
+def test_counters_follow_orm_deletes(db):
+    """Админка и каскадное удаление обходят представления."""
+    user = CustomUser.objects.filter(
+        favorite_recipes__isnull=False, subscribed_to__isnull=False,
+        recipes__isnull=False
+    ).first()
+    recipe = Recipe.objects.filter(favorites_count__gt=0).exclude(
+        author=user).first()
+    author = CustomUser.objects.exclude(pk=user.pk).exclude(
+        subscribers__user=user).first()
+    verify_counters()
+    Favourite.objects.get_or_create(user=author, recipe=recipe)
+    ShoppingCart.objects.get_or_create(user=author, recipe=recipe)
+    Subscriptions.objects.create(user=author, subscription=user)
+    verify_counters()
+    recipe.delete()
+    verify_counters()
+    user.delete()
+    verify_counters()
+
+
+def test_full_save_keeps_counters(db):
+    recipe = Recipe.objects.first()
+    stale = Recipe.objects.get(pk=recipe.pk)
+    Recipe.objects.filter(pk=recipe.pk).update(favorites_count=7)
+    stale.name = 'Новое название'
+    stale.save()
+    recipe.refresh_from_db()
+    assert (recipe.name, recipe.favorites_count) == ('Новое название', 7)
+
+
+def test_reconcile_fixes_drift(db):
+    Recipe.objects.update(favorites_count=100)
+    with pytest.raises(CommandError):
+        verify_counters()
+    call_command('reconcile_counters', stdout=StringIO())
+    verify_counters()
+
+
+def test_order_by_favorites_count(client):
+    response = client.get('/api/recipes/', {'ordering': '-favorites_count',
+                                            'limit': 20})
+    ids = [item['id'] for item in response.json()['results']]
+    counts = Recipe.objects.in_bulk(ids)
+    assert [counts[pk].favorites_count for pk in ids] == sorted(
+        (counts[pk].favorites_count for pk in ids), reverse=True
+    )
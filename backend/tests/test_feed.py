@@ -0,0 +1,100 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import FeedEntry, Recipe
+from users.models import CustomUser, Subscriptions
+
+
+def expected_feed(user):
+    return list(Recipe.objects.filter(
+        author__subscribers__user=user
+    ).order_by('-pub_date', '-id').values_list('pk', flat=True))
+
+
+def read_feed(client, limit=7):
+    ids = []
+    response = client.get('/api/recipes/feed/', {'limit': limit})
+    while True:
+        assert response.status_code == 200
+        ids += [recipe['id'] for recipe in response.data['results']]
+        if response.data['next'] is None:
+            return ids
+        response = client.get(response.data['next'])
+
+
+def test_feed_matches_subscriptions(user_client, user):
+    assert expected_feed(user)
+    assert read_feed(user_client) == expected_feed(user)
+
+
+def test_feed_follows_writes(user_client, user):
+    author = CustomUser.objects.exclude(pk=user.pk).exclude(
+        subscribers__user=user).filter(recipes__isnull=False).first()
+    user_client.post(f'/api/users/{author.pk}/subscribe/')
+    assert read_feed(user_client) == expected_feed(user)
+    recipe = Recipe.objects.filter(author=author).first()
+    assert recipe.pk in read_feed(user_client)
+    user_client.delete(f'/api/users/{author.pk}/subscribe/')
+    assert not FeedEntry.objects.filter(user=user, author=author).exists()
+    assert read_feed(user_client) == expected_feed(user)
+
+
+def create_recipe(client):
+    response = client.post('/api/recipes/', {
+        'ingredients': [{'id': Recipe.objects.first().ingredients.first().pk,
+                         'amount': 1}],
+        'tags': [],
+        'image': (
+            'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAA'
+            'BieywaAAAACVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4'
+            'bAAAACklEQVQImWNoAAAAggCByxOyYQAAAABJRU5ErkJggg=='
+        ),
+        'name': 'Новый',
+        'text': 'Описание',
+        'cooking_time': 5,
+    }, format='json')
+    assert response.status_code == 201, response.data
+    return response.data['id']
+
+
+def test_new_recipe_is_fanned_out(user_client, user):
+    subscriber = Subscriptions.objects.filter(subscription=user).first().user
+    assert FeedEntry.objects.filter(
+        user=subscriber, recipe_id=create_recipe(user_client)
+    ).exists()
+
+
+@override_settings(FEED_FANOUT_LIMIT=0)
+def test_popular_authors_are_pulled(user_client, user):
+    call_command('rebuild_feed', stdout=StringIO())
+    assert not FeedEntry.objects.exists()
+    assert read_feed(user_client) == expected_feed(user)
+
+
+def client_for(user):
+    token, _ = Token.objects.get_or_create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def test_pulled_recipes_stay_when_author_shrinks(user_client, user):
+    """Рецепт, не разосланный при публикации, остается в лентах,
+    когда автор снова укладывается в FEED_FANOUT_LIMIT."""
+    subscriber = Subscriptions.objects.filter(subscription=user).first().user
+    with override_settings(FEED_FANOUT_LIMIT=0):
+        recipe_id = create_recipe(user_client)
+    assert not FeedEntry.objects.filter(recipe_id=recipe_id).exists()
+    assert recipe_id in read_feed(client_for(subscriber))
+    assert read_feed(client_for(subscriber)) == expected_feed(subscriber)
+    newcomer = CustomUser.objects.exclude(pk=user.pk).exclude(
+        subscribed_to__subscription=user
+    ).first()
+    newcomer_client = client_for(newcomer)
+    newcomer_client.post(f'/api/users/{user.pk}/subscribe/')
+    assert recipe_id in read_feed(newcomer_client)
+    assert read_feed(newcomer_client) == expected_feed(newcomer)
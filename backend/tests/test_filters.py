@@ -0,0 +1,50 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Recipe, Tag
+
+
+def recipe_ids(client, **params):
+    response = client.get('/api/recipes/', {'limit': 1000, **params})
+    assert response.status_code == 200, response.data
+    return {body['id'] for body in response.data['results']}
+
+
+def test_filters_compose_without_distinct(user_client, user):
+    slugs = list(Tag.objects.values_list('slug', flat=True)[:2])
+    params = {'tags': slugs, 'author': user.pk, 'is_favorited': 0}
+    # Тела рецептов уже в кэше: остаются только запросы фильтра.
+    recipe_ids(user_client, **params)
+    with CaptureQueriesContext(connection) as context:
+        found = recipe_ids(user_client, **params)
+    statements = [
+        query['sql'] for query in context.captured_queries
+        if 'recipes_recipe' in query['sql']
+    ]
+    assert statements
+    for sql in statements:
+        assert 'DISTINCT' not in sql.upper()
+        assert 'JOIN "recipes_recipetaglist"' not in sql
+    assert found == set(Recipe.objects.filter(
+        author=user, tags__slug__in=slugs
+    ).exclude(favorite_recipes__user=user).values_list('pk', flat=True))
+
+
+def test_user_flags(user_client, client, user):
+    favorites = set(user.favorite_recipes.values_list('recipe_id', flat=True))
+    cart = set(user.shopping_cart.values_list('recipe_id', flat=True))
+    assert favorites and cart
+    assert recipe_ids(user_client, is_favorited=1) == favorites
+    assert recipe_ids(user_client, is_favorited=1,
+                      is_in_shopping_cart=1) == favorites & cart
+    assert not recipe_ids(user_client, is_favorited=0) & favorites
+    assert recipe_ids(client, is_favorited=1) == set()
+    assert recipe_ids(client, is_favorited=0) == recipe_ids(client)
+
+
+def test_tag_choices_follow_catalog(user_client):
+    assert user_client.get(
+        '/api/recipes/', {'tags': 'breakfast'}
+    ).status_code == 400
+    Tag.objects.create(name='Завтрак', color='#123456', slug='breakfast')
+    assert recipe_ids(user_client, tags='breakfast') == set()
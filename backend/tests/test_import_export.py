@@ -0,0 +1,64 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from recipes.models import Recipe, RecipeIngredientList
+
+
+def test_export_import_round_trip(tmp_path, user):
+    path = tmp_path / 'recipes.jsonl'
+    call_command('export_recipes', str(path), batch_size=37,
+                 stderr=StringIO())
+    rows = [json.loads(line) for line in path.open(encoding='utf-8')]
+    assert len(rows) == Recipe.objects.count()
+    rows[0]['ingredients'].append(
+        {'name': 'несуществующий', 'measurement_unit': 'г', 'amount': 1}
+    )
+    path.write_text(
+        ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows),
+        encoding='utf-8'
+    )
+    recipes_before = Recipe.objects.count()
+    ingredients_before = RecipeIngredientList.objects.count()
+    count_before = user.recipes_count
+    call_command('import_recipes', str(path), batch_size=50,
+                 stderr=StringIO(), stdout=StringIO())
+    assert Recipe.objects.count() == 2 * recipes_before - 1
+    imported = Recipe.objects.order_by('-pk').first()
+    source = rows[-1]
+    assert imported.name == source['name']
+    assert imported.pub_date.isoformat() == source['pub_date']
+    assert sorted(imported.tags.values_list('slug', flat=True)) == sorted(
+        source['tags'])
+    assert RecipeIngredientList.objects.count() == (
+        2 * ingredients_before - len(rows[0]['ingredients']) + 1
+    )
+    user.refresh_from_db()
+    assert user.recipes_count > count_before
+    call_command('reconcile_counters', verify=True, stdout=StringIO())
+
+
+@pytest.mark.parametrize('field', ('ingredients', 'tags'))
+def test_import_skips_repeated_references(tmp_path, user, field):
+    path = tmp_path / 'recipes.jsonl'
+    call_command('export_recipes', str(path), stderr=StringIO())
+    rows = [json.loads(line)
+            for line in path.open(encoding='utf-8')][:3]
+    rows = [row for row in rows if row['tags']]
+    rows[0][field].append(rows[0][field][0])
+    path.write_text(
+        ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows),
+        encoding='utf-8'
+    )
+    recipes_before = Recipe.objects.count()
+    errors = StringIO()
+    call_command('import_recipes', str(path), stderr=errors,
+                 stdout=StringIO())
+    assert Recipe.objects.count() == recipes_before + len(rows) - 1
+    assert 'повторяются' in errors.getvalue()
+    with pytest.raises(CommandError):
+        call_command('import_recipes', str(path), strict=True,
+                     stderr=StringIO(), stdout=StringIO())
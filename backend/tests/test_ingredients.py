@@ -0,0 +1,55 @@
+import pytest
+
+from recipes.ingredient_index import IngredientIndex
+from recipes.models import Ingredient
+
+
+ROWS = (
+    (1, 'Масло сливочное', 'г'),
+    (2, 'масло', 'мл'),
+    (3, 'оливковое масло', 'мл'),
+    (4, 'Маслины', 'шт.'),
+    (5, 'Мёд', 'г'),
+    (6, 'сахар', 'г'),
+)
+
+
+def ids(items):
+    return [item['id'] for item in items]
+
+
+def test_search_ranks_exact_then_prefix_then_infix():
+    index = IngredientIndex(ROWS)
+    assert ids(index.search('масло')) == [2, 1, 3]
+    assert ids(index.search('мас')) == [2, 4, 1, 3]
+
+
+def test_search_normalizes_case_and_yo():
+    index = IngredientIndex(ROWS)
+    assert ids(index.search('МЕД')) == [5]
+
+
+def test_search_limit_and_full_catalog():
+    index = IngredientIndex(ROWS)
+    assert ids(index.search('мас', limit=2)) == [2, 4]
+    assert len(index.search('')) == len(ROWS)
+
+
+def test_endpoint_follows_ingredient_changes(client):
+    client.get('/api/ingredients/', {'name': 'чайный гриб'})
+    ingredient = Ingredient.objects.create(
+        name='Чайный гриб', measurement_unit='шт.'
+    )
+    response = client.get('/api/ingredients/', {'name': 'чайный гриб'})
+    assert ids(response.json()) == [ingredient.pk]
+    ingredient.delete()
+    response = client.get('/api/ingredients/', {'name': 'гриб', 'limit': 5})
+    assert ingredient.pk not in ids(response.json())
+    assert len(response.json()) <= 5
+
+
+@pytest.mark.parametrize('limit', ('0', 'много'))
+def test_endpoint_rejects_bad_limit(client, limit):
+    response = client.get('/api/ingredients/', {'name': 'гриб',
+                                                'limit': limit})
+    assert response.status_code == 400
@@ -0,0 +1,46 @@
+from io import StringIO
+
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from recipes.loadtest import SCENARIOS, LoadTest, load_collection, report
+from recipes.management.commands.load_test import Command
+from recipes.models import ShoppingCartIngredient
+
+
+def test_scenarios_come_from_collection():
+    requests = load_collection()
+    for _, steps in SCENARIOS.values():
+        for name in steps:
+            method, url, _ = requests[name]
+            assert url.startswith('{{baseUrl}}/api/'), name
+
+
+def test_virtual_user_runs_all_scenarios(db):
+    command = Command(stdout=StringIO())
+    [(token, user_id)] = command.prepare_users(1)
+    client = APIClient()
+
+    def send(method, path, body, token):
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        return client.generic(method, path, body,
+                              content_type='application/json').status_code
+
+    load_test = LoadTest(send, command.load_dataset(), seed=1)
+    samples = load_test.virtual_user(0, token, user_id, iterations=60)
+    result = report(samples, elapsed=1)
+    assert len(result) == sum(len(steps) for _, steps in SCENARIOS.values())
+    assert sum(stats['requests'] for stats in result.values()) == len(
+        samples)
+    assert all(stats['errors'] == 0 for stats in result.values()), result
+    assert result['POST /api/recipes/{{firstRecipeId}}/favorite/'][
+        'requests'] == result[
+        'DELETE /api/recipes/{{firstRecipeId}}/favorite/']['requests']
+    call_command('reconcile_counters', verify=True, stdout=StringIO())
+    # Прерванный запуск оставил рецепт в корзине.
+    recipe_id = command.load_dataset()['recipes'][0]
+    send('POST', f'/api/recipes/{recipe_id}/shopping_cart/', None, token)
+    assert ShoppingCartIngredient.objects.filter(user_id=user_id).exists()
+    command.prepare_users(1)
+    call_command('reconcile_counters', verify=True, stdout=StringIO())
+    call_command('rebuild_shopping_cart', verify=True, stdout=StringIO())
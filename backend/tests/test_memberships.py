@@ -0,0 +1,50 @@
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Favourite, Recipe
+from users.models import CustomUser
+
+
+def flags(client, recipe):
+    data = client.get(f'/api/recipes/{recipe.pk}/').data
+    return (data['is_favorited'], data['is_in_shopping_cart'],
+            data['author']['is_subscribed'])
+
+
+def test_memberships_follow_writes(user_client, user):
+    recipe = Recipe.objects.exclude(author=user).exclude(
+        favorite_recipes__user=user).exclude(shopping_cart__user=user).exclude(
+        author__subscribers__user=user).first()
+    assert flags(user_client, recipe) == (False, False, False)
+    user_client.post(f'/api/recipes/{recipe.pk}/favorite/')
+    user_client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+    user_client.post(f'/api/users/{recipe.author_id}/subscribe/')
+    assert flags(user_client, recipe) == (True, True, True)
+    user_client.delete(f'/api/recipes/{recipe.pk}/favorite/')
+    user_client.delete(f'/api/recipes/{recipe.pk}/shopping_cart/')
+    user_client.delete(f'/api/users/{recipe.author_id}/subscribe/')
+    assert flags(user_client, recipe) == (False, False, False)
+
+
+def test_rolled_back_write_not_cached(user_client, user):
+    recipe = Recipe.objects.exclude(favorite_recipes__user=user).first()
+    assert flags(user_client, recipe)[0] is False
+    with pytest.raises(RuntimeError), transaction.atomic():
+        Favourite.objects.create(user=user, recipe=recipe)
+        raise RuntimeError
+    assert flags(user_client, recipe)[0] is False
+
+
+def test_warm_flags_cost_no_queries(user_client):
+    user_client.get('/api/users/')
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.get('/api/users/')
+    subscribed = [row['id'] for row in response.data['results']
+                  if row['is_subscribed']]
+    assert not any('users_subscriptions' in query['sql']
+                   for query in context.captured_queries)
+    user = CustomUser.objects.order_by('pk').first()
+    assert set(subscribed) <= set(
+        user.subscribed_to.values_list('subscription_id', flat=True)
+    )
@@ -0,0 +1,120 @@
+import json
+import logging
+import re
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+
+from foodgram_project.metrics import (REQUEST_QUERIES, SLOW_REQUEST_LOGGER,
+                                      RequestStats, current_stats)
+from recipes.models import Tag
+from recipes.serializers import TagSerializer
+
+SERVER_TIMING = re.compile(
+    r'db;dur=[\d.]+;desc="(\d+) queries", serialize;dur=([\d.]+), '
+    r'total;dur=[\d.]+'
+)
+
+
+def server_timing(response):
+    match = SERVER_TIMING.fullmatch(response['Server-Timing'])
+    assert match, response['Server-Timing']
+    return int(match[1]), float(match[2])
+
+
+def test_server_timing_counts_queries(user_client):
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.get('/api/recipes/', {'limit': 3})
+    assert response.status_code == 200
+    queries, serialize = server_timing(response)
+    assert queries == len(context.captured_queries)
+    assert serialize > 0
+
+
+def test_server_timing_under_asgi(db):
+    @async_to_sync
+    async def get(path):
+        return await AsyncClient().get(path)
+
+    response = get('/api/recipes/?limit=3')
+    assert response.status_code == 200
+    queries, _ = server_timing(response)
+    assert queries > 0
+
+
+def scrape(client, token='secret'):
+    return client.get('/metrics', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+
+def test_metrics_histograms_per_route(client, settings):
+    settings.METRICS_TOKEN = 'secret'
+    client.get('/api/tags/')
+    response = scrape(client)
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    text = response.content.decode()
+    assert ('foodgram_request_duration_seconds_count'
+            '{route="tags-list",method="GET"}') in text
+    assert ('foodgram_request_queries_bucket'
+            '{route="tags-list",method="GET",le="+Inf"}') in text
+
+
+def test_metrics_require_token(client, settings):
+    settings.METRICS_TOKEN = ''
+    assert scrape(client).status_code == 403
+    settings.METRICS_TOKEN = 'secret'
+    assert client.get('/metrics').status_code == 403
+    assert scrape(client, 'wrong').status_code == 403
+
+
+def test_metrics_sum_other_processes(client, settings):
+    settings.METRICS_TOKEN = 'secret'
+    other = settings.METRICS_DIR / 'other-worker.json'
+    other.parent.mkdir(parents=True, exist_ok=True)
+    buckets = len(REQUEST_QUERIES.buckets) + 1
+    other.write_text(json.dumps({REQUEST_QUERIES.name: [
+        [['other-route', 'GET'], [0] * (buckets - 1) + [3], 360.0],
+    ]}))
+    try:
+        text = scrape(client).content.decode()
+    finally:
+        other.unlink()
+    assert ('foodgram_request_queries_count'
+            '{route="other-route",method="GET"} 3') in text
+    assert ('foodgram_request_queries_sum'
+            '{route="other-route",method="GET"} 360.0') in text
+
+
+def test_serializer_time_measured(db):
+    stats = RequestStats()
+    token = current_stats.set(stats)
+    try:
+        TagSerializer(Tag.objects.all(), many=True).data
+    finally:
+        current_stats.reset(token)
+    assert stats.serialize_time > 0
+
+
+def test_streaming_queries_measured(user_client):
+    labels = ('recipes-download-shopping-cart', 'GET')
+
+    def observed():
+        return REQUEST_QUERIES.series.get(labels, (None, 0.0))[1]
+
+    before = observed()
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.get('/api/recipes/download_shopping_cart/')
+        assert b''.join(response.streaming_content)
+    assert observed() - before == len(context.captured_queries)
+
+
+def test_slow_request_logged_with_sql(client, settings, caplog):
+    settings.SLOW_REQUEST_MS = 0
+    with caplog.at_level(logging.WARNING, logger=SLOW_REQUEST_LOGGER):
+        client.get('/api/recipes/', {'limit': 3})
+    [record] = caplog.records
+    message = record.getMessage()
+    assert message.startswith('Медленный запрос GET /api/recipes/?limit=3')
+    assert 'SELECT' in message
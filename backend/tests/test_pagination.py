@@ -0,0 +1,52 @@
+from recipes.models import Recipe
+
+
+def collect(client, url, params):
+    ids, pages = [], 0
+    response = client.get(url, params)
+    while True:
+        assert response.status_code == 200
+        data = response.json()
+        assert 'count' not in data
+        ids += [item['id'] for item in data['results']]
+        pages += 1
+        if not data['next']:
+            return ids, pages
+        response = client.get(data['next'])
+
+
+def test_recipe_cursor_walks_feed_in_order(client):
+    ids, _ = collect(client, '/api/recipes/', {'cursor': '', 'limit': 50})
+    expected = list(Recipe.objects.order_by(
+        '-pub_date', '-id').values_list('id', flat=True))
+    assert ids == expected
+
+
+def test_recipe_cursor_is_stable_under_inserts(client, user):
+    first = client.get('/api/recipes/', {'cursor': '', 'limit': 5}).json()
+    Recipe.objects.create(author=user, name='Новый', text='Текст',
+                          cooking_time=5, image='recipes/new.png')
+    second = client.get(first['next']).json()
+    first_ids = {item['id'] for item in first['results']}
+    assert not first_ids & {item['id'] for item in second['results']}
+    assert len(second['results']) == 5
+
+
+def test_subscriptions_cursor(user_client, user):
+    ids, pages = collect(user_client, '/api/users/subscriptions/',
+                         {'cursor': '', 'limit': 2})
+    expected = list(user.subscribed_to.order_by(
+        'subscription__username').values_list('subscription_id', flat=True))
+    assert ids == expected
+
+
+def test_page_number_still_works(client):
+    data = client.get('/api/recipes/', {'page': 2, 'limit': 3}).json()
+    assert data['count'] == Recipe.objects.count()
+    assert len(data['results']) == 3
+
+
+def test_invalid_cursor(client):
+    assert client.get(
+        '/api/recipes/', {'cursor': 'не-курсор'}
+    ).status_code == 404
@@ -0,0 +1,175 @@
+import random
+
+import pytest
+from django.core.cache import cache
+
+from recipes import pantry_index
+from recipes.catalog import version_cache
+from recipes.models import PantryLog, Recipe, RecipeIngredientList
+from recipes.pantry_index import (PantryIndex, change_key, get_generation,
+                                  get_pantry_index)
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAA'
+    'BieywaAAAACVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4'
+    'bAAAACklEQVQImWNoAAAAggCByxOyYQAAAABJRU5ErkJggg=='
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch):
+    """Индекс процесса не откатывается вместе с транзакцией теста."""
+    monkeypatch.setattr(pantry_index, '_index', None)
+
+
+def expected(pantry, recipes=None):
+    if recipes is None:
+        recipes = {}
+        for recipe_id, ingredient_id in (
+            RecipeIngredientList.objects.values_list(
+                'recipe_id', 'ingredient_id'
+            )
+        ):
+            recipes.setdefault(recipe_id, set()).add(ingredient_id)
+    ranked = []
+    for recipe_id, ingredients in recipes.items():
+        found = len(ingredients & pantry)
+        if found:
+            coverage = found / len(ingredients)
+            missing = len(ingredients) - found
+            ranked.append(((-coverage, missing, -recipe_id),
+                           (recipe_id, round(coverage, 4), missing)))
+    return [match for _, match in sorted(ranked)]
+
+
+def search(client, pantry, **params):
+    response = client.get('/api/recipes/pantry/',
+                          {'ingredients': sorted(pantry), **params})
+    assert response.status_code == 200, response.data
+    return response.data
+
+
+def test_ranked_by_coverage(user_client):
+    recipes = Recipe.objects.order_by('pk')[:3]
+    pantry = set(RecipeIngredientList.objects.filter(
+        recipe__in=recipes
+    ).values_list('ingredient_id', flat=True))
+    ranking = expected(pantry)
+    data = search(user_client, pantry, limit=10, page=2)
+    assert data['count'] == len(ranking)
+    assert [
+        (body['id'], body['coverage'], body['missing'])
+        for body in data['results']
+    ] == ranking[10:20]
+    first = search(user_client, pantry, limit=3)['results']
+    assert [body['coverage'] for body in first] == [1, 1, 1]
+
+
+def test_index_matches_brute_force():
+    rng = random.Random(7)
+    # Частые ингредиенты хранятся масками, редкие - массивами.
+    recipes = {
+        pk: set(rng.sample(range(5), 2)) | set(rng.sample(range(5, 1000), 6))
+        for pk in range(1, 1001)
+    }
+    index = PantryIndex(sorted(
+        (pk, ingredient) for pk, ingredients in recipes.items()
+        for ingredient in ingredients
+    ))
+    assert isinstance(index.postings[0], int)
+    assert not isinstance(index.postings[100], int)
+    recipes[5] = {1, 100, 101}
+    recipes[1200] = {2, 3}
+    del recipes[7]
+    untouched = index.postings[500]
+    for pk in (5, 1200, 7):
+        index.replace(pk, recipes.get(pk, set()))
+    recipes[5] = {1, 102}
+    index.replace(5, recipes[5])
+    assert set(index.ingredients_of(5)) == recipes[5]
+    assert index.postings[500] is untouched
+    for _ in range(5):
+        pantry = set(rng.sample(range(1000), 150)) | {1, 2, 3}
+        matches = index.search(pantry)
+        ranking = expected(pantry, recipes)
+        assert len(matches) == len(ranking)
+        assert [
+            (pk, round(coverage, 4), missing)
+            for pk, coverage, missing in matches[0:len(matches)]
+        ] == ranking
+
+
+def test_validation(client):
+    assert client.get('/api/recipes/pantry/').status_code == 400
+    assert client.get(
+        '/api/recipes/pantry/', {'ingredients': 'соль'}
+    ).status_code == 400
+
+
+def test_index_follows_writes(user_client, user,
+                              django_capture_on_commit_callbacks):
+    pantry = set(RecipeIngredientList.objects.filter(
+        recipe=Recipe.objects.first()
+    ).values_list('ingredient_id', flat=True))
+    index = get_pantry_index()
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.post('/api/recipes/', {
+            'ingredients': [{'id': pk, 'amount': 1}
+                            for pk in sorted(pantry)[:2]],
+            'tags': [],
+            'image': IMAGE,
+            'name': 'Из продуктов',
+            'text': 'Описание',
+            'cooking_time': 5,
+        }, format='json')
+    assert response.status_code == 201, response.data
+    created = response.data['id']
+    first = search(user_client, pantry, limit=1)['results'][0]
+    assert (first['id'], first['coverage'], first['missing']) == (
+        created, 1, 0
+    )
+    other = RecipeIngredientList.objects.exclude(
+        ingredient_id__in=pantry
+    ).values_list('ingredient_id', flat=True).first()
+    with django_capture_on_commit_callbacks(execute=True):
+        user_client.patch(f'/api/recipes/{created}/', {
+            'ingredients': [{'id': pk, 'amount': 1}
+                            for pk in sorted(pantry)[:1] + [other]],
+        }, format='json')
+    results = search(user_client, pantry, limit=1000)['results']
+    assert [
+        (body['coverage'], body['missing'])
+        for body in results if body['id'] == created
+    ] == [(0.5, 1)]
+    with django_capture_on_commit_callbacks(execute=True):
+        user_client.delete(f'/api/recipes/{created}/')
+    assert search(user_client, pantry, limit=1000)['count'] == len(
+        expected(pantry)
+    )
+    assert get_pantry_index() is index
+
+
+def test_lost_log_entry_rebuilds(db, monkeypatch,
+                                 django_capture_on_commit_callbacks):
+    recipe = Recipe.objects.first()
+    index = get_pantry_index()
+    with django_capture_on_commit_callbacks(execute=True):
+        pantry_index.record_recipe_changes([recipe.pk])
+    version_cache().delete(change_key(get_generation(), index.position + 1))
+    assert get_pantry_index() is index
+    monkeypatch.setattr(pantry_index, 'PANTRY_LOG_WAIT', -1)
+    assert get_pantry_index() is not index
+
+
+def test_log_numbers_come_from_db(db, django_capture_on_commit_callbacks):
+    recipes = list(Recipe.objects.values_list('pk', flat=True)[:2])
+    last = PantryLog.objects.last_number()
+    with django_capture_on_commit_callbacks(execute=True):
+        for pk in recipes:
+            pantry_index.record_recipe_changes([pk])
+    assert PantryLog.objects.last_number() == last + 2
+    # Журнал не вытесняется вместе с телами рецептов из общего кэша.
+    cache.clear()
+    generation = get_generation()
+    assert [version_cache().get(change_key(generation, last + number))
+            for number in (1, 2)] == [[pk] for pk in recipes]
@@ -0,0 +1,347 @@
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import CustomUser, Subscriptions
+
+
+# Аутентификация по токену стоит один запрос на каждый вызов.
+AUTH = 1
+
+
+@pytest.fixture
+def recipe(user):
+    """Рецепт, которого нет в избранном и корзине пользователя."""
+    return Recipe.objects.exclude(
+        favorite_recipes__user=user
+    ).exclude(shopping_cart__user=user).first()
+
+
+@pytest.fixture
+def author(user):
+    """Автор, на которого пользователь еще не подписан."""
+    return CustomUser.objects.exclude(pk=user.pk).exclude(
+        subscribers__user=user
+    ).first()
+
+
+def test_tags(client, bench):
+    client.get('/api/tags/')
+    bench.measure('tags-list', lambda: client.get('/api/tags/'), 0)
+    etag = client.get('/api/tags/')['ETag']
+    response = bench.measure(
+        'tags-list-not-modified',
+        lambda: client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag), 0
+    )
+    assert response.status_code == 304
+    tag = Tag.objects.first()
+    bench.measure(
+        'tags-detail', lambda: client.get(f'/api/tags/{tag.pk}/'), 1
+    )
+
+
+def test_ingredients(client, bench):
+    client.get('/api/ingredients/', {'name': 'мо'})
+    bench.measure(
+        'ingredients-search',
+        lambda: client.get('/api/ingredients/', {'name': 'мо'}), 0
+    )
+    bench.measure(
+        'ingredients-list', lambda: client.get('/api/ingredients/'), 0
+    )
+    ingredient = Ingredient.objects.first()
+    bench.measure(
+        'ingredients-detail',
+        lambda: client.get(f'/api/ingredients/{ingredient.pk}/'), 1
+    )
+
+
+@pytest.mark.parametrize('limit', (settings.PAGE_SIZE, 50))
+def test_recipes_list_anonymous(client, bench, limit):
+    client.get('/api/recipes/', {'limit': limit})
+    bench.measure(
+        f'recipes-list-anonymous-{limit}',
+        lambda: client.get('/api/recipes/', {'limit': limit}), 2
+    )
+
+
+@pytest.mark.parametrize('limit', (settings.PAGE_SIZE, 50))
+def test_recipes_list(user_client, bench, limit):
+    user_client.get('/api/recipes/', {'limit': limit})
+    bench.measure(
+        f'recipes-list-{limit}',
+        lambda: user_client.get('/api/recipes/', {'limit': limit}),
+        AUTH + 2
+    )
+
+
+@pytest.mark.parametrize('limit', (settings.PAGE_SIZE, 50))
+def test_recipes_list_cold_cache(user_client, bench, limit):
+    # Промах кэша: рецепты с авторами, теги и ингредиенты.
+    user_client.get('/api/recipes/', {'limit': limit})
+    cache.clear()
+    bench.measure(
+        f'recipes-list-cold-{limit}',
+        lambda: user_client.get('/api/recipes/', {'limit': limit}),
+        AUTH + 5, reset=cache.clear
+    )
+
+
+def test_recipes_list_cursor(user_client, bench):
+    # Режим курсора не выполняет COUNT(*).
+    user_client.get('/api/recipes/', {'cursor': ''})
+    bench.measure(
+        'recipes-list-cursor',
+        lambda: user_client.get('/api/recipes/', {'cursor': ''}), AUTH + 1
+    )
+
+
+@pytest.mark.parametrize('params, budget', (
+    ({'is_favorited': 1}, AUTH + 2),
+    ({'is_in_shopping_cart': 1}, AUTH + 2),
+    ({'tags': 'desert'}, AUTH + 2),
+    ({'tags': ['desert', 'salad'], 'is_favorited': 0, 'author': 1},
+     AUTH + 2),
+    ({'search': 'описание рецепта'}, AUTH + 2),
+))
+def test_recipes_list_filtered(user_client, bench, params, budget):
+    name = 'recipes-list-' + '-'.join(params)
+    user_client.get('/api/recipes/', params)
+    bench.measure(
+        name, lambda: user_client.get('/api/recipes/', params), budget
+    )
+
+
+def test_recipes_feed(user_client, bench):
+    # Строки ленты по индексу и список популярных авторов из подписок.
+    user_client.get('/api/recipes/feed/')
+    bench.measure(
+        'recipes-feed', lambda: user_client.get('/api/recipes/feed/'),
+        AUTH + 2
+    )
+
+
+def test_recipes_detail(user_client, bench, recipe):
+    user_client.get(f'/api/recipes/{recipe.pk}/')
+    bench.measure(
+        'recipes-detail',
+        lambda: user_client.get(f'/api/recipes/{recipe.pk}/'), AUTH + 1
+    )
+
+
+def test_recipes_similar(user_client, bench, recipe):
+    # Рецепт и его соседи по индексу, тела соседей из кэша.
+    path = f'/api/recipes/{recipe.pk}/similar/'
+    user_client.get(path)
+    bench.measure(
+        'recipes-similar', lambda: user_client.get(path), AUTH + 2
+    )
+
+
+def test_recipes_pantry(user_client, bench):
+    # Поиск по индексу в памяти, тела рецептов из кэша; из базы
+    # читается только номер последней записи журнала.
+    pantry = list(Ingredient.objects.values_list('pk', flat=True)[:20])
+    params = {'ingredients': pantry}
+    user_client.get('/api/recipes/pantry/', params)
+    bench.measure(
+        'recipes-pantry',
+        lambda: user_client.get('/api/recipes/pantry/', params), AUTH + 1
+    )
+
+
+def test_recipes_create_delete(user_client, bench):
+    ingredients = Ingredient.objects.values_list('pk', flat=True)[:60]
+    tags = list(Tag.objects.values_list('pk', flat=True))
+    payload = {
+        'ingredients': [
+            {'id': pk, 'amount': 10} for pk in ingredients
+        ],
+        'tags': tags,
+        'image': (
+            'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAA'
+            'BieywaAAAACVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4'
+            'bAAAACklEQVQImWNoAAAAggCByxOyYQAAAABJRU5ErkJggg=='
+        ),
+        'name': 'Бенчмарк',
+        'text': 'Описание',
+        'cooking_time': 5,
+    }
+    created = []
+
+    def create():
+        response = user_client.post(
+            '/api/recipes/', payload, format='json'
+        )
+        assert response.status_code == 201, response.data
+        created.append(response.data['id'])
+        return response
+
+    def remove_created():
+        Recipe.objects.filter(pk__in=created).delete()
+        created.clear()
+
+    bench.measure('recipes-create', create, AUTH + 12,
+                  reset=remove_created)
+    create()
+    bench.measure(
+        'recipes-delete',
+        lambda: user_client.delete(f'/api/recipes/{created[-1]}/'),
+        AUTH + 16, reset=create
+    )
+    remove_created()
+
+
+def test_recipes_update(user_client, bench, user):
+    recipe = Recipe.objects.filter(author=user).first()
+    amounts = dict(recipe.recipe_ingredients.values_list(
+        'ingredient_id', 'amount'
+    ))
+    tags = list(recipe.tags.values_list('pk', flat=True))
+    extra = Ingredient.objects.exclude(pk__in=amounts).first()
+    original = {
+        'ingredients': [
+            {'id': pk, 'amount': amount} for pk, amount in amounts.items()
+        ],
+        'tags': tags,
+    }
+    changed = {
+        'ingredients': [
+            {'id': pk, 'amount': amount + 1}
+            for pk, amount in list(amounts.items())[1:]
+        ] + [{'id': extra.pk, 'amount': 1}],
+        'tags': tags[1:] or list(Tag.objects.values_list('pk', flat=True)),
+        'name': 'Бенчмарк',
+    }
+    user_client.get('/api/recipes/')
+    bench.measure(
+        'recipes-update',
+        lambda: user_client.patch(
+            f'/api/recipes/{recipe.pk}/', changed, format='json'
+        ),
+        AUTH + 17,
+        reset=lambda: user_client.patch(
+            f'/api/recipes/{recipe.pk}/', original, format='json'
+        )
+    )
+
+
+@pytest.mark.parametrize('action, budget', (
+    ('favorite', AUTH + 5),
+    ('shopping_cart', AUTH + 9),
+))
+def test_favorite_and_shopping_cart(user_client, bench, recipe, action,
+                                    budget):
+    url = f'/api/recipes/{recipe.pk}/{action}/'
+    bench.measure(
+        f'recipes-{action}-add', lambda: user_client.post(url), budget,
+        reset=lambda: user_client.delete(url)
+    )
+    user_client.post(url)
+    bench.measure(
+        f'recipes-{action}-remove', lambda: user_client.delete(url), budget,
+        reset=lambda: user_client.post(url)
+    )
+    call_command('rebuild_shopping_cart', verify=True, stdout=StringIO())
+
+
+# Наличие в списке читается из базы под блокировкой, а не из кэша.
+@pytest.mark.parametrize('action, budget', (
+    ('favorite', AUTH + 5),
+    ('shopping_cart', AUTH + 9),
+))
+def test_favorite_and_shopping_cart_bulk(user_client, bench, user, action,
+                                         budget):
+    """Бюджет не зависит от числа рецептов в запросе."""
+    ids = list(Recipe.objects.exclude(favorite_recipes__user=user).exclude(
+        shopping_cart__user=user
+    ).values_list('pk', flat=True)[:7])
+    url = f'/api/recipes/{action}/bulk/'
+    body = {'recipes': ids}
+    user_client.get('/api/recipes/', {'limit': 1})
+    bench.measure(
+        f'recipes-{action}-bulk-add',
+        lambda: user_client.post(url, body, format='json'), budget,
+        reset=lambda: user_client.delete(url, body, format='json')
+    )
+    user_client.post(url, body, format='json')
+    bench.measure(
+        f'recipes-{action}-bulk-remove',
+        lambda: user_client.delete(url, body, format='json'), budget,
+        reset=lambda: user_client.post(url, body, format='json')
+    )
+    call_command('rebuild_shopping_cart', verify=True, stdout=StringIO())
+    call_command('reconcile_counters', verify=True, stdout=StringIO())
+
+
+@pytest.mark.parametrize('file_format', ('txt', 'csv', 'pdf'))
+def test_download_shopping_cart(user_client, bench, file_format):
+    def download():
+        response = user_client.get(
+            '/api/recipes/download_shopping_cart/',
+            {'file_format': file_format}
+        )
+        response.body = b''.join(response.streaming_content)
+        return response
+
+    response = bench.measure(
+        f'recipes-download-shopping-cart-{file_format}', download, AUTH + 1
+    )
+    assert response['Content-Disposition'].endswith(f'.{file_format}"')
+    assert response.body
+
+
+def test_users_list(user_client, bench):
+    # is_subscribed берется из множества подписок: один запрос на его
+    # загрузку при пустом кэше и ни одного на строку.
+    bench.measure(
+        'users-list', lambda: user_client.get('/api/users/'), AUTH + 3
+    )
+
+
+def test_users_detail_and_me(user_client, bench, author):
+    bench.measure(
+        'users-detail',
+        lambda: user_client.get(f'/api/users/{author.pk}/'), AUTH + 2
+    )
+    bench.measure('users-me', lambda: user_client.get('/api/users/me/'),
+                  AUTH + 2)
+
+
+def test_subscriptions(user_client, bench):
+    bench.measure(
+        'users-subscriptions',
+        lambda: user_client.get(
+            '/api/users/subscriptions/', {'recipes_limit': 3}
+        ),
+        AUTH + 3
+    )
+
+
+def test_subscribe(user, user_client, bench, author):
+    url = f'/api/users/{author.pk}/subscribe/'
+    bench.measure(
+        'users-subscribe', lambda: user_client.post(url), AUTH + 9,
+        reset=lambda: Subscriptions.objects.filter(
+            user=user, subscription=author).delete()
+    )
+    Subscriptions.objects.create(user=user, subscription=author)
+    bench.measure(
+        'users-unsubscribe', lambda: user_client.delete(url), AUTH + 5,
+        reset=lambda: Subscriptions.objects.get_or_create(
+            user=user, subscription=author)
+    )
+
+
+def test_token_login(client, bench, user):
+    bench.measure(
+        'auth-token-login',
+        lambda: client.post('/api/auth/token/login/', {
+            'email': user.email, 'password': 'Bench12345'
+        }),
+        4
+    )
@@ -0,0 +1,107 @@
+import os
+import time
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from users.models import CustomUser
+
+
+@pytest.fixture
+def staff(db):
+    return CustomUser.objects.create_user(
+        email='staff@example.com', username='staff', first_name='Staff',
+        last_name='User', password='password', is_staff=True
+    )
+
+
+@pytest.fixture
+def staff_client(staff):
+    token, _ = Token.objects.get_or_create(user=staff)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture(autouse=True)
+def profile_dir(settings, tmp_path):
+    settings.PROFILE_DIR = tmp_path
+    return tmp_path
+
+
+def test_not_profiled_without_trigger(staff_client, profile_dir):
+    response = staff_client.get('/api/recipes/download_shopping_cart/')
+    assert response.status_code == 200
+    assert 'X-Profile-Id' not in response
+    assert not any(profile_dir.iterdir())
+
+
+def test_trigger_ignored_for_non_staff(user_client, profile_dir):
+    response = user_client.get('/api/users/subscriptions/',
+                               HTTP_X_PROFILE='1')
+    assert response.status_code == 200
+    assert 'X-Profile-Id' not in response
+    assert not any(profile_dir.iterdir())
+
+
+def test_profile_stored_and_retrievable(staff_client, user_client,
+                                        profile_dir):
+    response = staff_client.get('/api/users/subscriptions/',
+                                HTTP_X_PROFILE='1')
+    assert response.status_code == 200
+    assert response.json() == staff_client.get(
+        '/api/users/subscriptions/'
+    ).json()
+    profile_id = response['X-Profile-Id']
+    assert {path.name for path in profile_dir.iterdir()} == {
+        f'{profile_id}.json', f'{profile_id}.prof'
+    }
+    report = staff_client.get(f'/api/profiles/{profile_id}/').json()
+    assert report['path'] == '/api/users/subscriptions/'
+    assert report['status'] == 200
+    assert any('users_subscriptions' in query['sql']
+               for query in report['queries'])
+    # Токен, найденный при проверке сотрудника, view не ищет заново.
+    assert not any('authtoken_token' in query['sql']
+                   for query in report['queries'])
+    assert 'cumulative' in report['stats']
+    download = staff_client.get(f'/api/profiles/{profile_id}/',
+                                {'download': '1'})
+    assert download.status_code == 200
+    assert user_client.get(
+        f'/api/profiles/{profile_id}/'
+    ).status_code == 403
+
+
+def test_profile_by_query_param_under_asgi(staff, profile_dir):
+    token, _ = Token.objects.get_or_create(user=staff)
+
+    @async_to_sync
+    async def get(path):
+        return await AsyncClient().get(
+            path, authorization=f'Token {token.key}'
+        )
+
+    response = get('/api/recipes/download_shopping_cart/?profile=1')
+    assert response.status_code == 200
+    profile_id = response['X-Profile-Id']
+    assert (profile_dir / f'{profile_id}.prof').exists()
+
+
+def test_old_profiles_removed(staff_client, profile_dir, settings):
+    settings.PROFILE_KEEP = 2
+    ids = []
+    for age in (20, 10, 0):
+        ids.append(staff_client.get(
+            '/api/tags/', HTTP_X_PROFILE='1'
+        )['X-Profile-Id'])
+        # Возраст задается явно: mtime соседних записей может совпасть.
+        modified = time.time() - age
+        os.utime(profile_dir / f'{ids[-1]}.json', (modified, modified))
+    assert {path.name for path in profile_dir.iterdir()} == {
+        f'{profile_id}{suffix}' for profile_id in ids[1:]
+        for suffix in ('.json', '.prof')
+    }
@@ -0,0 +1,63 @@
+from rest_framework.test import APIClient
+
+from recipes.models import Favourite, Recipe
+from users.models import Subscriptions
+
+
+def get_recipe(client, recipe):
+    response = client.get(f'/api/recipes/{recipe.pk}/')
+    assert response.status_code == 200
+    return response.data
+
+
+def test_flags_are_per_user(user_client, user):
+    recipe = Recipe.objects.exclude(author=user).exclude(
+        favorite_recipes__user=user
+    ).first()
+    anonymous = get_recipe(APIClient(), recipe)
+    Favourite.objects.create(user=user, recipe=recipe)
+    Subscriptions.objects.get_or_create(user=user,
+                                        subscription=recipe.author)
+    data = get_recipe(user_client, recipe)
+    assert data['is_favorited'] is True
+    assert data['author']['is_subscribed'] is True
+    assert data['image'].startswith('http://testserver/')
+    assert get_recipe(APIClient(), recipe) == anonymous
+    assert anonymous['is_favorited'] is False
+    assert anonymous['author']['is_subscribed'] is False
+
+
+def test_list_matches_detail(user_client):
+    results = user_client.get('/api/recipes/').data['results']
+    for body in results[:3]:
+        recipe = Recipe.objects.get(pk=body['id'])
+        assert get_recipe(user_client, recipe) == body
+
+
+def test_cache_follows_changes(user_client, user):
+    recipe = Recipe.objects.filter(author=user).first()
+    get_recipe(user_client, recipe)
+    response = user_client.patch(
+        f'/api/recipes/{recipe.pk}/',
+        {'ingredients': [
+            {'id': pk, 'amount': 3} for pk in
+            recipe.recipe_ingredients.values_list('ingredient_id', flat=True)
+        ], 'name': 'Новое название'},
+        format='json'
+    )
+    assert response.status_code == 200, response.data
+    data = get_recipe(user_client, recipe)
+    assert data['name'] == 'Новое название'
+    assert {item['amount'] for item in data['ingredients']} == {3}
+
+    user.first_name = 'Переименован'
+    user.save()
+    assert get_recipe(user_client, recipe)['author']['first_name'] == (
+        'Переименован'
+    )
+
+    tag = recipe.tags.first()
+    tag.name = 'Новый тег'
+    tag.save()
+    names = {item['name'] for item in get_recipe(user_client, recipe)['tags']}
+    assert 'Новый тег' in names
@@ -0,0 +1,72 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Ingredient, Recipe, Tag
+
+
+def payload(ingredients, tags):
+    return {
+        'ingredients': [{'id': pk, 'amount': 5} for pk in ingredients],
+        'tags': tags,
+        'image': (
+            'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAA'
+            'BieywaAAAACVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4'
+            'bAAAACklEQVQImWNoAAAAggCByxOyYQAAAABJRU5ErkJggg=='
+        ),
+        'name': 'Проверка',
+        'text': 'Описание',
+        'cooking_time': 5,
+    }
+
+
+@pytest.mark.parametrize('field, broken', (
+    ('ingredients', lambda ingredients, tags: (
+        ingredients + ingredients[:1], tags)),
+    ('ingredients', lambda ingredients, tags: (ingredients + [10 ** 9], tags)),
+    ('ingredients', lambda ingredients, tags: ([], tags)),
+    ('tags', lambda ingredients, tags: (ingredients, tags + tags[:1])),
+    ('tags', lambda ingredients, tags: (ingredients, tags + [10 ** 9])),
+))
+def test_create_rejects_bad_references(user_client, field, broken):
+    ingredients = list(Ingredient.objects.values_list('pk', flat=True)[:3])
+    tags = list(Tag.objects.values_list('pk', flat=True)[:2])
+    recipes = Recipe.objects.count()
+    response = user_client.post(
+        '/api/recipes/', payload(*broken(ingredients, tags)), format='json'
+    )
+    assert response.status_code == 400
+    assert field in response.data
+    assert Recipe.objects.count() == recipes
+
+
+def test_create_with_many_ingredients(user_client):
+    ingredients = list(Ingredient.objects.values_list('pk', flat=True)[:55])
+    tags = list(Tag.objects.values_list('pk', flat=True))
+    response = user_client.post(
+        '/api/recipes/', payload(ingredients, tags), format='json'
+    )
+    assert response.status_code == 201, response.data
+    assert {item['id'] for item in response.data['ingredients']} == set(
+        ingredients
+    )
+    assert not response.data['is_favorited']
+    assert {tag['id'] for tag in response.data['tags']} == set(tags)
+
+
+def test_create_queries_independent_of_ingredients(user_client):
+    ingredients = list(Ingredient.objects.values_list('pk', flat=True)[:55])
+    tags = list(Tag.objects.values_list('pk', flat=True))
+
+    def create(count):
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.post(
+                '/api/recipes/', payload(ingredients[:count], tags),
+                format='json'
+            )
+        assert response.status_code == 201, response.data
+        return len(context.captured_queries)
+
+    # Первый запрос заполняет кэш подписок пользователя.
+    create(5)
+    assert create(5) == create(55)
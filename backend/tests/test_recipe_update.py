@@ -0,0 +1,83 @@
+from io import StringIO
+
+from django.contrib import admin
+from django.core.management import call_command
+
+from recipes.models import (Ingredient, Recipe, RecipeIngredientList,
+                            ShoppingCart, Tag)
+from users.models import CustomUser
+
+
+def test_update_touches_only_changed_rows(user_client, user):
+    recipe = Recipe.objects.filter(author=user).first()
+    rows = list(recipe.recipe_ingredients.order_by('pk'))
+    kept, changed, removed = rows[0], rows[1], rows[2]
+    added = Ingredient.objects.exclude(
+        pk__in=[row.ingredient_id for row in rows]
+    ).first()
+    tags = list(Tag.objects.exclude(pk=recipe.tags.first().pk))
+    ingredients_before = Ingredient.objects.count()
+    payload = {
+        'ingredients': [
+            {'id': kept.ingredient_id, 'amount': kept.amount},
+            {'id': changed.ingredient_id, 'amount': changed.amount + 1},
+            {'id': added.pk, 'amount': 7},
+        ] + [{'id': row.ingredient_id, 'amount': row.amount}
+             for row in rows[3:]],
+        'tags': [tag.pk for tag in tags],
+    }
+    response = user_client.patch(
+        f'/api/recipes/{recipe.pk}/', payload, format='json'
+    )
+    assert response.status_code == 200, response.data
+    current = {row.ingredient_id: row
+               for row in recipe.recipe_ingredients.all()}
+    assert current[kept.ingredient_id].pk == kept.pk
+    assert current[changed.ingredient_id].pk == changed.pk
+    assert current[changed.ingredient_id].amount == changed.amount + 1
+    assert current[added.pk].amount == 7
+    assert removed.ingredient_id not in current
+    assert set(recipe.tags.all()) == set(tags)
+    assert Ingredient.objects.count() == ingredients_before
+    call_command('rebuild_shopping_cart', verify=True, stdout=StringIO())
+
+
+def test_failed_update_leaves_recipe_intact(user_client, user):
+    recipe = Recipe.objects.filter(author=user).first()
+    before = list(recipe.recipe_ingredients.values_list(
+        'ingredient_id', 'amount'
+    ))
+    response = user_client.patch(
+        f'/api/recipes/{recipe.pk}/',
+        {'ingredients': [{'id': before[0][0], 'amount': 0}], 'tags': []},
+        format='json'
+    )
+    assert response.status_code == 400
+    assert list(RecipeIngredientList.objects.filter(
+        recipe=recipe
+    ).values_list('ingredient_id', 'amount')) == before
+
+
+def test_cart_totals_follow_orm_writes(db):
+    """Админка и каскадное удаление обходят представления."""
+    def verify():
+        call_command('rebuild_shopping_cart', verify=True,
+                     stdout=StringIO())
+
+    recipe = Recipe.objects.filter(shopping_cart_count__gt=0).first()
+    user = CustomUser.objects.filter(shopping_cart__isnull=False).exclude(
+        shopping_cart__recipe=recipe).first()
+    verify()
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+    verify()
+    row_admin = admin.site._registry[RecipeIngredientList]
+    row = RecipeIngredientList.objects.filter(recipe=recipe).first()
+    row.amount += 5
+    row_admin.save_model(None, row, None, True)
+    verify()
+    row_admin.delete_model(None, row)
+    verify()
+    recipe.delete()
+    verify()
+    user.delete()
+    verify()
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+from django.db import connection
+
+from recipes.models import Recipe, Tag
+
+POSTGRESQL = 'postgresql' in os.getenv('TEST_DB_ENGINE', '')
+
+
+def result_ids(response):
+    assert response.status_code == 200
+    return [item['id'] for item in response.json()['results']]
+
+
+def create_recipe(author, name, text):
+    return Recipe.objects.create(author=author, name=name, text=text,
+                                 cooking_time=10, image='recipes/test.png')
+
+
+def test_search_ranks_name_above_text(client, user):
+    in_text = create_recipe(user, 'Суп', 'Добавить тыквенные семечки')
+    in_name = create_recipe(user, 'Тыквенный пирог', 'Испечь')
+    create_recipe(user, 'Борщ', 'Свекла')
+    ids = result_ids(client.get('/api/recipes/', {'search': 'тыквен'}))
+    assert ids == [in_name.pk, in_text.pk]
+
+
+def test_search_follows_updates_and_deletes(client, user):
+    recipe = create_recipe(user, 'Окрошка', 'Квас')
+    assert result_ids(client.get('/api/recipes/', {'search': 'окрошка'}))
+    recipe.name = 'Холодник'
+    recipe.save()
+    assert not result_ids(client.get('/api/recipes/', {'search': 'окрошка'}))
+    assert result_ids(
+        client.get('/api/recipes/', {'search': 'холодник'})
+    ) == [recipe.pk]
+    recipe.delete()
+    assert not result_ids(
+        client.get('/api/recipes/', {'search': 'холодник'})
+    )
+
+
+def test_search_composes_with_filters(client, user):
+    tag = Tag.objects.get(slug='desert')
+    tagged = create_recipe(user, 'Шарлотка яблочная', 'Яблоки')
+    tagged.tags.add(tag)
+    create_recipe(user, 'Яблочный сок', 'Яблоки')
+    ids = result_ids(client.get('/api/recipes/', {
+        'search': 'яблоч', 'tags': 'desert', 'author': user.pk
+    }))
+    assert ids == [tagged.pk]
+
+
+@pytest.mark.skipif(not POSTGRESQL, reason='Нужен TEST_DB_ENGINE '
+                    'django.db.backends.postgresql.')
+def test_postgresql_trigger_and_gin_index(client, user):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes "
+            "WHERE indexname = 'recipes_recipe_search_vector_gin'"
+        )
+        assert 'gin' in cursor.fetchone()[0].lower()
+    recipe = create_recipe(user, 'Тыквенные оладьи', 'Обжарить')
+    assert Recipe.objects.filter(
+        pk=recipe.pk, search_vector__isnull=False
+    ).exists()
+    # Словарь russian приводит слова к основе.
+    assert result_ids(
+        client.get('/api/recipes/', {'search': 'тыквенный'})
+    ) == [recipe.pk]
+    recipe.name = 'Кабачковые оладьи'
+    recipe.save()
+    assert not result_ids(
+        client.get('/api/recipes/', {'search': 'тыквенный'})
+    )
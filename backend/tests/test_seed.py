@@ -0,0 +1,32 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Ingredient, SeedChecksum, Tag
+from users.models import CustomUser
+
+
+def test_seed_is_idempotent_and_skips_unchanged(db):
+    call_command('seed', stdout=StringIO())
+    counts = (Ingredient.objects.count(), Tag.objects.count(),
+              CustomUser.objects.count())
+    assert SeedChecksum.objects.count() == 3
+    assert CustomUser.objects.get(email='cook@yandex.ru').check_password(
+        'Scorcer777'
+    )
+    with CaptureQueriesContext(connection) as context:
+        call_command('seed', stdout=StringIO())
+    assert len(context.captured_queries) == 3
+    call_command('seed', force=True, stdout=StringIO())
+    assert counts == (Ingredient.objects.count(), Tag.objects.count(),
+                      CustomUser.objects.count())
+
+
+def test_seed_reloads_changed_fixture(db):
+    call_command('seed', stdout=StringIO())
+    Tag.objects.filter(slug='desert').update(name='Сладкое')
+    SeedChecksum.objects.filter(fixture='tag.json').update(checksum='old')
+    call_command('seed', stdout=StringIO())
+    assert Tag.objects.get(slug='desert').name == 'Десерт'
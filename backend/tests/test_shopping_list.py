@@ -0,0 +1,60 @@
+import csv
+from io import StringIO
+
+import pytest
+
+from recipes.models import (Ingredient, Recipe, RecipeIngredientList,
+                            ShoppingCart)
+from recipes.renderers import ShoppingListRenderer
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+@pytest.fixture
+def cart(user, user_client):
+    """Два рецепта с общим ингредиентом в пустой корзине user."""
+    ShoppingCart.objects.filter(user=user).delete()
+    first, second = Ingredient.objects.order_by('name')[:2]
+    amounts = ({first: 3, second: 2}, {first: 4})
+    for number, ingredients in enumerate(amounts):
+        recipe = Recipe.objects.create(
+            author=user, name=f'Рецепт {number}', text='-', cooking_time=5
+        )
+        RecipeIngredientList.objects.bulk_create(
+            RecipeIngredientList(recipe=recipe, ingredient=ingredient,
+                                 amount=amount)
+            for ingredient, amount in ingredients.items()
+        )
+        response = user_client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        assert response.status_code == 201
+    return [(first.name, 7, first.measurement_unit),
+            (second.name, 2, second.measurement_unit)]
+
+
+def download(user_client, file_format):
+    response = user_client.get(URL, {'file_format': file_format})
+    assert response.status_code == 200
+    return b''.join(response.streaming_content).decode()
+
+
+def test_base_renderer_is_abstract():
+    with pytest.raises(TypeError):
+        ShoppingListRenderer()
+
+
+def test_txt_lists_totals(user_client, cart):
+    assert download(user_client, 'txt').splitlines() == [
+        'Ваш список покупок:',
+        *(f'{number}. {name}: {amount} {unit}'
+          for number, (name, amount, unit) in enumerate(cart, start=1))
+    ]
+
+
+def test_csv_lists_totals(user_client, cart):
+    content = download(user_client, 'csv')
+    assert content.startswith('\ufeff')
+    rows = list(csv.reader(StringIO(content[1:])))
+    assert rows == [
+        ['Ингредиент', 'Количество', 'Ед. измерения'],
+        *([name, str(amount), unit] for name, amount, unit in cart)
+    ]
@@ -0,0 +1,143 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from recipes.models import (Ingredient, Recipe, RecipeIngredientList,
+                            SimilarityQueue, SimilarRecipe)
+from recipes.similarity import ingredient_weights, weighted_jaccard
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAA'
+    'BieywaAAAACVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4'
+    'bAAAACklEQVQImWNoAAAAggCByxOyYQAAAABJRU5ErkJggg=='
+)
+
+
+def rebuild_similar(**options):
+    call_command('rebuild_similar', stdout=StringIO(), **options)
+
+
+def similar_ids(client, recipe_id, **params):
+    response = client.get(f'/api/recipes/{recipe_id}/similar/', params)
+    assert response.status_code == 200
+    return [body['id'] for body in response.data]
+
+
+@pytest.fixture
+def ingredients(db):
+    return list(Ingredient.objects.order_by('pk').values_list(
+        'pk', flat=True
+    )[:16])
+
+
+@pytest.fixture
+def recipes(user, ingredients):
+    """Рецепт base и рецепты с 7, 4 и 0 общими с ним ингредиентами."""
+    sets = {
+        'base': ingredients[:8],
+        'near': ingredients[:7] + ingredients[8:9],
+        'middle': ingredients[:4] + ingredients[8:12],
+        'far': ingredients[8:16],
+    }
+    created = {}
+    for name, pks in sets.items():
+        recipe = Recipe.objects.create(
+            author=user, name=name, text=name, cooking_time=5, image=IMAGE
+        )
+        RecipeIngredientList.objects.bulk_create(
+            RecipeIngredientList(recipe=recipe, ingredient_id=pk, amount=1)
+            for pk in pks
+        )
+        created[name] = recipe
+    rebuild_similar(full=True)
+    return created
+
+
+def test_ranked_by_weighted_jaccard(client, recipes):
+    base = recipes['base']
+    response = client.get(f'/api/recipes/{base.pk}/similar/')
+    assert response.status_code == 200
+    ids = [body['id'] for body in response.data]
+    assert ids[:2] == [recipes['near'].pk, recipes['middle'].pk]
+    assert recipes['far'].pk not in ids
+    weights = ingredient_weights()
+    first = set(base.ingredients.values_list('pk', flat=True))
+    second = set(recipes['near'].ingredients.values_list('pk', flat=True))
+    assert response.data[0]['similarity'] == round(
+        weighted_jaccard(first, second, weights), 4
+    )
+    assert response.data[0]['name'] == 'near'
+    assert similar_ids(client, base.pk, limit=1) == [recipes['near'].pk]
+
+
+def test_similar_validation(client, recipes):
+    assert client.get('/api/recipes/0/similar/').status_code == 404
+    assert client.get(
+        f'/api/recipes/{recipes["base"].pk}/similar/', {'limit': 0}
+    ).status_code == 400
+
+
+def test_incremental_refresh(user_client, client, recipes, ingredients):
+    base = recipes['base']
+    response = user_client.post('/api/recipes/', {
+        'ingredients': [{'id': pk, 'amount': 1} for pk in ingredients[:8]],
+        'tags': [],
+        'image': IMAGE,
+        'name': 'Копия',
+        'text': 'Описание',
+        'cooking_time': 5,
+    }, format='json')
+    assert response.status_code == 201, response.data
+    copy = response.data['id']
+    assert SimilarityQueue.objects.filter(recipe_id=copy).exists()
+    rebuild_similar()
+    assert not SimilarityQueue.objects.exists()
+    assert similar_ids(client, base.pk)[0] == copy
+    assert similar_ids(client, copy)[0] == base.pk
+
+    response = user_client.patch(f'/api/recipes/{copy}/', {
+        'ingredients': [{'id': pk, 'amount': 1} for pk in ingredients[12:]],
+    }, format='json')
+    assert response.status_code == 200, response.data
+    rebuild_similar()
+    assert copy not in similar_ids(client, base.pk)
+    assert similar_ids(client, copy)[0] == recipes['far'].pk
+
+
+def test_amount_change_not_queued(user_client, user):
+    recipe = Recipe.objects.filter(author=user).first()
+    user_client.patch(f'/api/recipes/{recipe.pk}/', {
+        'ingredients': [
+            {'id': pk, 'amount': amount + 1}
+            for pk, amount in recipe.recipe_ingredients.values_list(
+                'ingredient_id', 'amount'
+            )
+        ],
+    }, format='json')
+    assert not SimilarityQueue.objects.filter(recipe=recipe).exists()
+
+
+def test_lists_bounded_and_symmetric_scores(settings, recipes):
+    settings.SIMILAR_RECIPES_LIMIT = 2
+    rebuild_similar(full=True)
+    rows = SimilarRecipe.objects.filter(recipe=recipes['base'])
+    assert rows.count() == 2
+    scores = dict(SimilarRecipe.objects.filter(
+        similar=recipes['base']
+    ).values_list('recipe', 'score'))
+    assert scores[recipes['near'].pk] == rows.get(
+        similar=recipes['near']
+    ).score
+
+
+def test_chunked_queries_match(monkeypatch, recipes):
+    """Корзины и кандидаты читаются пачками IN не длиннее CHUNK_SIZE."""
+    expected = sorted(SimilarRecipe.objects.values_list(
+        'recipe_id', 'similar_id', 'score'
+    ))
+    monkeypatch.setattr('recipes.similarity.CHUNK_SIZE', 2)
+    rebuild_similar(full=True, batch_size=3)
+    assert sorted(SimilarRecipe.objects.values_list(
+        'recipe_id', 'similar_id', 'score'
+    )) == expected
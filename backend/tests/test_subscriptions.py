@@ -0,0 +1,28 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Recipe
+
+
+def test_subscriptions_limit_counts_and_no_writes(user_client, user):
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.get(
+            '/api/users/subscriptions/', {'recipes_limit': 2, 'limit': 50}
+        )
+    assert response.status_code == 200
+    assert not [query for query in context.captured_queries
+                if not query['sql'].startswith('SELECT')]
+    for author in response.json()['results']:
+        expected = list(Recipe.objects.filter(
+            author_id=author['id']
+        ).order_by('-pub_date', '-id').values_list('id', flat=True))
+        assert author['is_subscribed'] is True
+        assert author['recipes_count'] == len(expected)
+        assert [recipe['id'] for recipe in author['recipes']] == expected[:2]
+
+
+def test_subscriptions_rejects_bad_recipes_limit(user_client):
+    response = user_client.get(
+        '/api/users/subscriptions/', {'recipes_limit': 'все'}
+    )
+    assert response.status_code == 400
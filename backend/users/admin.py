@@ -1,8 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
-from recipes.models import Recipe
-from .models import CustomUser, Subscriptions
+from .models import CustomUser
 
 
 class CustomUserAdmin(UserAdmin):
@@ -18,15 +17,5 @@ class CustomUserAdmin(UserAdmin):
     search_fields = ('email',)
     list_filter = ('username', 'email')
 
-    @admin.display(description='Количество подписчиков')
-    def subscribers_count(self, obj):
-        count = Subscriptions.objects.filter(user=obj).count()
-        return count
-
-    @admin.display(description='Количество рецептов')
-    def recipes_count(self, obj):
-        count = Recipe.objects.filter(author=obj).count()
-        return count
-
 
 admin.site.register(CustomUser, CustomUserAdmin)
@@ -8,8 +8,27 @@ EMAIL_MAX_LENGTH = 254
 USERNAME_MAX_LENGTH = 150
 
 
-class CustomUser(AbstractUser):
+class CountersMixin:
+    '''Полное сохранение не перезаписывает счетчики.
+
+    Счетчики меняются UPDATE с F() из сигналов; форма админки
+    сохранила бы значения, прочитанные до параллельных изменений.
+    '''
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            skipped = set(self.counter_fields) | self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+
+class CustomUser(CountersMixin, AbstractUser):
     '''Кастомная модель пользователя.'''
+    counter_fields = ('recipes_count', 'subscribers_count')
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
     username = models.CharField(
@@ -33,6 +52,12 @@ class CustomUser(AbstractUser):
         blank=False,
         max_length=USERNAME_MAX_LENGTH,
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов', default=0, editable=False
+    )
+    subscribers_count = models.PositiveIntegerField(
+        'Количество подписчиков', default=0, editable=False
+    )
 
     class Meta:
         ordering = ('username',)
@@ -5,9 +5,11 @@ from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 
 from foodgram_project.constants import USERNAME_MAX_LENGTH
+from foodgram_project.metrics import TimedSerializerMixin
+from recipes.memberships import SUBSCRIPTIONS, is_member
 from recipes.models import Recipe
 from recipes.validators import username_validator
-from .models import CustomUser, Subscriptions
+from .models import CustomUser
 
 
 class RegistrationSerializer(UserCreateSerializer):
@@ -32,7 +34,7 @@ class RegistrationSerializer(UserCreateSerializer):
                   'first_name', 'last_name', 'password')
 
 
-class ProfileSerializer(UserSerializer):
+class ProfileSerializer(TimedSerializerMixin, UserSerializer):
     """Сериализатор для просмотра данных пользователей."""
     is_subscribed = serializers.SerializerMethodField()
 
@@ -44,11 +46,9 @@ class ProfileSerializer(UserSerializer):
                             'last_name')
 
     def get_is_subscribed(self, obj):
-        current_user = self.context.get('request').user
-        if not current_user.is_authenticated:
-            return False
-        return Subscriptions.objects.filter(user=current_user,
-                                            subscription=obj).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return is_member(self.context.get('request'), SUBSCRIPTIONS, obj.pk)
 
 
 class SubscriptionsRecipeSerializer(serializers.ModelSerializer):
@@ -62,14 +62,17 @@ class SubscriptionsRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
-class SubscriptionsSerializer(serializers.ModelSerializer):
-    """Сериализатор подписок."""
+class SubscriptionsSerializer(TimedSerializerMixin,
+                              serializers.ModelSerializer):
+    """Сериализатор подписок.
+
+    Читает счетчик recipes_count, аннотацию is_subscribed
+    и предзагруженные limited_recipes и ничего не пишет в БД.
+    """
     is_subscribed = serializers.SerializerMethodField()
     recipes_limit = serializers.IntegerField(write_only=True, required=False)
-    recipes = SubscriptionsRecipeSerializer(
-        many=True, read_only=True
-    )
-    recipes_count = serializers.ReadOnlyField(source='recipes.count')
+    recipes = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = CustomUser
@@ -80,14 +83,19 @@ class SubscriptionsSerializer(serializers.ModelSerializer):
                             'first_name', 'last_name')
 
     def get_is_subscribed(self, obj):
-        current_user = self.context.get('request').user
-        if not current_user.is_authenticated:
-            return False
-        return current_user.subscribed_to.filter(subscription=obj).exists()
-
-    def to_representation(self, instance):
-        request = self.context.get('request')
-        limit = request.query_params.get('recipes_limit')
-        if limit:
-            instance.recipes.set(instance.recipes.all()[:int(limit)])
-        return super().to_representation(instance)
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return is_member(self.context.get('request'), SUBSCRIPTIONS, obj.pk)
+
+    def get_recipes(self, obj):
+        recipes = getattr(obj, 'limited_recipes', None)
+        if recipes is None:
+            recipes = obj.recipes.all()
+            limit = self.context.get('request').query_params.get(
+                'recipes_limit'
+            )
+            if limit and limit.isdigit():
+                recipes = recipes[:int(limit)]
+        return SubscriptionsRecipeSerializer(
+            recipes, many=True, context=self.context
+        ).data
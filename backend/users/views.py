@@ -1,9 +1,13 @@
+from django.db import transaction
+from django.db.models import OuterRef, Prefetch, Subquery, Value
 from django.shortcuts import get_object_or_404
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from recipes.models import FeedEntry, Recipe
 from recipes.pagination import CustomPagination
 
 from .models import CustomUser, Subscriptions
@@ -12,6 +16,40 @@ from .serializers import (RegistrationSerializer,
                           SubscriptionsSerializer)
 
 
+def get_recipes_limit(request):
+    """Значение recipes_limit из запроса или None."""
+    limit = request.query_params.get('recipes_limit')
+    if limit is None:
+        return None
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValidationError({'recipes_limit': 'Введите целое число.'})
+    if limit < 0:
+        raise ValidationError(
+            {'recipes_limit': 'Значение не может быть отрицательным.'}
+        )
+    return limit
+
+
+def limited_recipes(limit):
+    """Не более limit последних рецептов каждого автора одним запросом.
+
+    Коррелированный подзапрос с LIMIT работает как LATERAL:
+    для каждого автора выбираются id его последних рецептов.
+    """
+    queryset = Recipe.objects.defer('search_vector').order_by(
+        '-pub_date', '-id'
+    )
+    if limit is None:
+        return queryset
+    return queryset.filter(pk__in=Subquery(
+        Recipe.objects.filter(
+            author=OuterRef('author')
+        ).order_by('-pub_date', '-id').values('pk')[:limit]
+    ))
+
+
 class ProfileViewSet(viewsets.ModelViewSet):
     """Вьюсет для работы с данными пользователей."""
     queryset = CustomUser.objects.all()
@@ -19,6 +57,7 @@ class ProfileViewSet(viewsets.ModelViewSet):
     serializer_class = ProfileSerializer
     permission_classes = (AllowAny,)
     pagination_class = CustomPagination
+    cursor_ordering = ('username',)
 
     def create(self, request):
         data = {
@@ -56,9 +95,19 @@ class ProfileViewSet(viewsets.ModelViewSet):
     )
     def subscriptions(self, request):
         '''Вернуть подписки текущего пользователя.'''
-        queryset = CustomUser.objects.filter(subscribers__user=request.user)
+        queryset = CustomUser.objects.filter(
+            subscribers__user=request.user
+        ).annotate(
+            is_subscribed=Value(True),
+        ).order_by('username').prefetch_related(Prefetch(
+            'recipes',
+            queryset=limited_recipes(get_recipes_limit(request)),
+            to_attr='limited_recipes'
+        ))
         paginator = self.pagination_class()
-        paginated_queryset = paginator.paginate_queryset(queryset, request)
+        paginated_queryset = paginator.paginate_queryset(
+            queryset, request, view=self
+        )
         serializer = SubscriptionsSerializer(
             paginated_queryset, many=True, context={'request': request})
         return paginator.get_paginated_response(serializer.data)
@@ -87,8 +136,11 @@ class ProfileViewSet(viewsets.ModelViewSet):
                     'message': 'Вы уже подписаны на данного пользователя!'},
                     status=status.HTTP_400_BAD_REQUEST)
             else:
-                Subscriptions.objects.create(user=request.user,
-                                             subscription=new_subscription)
+                with transaction.atomic():
+                    Subscriptions.objects.create(
+                        user=request.user, subscription=new_subscription
+                    )
+                    FeedEntry.objects.follow(request.user, new_subscription)
                 return Response(serializer.data,
                                 status=status.HTTP_201_CREATED)
         if request.method == 'DELETE':
@@ -96,14 +148,14 @@ class ProfileViewSet(viewsets.ModelViewSet):
             if not request.user.is_authenticated:
                 return Response({'message': 'Вы не авторизованы!'},
                                 status=status.HTTP_401_UNAUTHORIZED)
-            if not Subscriptions.objects.filter(
-                    user=request.user,
-                    subscription=old_subscription).exists():
-                return Response({
-                    'message': 'Вы не были подписаны на данного автора.'},
-                    status=status.HTTP_400_BAD_REQUEST)
-            request.user.subscribed_to.filter(
-                subscription=old_subscription
-            ).delete()
-            return Response({'message': 'Вы отписались от данного автора!'},
-                            status=status.HTTP_204_NO_CONTENT)
+            with transaction.atomic():
+                # Число удаленных строк заменяет проверку exists().
+                deleted, _ = request.user.subscribed_to.filter(
+                    subscription=old_subscription
+                ).delete()
+                if not deleted:
+                    return Response({
+                        'message': 'Вы не были подписаны на данного автора.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+                FeedEntry.objects.unfollow(request.user, old_subscription)
+            return Response(status=status.HTTP_204_NO_CONTENT)